@@ -79,52 +79,57 @@ def obtener_token_admin():
         print(f"Error en login: {res.text}")
         sys.exit(1)
 
-def gestionar_lugar(token, datos):
-    """Crea un lugar y lo aprueba."""
+def cargar_lote(token, url, payloads, tipo):
+    """Crea todos los recursos con una petición y los aprueba con otra."""
     headers = {"Authorization": f"Bearer {token}"}
-    
-    # 1. Crear
-    payload = {
-        "nombre": datos['nombre'],
-        "descripcion": datos['desc'],
-        "lat": datos['lat'],
-        "lng": datos['lng'],
-        "categoria": datos['cat']
-    }
-    res = requests.post(f"{URL_LUGARES}/lugares/", json=payload, headers=headers)
-    
-    if res.status_code == 201:
-        lugar_id = res.json()['id']
-        print(f"Lugar creado: {datos['nombre']} (ID: {lugar_id})")
-        
-        # 2. Aprobar
-        requests.put(f"{URL_LUGARES}/lugares/{lugar_id}/aprobar/", headers=headers)
-    else:
-        print(f"Error creando lugar {datos['nombre']}: {res.status_code}")
 
-def gestionar_evento(token, datos):
-    """Crea un evento y lo aprueba."""
-    headers = {"Authorization": f"Bearer {token}"}
-    
-    # 1. Crear
-    payload = {
-        "nombre": datos['nombre'],
-        "descripcion": datos['desc'],
-        "lat": datos['lat'],
-        "lng": datos['lng'],
-        "categoria": datos['cat'],
-        "fecha_inicio": datos['fecha']
-    }
-    res = requests.post(f"{URL_EVENTOS}/eventos/", json=payload, headers=headers)
-    
-    if res.status_code == 201:
-        evento_id = res.json()['id']
-        print(f"Evento creado: {datos['nombre']} (ID: {evento_id})")
-        
-        # 2. Aprobar
-        requests.put(f"{URL_EVENTOS}/eventos/{evento_id}/aprobar/", headers=headers)
-    else:
-        print(f"Error creando evento {datos['nombre']}: {res.status_code}")
+    # 1. Crear (un solo POST para todo el lote)
+    res = requests.post(f"{url}/lote/", json=payloads, headers=headers)
+    if res.status_code not in (201, 400):
+        print(f"Error creando {tipo}: {res.status_code}")
+        return
+
+    ids = []
+    for resultado in res.json()['resultados']:
+        nombre = payloads[resultado['indice']]['nombre']
+        if resultado['ok']:
+            ids.append(resultado['id'])
+            print(f"{tipo.capitalize()} creado: {nombre} (ID: {resultado['id']})")
+        else:
+            print(f"Error creando {nombre}: {resultado['errores']}")
+
+    # 2. Aprobar (un solo PUT para todos los creados)
+    if ids:
+        requests.put(f"{url}/lote/aprobar/", json={"ids": ids}, headers=headers)
+
+def gestionar_lugares(token, lugares):
+    """Crea los lugares y los aprueba."""
+    payloads = [
+        {
+            "nombre": datos['nombre'],
+            "descripcion": datos['desc'],
+            "lat": datos['lat'],
+            "lng": datos['lng'],
+            "categoria": datos['cat']
+        }
+        for datos in lugares
+    ]
+    cargar_lote(token, f"{URL_LUGARES}/lugares", payloads, "lugar")
+
+def gestionar_eventos(token, eventos):
+    """Crea los eventos y los aprueba."""
+    payloads = [
+        {
+            "nombre": datos['nombre'],
+            "descripcion": datos['desc'],
+            "lat": datos['lat'],
+            "lng": datos['lng'],
+            "categoria": datos['cat'],
+            "fecha_inicio": datos['fecha']
+        }
+        for datos in eventos
+    ]
+    cargar_lote(token, f"{URL_EVENTOS}/eventos", payloads, "evento")
 
 # ==========================================
 # EJECUCIÓN PRINCIPAL
@@ -138,12 +143,10 @@ if __name__ == "__main__":
     
     # 2. Procesar Lugares
     print("\n--- Insertando 10 Lugares ---")
-    for lugar in DATOS_LUGARES:
-        gestionar_lugar(token, lugar)
+    gestionar_lugares(token, DATOS_LUGARES)
         
     # 3. Procesar Eventos
     print("\n--- Insertando 10 Eventos ---")
-    for evento in DATOS_EVENTOS:
-        gestionar_evento(token, evento)
+    gestionar_eventos(token, DATOS_EVENTOS)
         
     print("\n--- FIN DEL PROCESO ---")
\ No newline at end of file
@@ -0,0 +1,62 @@
+"""
+GET condicional (ETag / Last-Modified) en listados y detalles.
+
+Los validadores salen de una consulta agregada barata, sin serializar nada:
+- Listado: número de registros y fecha de la última modificación del queryset
+  ya filtrado. Un alta o una baja cambian el número; una edición, la fecha.
+- Detalle: id y fecha de modificación del registro.
+
+En los dos casos entran también la URL (con sus parámetros de filtro, página y
+proyección) y el usuario, porque lo que ve cada uno depende de su rol.
+
+Si el cliente manda un If-None-Match (o If-Modified-Since) que sigue valiendo,
+se contesta 304 sin cuerpo y el listado ni siquiera se consulta.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+
+def _validadores(request, *partes, ultimo):
+    huella = '|'.join([
+        request.get_full_path(), str(request.user.pk), *map(str, partes), ultimo.isoformat() if ultimo else '',
+    ])
+    etag = quote_etag(hashlib.sha1(huella.encode()).hexdigest())
+    return etag, int(ultimo.timestamp()) if ultimo else None
+
+
+def responder(request, etag, last_modified, generar):
+    """304 si los validadores del cliente siguen valiendo; si no, generar() con ellos puestos."""
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = generar()
+        if response.status_code != 200:
+            return response
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # El contenido depende del usuario (sus favoritos, o los pendientes si modera)
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+class GetCondicionalMixin:
+    """
+    Para vistas genéricas y viewsets de DRF. `campo_modificacion` es el campo
+    de fecha que cambia con cada escritura del modelo.
+    """
+    campo_modificacion = 'actualizado_en'
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        datos = queryset.order_by().aggregate(n=Count('pk'), ultimo=Max(self.campo_modificacion))
+        etag, last_modified = _validadores(request, datos['n'], ultimo=datos['ultimo'])
+        return responder(request, etag, last_modified, lambda: super(GetCondicionalMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        instancia = self.get_object()
+        etag, last_modified = _validadores(request, instancia.pk, ultimo=getattr(instancia, self.campo_modificacion))
+        return responder(request, etag, last_modified, lambda: Response(self.get_serializer(instancia).data))
@@ -0,0 +1,83 @@
+from django.db.models import Case, When
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+from rest_framework.permissions import SAFE_METHODS
+
+class FiltroExacto(BaseFilterBackend):
+    """Filtra por igualdad con los campos de view.filtros_exactos (ej: ?estado=pendiente)."""
+    def filter_queryset(self, request, queryset, view):
+        filtros = {
+            campo: request.query_params[campo]
+            for campo in getattr(view, 'filtros_exactos', [])
+            if request.query_params.get(campo)
+        }
+        return queryset.filter(**filtros)
+
+class OrdenEstable(OrderingFilter):
+    """OrderingFilter (?ordering=) que desempata por id para que las páginas no se solapen."""
+    def get_ordering(self, request, queryset, view):
+        orden = super().get_ordering(request, queryset, view)
+        if orden and not {'id', '-id'} & set(orden):
+            orden = [*orden, 'id']
+        return orden
+
+class FiltroIds(BaseFilterBackend):
+    """
+    Multi-get: ?ids=3,1,2 devuelve esos registros en una sola consulta por
+    clave primaria (IN), en el mismo orden en que se pidieron. Los que no
+    existen o no son visibles para el usuario se omiten.
+    """
+    max_ids = 100
+
+    def filter_queryset(self, request, queryset, view):
+        valor = request.query_params.get('ids')
+        if valor is None:
+            return queryset
+        try:
+            ids = list(dict.fromkeys(int(i) for i in valor.split(',') if i.strip()))
+        except ValueError:
+            raise ValidationError({'ids': 'Debe ser una lista de enteros separados por comas.'})
+        if len(ids) > self.max_ids:
+            raise ValidationError({'ids': f'Como máximo {self.max_ids} ids por petición.'})
+        orden = Case(*[When(pk=pk, then=posicion) for posicion, pk in enumerate(ids)])
+        return queryset.filter(pk__in=ids).order_by(orden)
+
+class FiltroCampos(BaseFilterBackend):
+    """
+    Proyección de la respuesta en lecturas:
+    - ?view=map|card|full: conjuntos de campos con nombre (view.vistas).
+    - ?fields=id,nombre,...: campos sueltos del serializer.
+
+    Deja en view.campos los campos pedidos (el serializer quita el resto) y
+    carga con .only() solo las columnas que esos campos necesitan, más las del
+    orden y la de modificación (el ETag del detalle). Va el último de
+    filter_backends para ver ya el orden definitivo.
+    """
+    def campos_pedidos(self, request, view):
+        disponibles = view.get_serializer_class()().fields
+        fields = request.query_params.get('fields')
+        if fields:
+            campos = [c.strip() for c in fields.split(',') if c.strip()]
+            desconocidos = [c for c in campos if c not in disponibles]
+            if desconocidos:
+                raise ValidationError({'fields': f"Campos desconocidos: {', '.join(desconocidos)}."})
+            return ['id', *(c for c in campos if c != 'id')]
+        nombre = request.query_params.get('view')
+        if nombre is None:
+            return None
+        if nombre not in view.vistas:
+            raise ValidationError({'view': f"Debe ser una de: {', '.join(view.vistas)}."})
+        return view.vistas[nombre]
+
+    def filter_queryset(self, request, queryset, view):
+        if request.method not in SAFE_METHODS:
+            return queryset
+        view.campos = self.campos_pedidos(request, view)
+        if view.campos is None:
+            return queryset
+        columnas_de = view.get_serializer_class().columnas
+        columnas = {columna for campo in view.campos for columna in columnas_de.get(campo, (campo,))}
+        columnas |= {orden.lstrip('-') for orden in queryset.query.order_by if isinstance(orden, str)}
+        columnas.add(getattr(view, 'campo_modificacion', 'id'))
+        modelo = {f.name for f in queryset.model._meta.concrete_fields}
+        return queryset.only(*(columnas & modelo))
@@ -0,0 +1,18 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
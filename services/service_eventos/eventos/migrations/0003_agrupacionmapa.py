@@ -0,0 +1,83 @@
+import math
+from collections import defaultdict
+
+from django.db import migrations, models
+
+# Copia de la rejilla de eventos/teselas.py tal como era al crear la tabla: una
+# migración no debe importar el código vivo de la app (modelos y señales
+# actuales). Si teselas.py cambia de rejilla, lo recalcula teselas.reconstruir().
+ZOOM_AGRUPACION = 16
+BITS_CASILLA = 3
+LAT_MAX = 85.0511287798
+
+def _global(lat, lng, zoom):
+    n = 1 << zoom
+    lat = max(-LAT_MAX, min(LAT_MAX, lat))
+    seno = math.sin(math.radians(lat))
+    x = (lng + 180.0) / 360.0 * n
+    y = (0.5 - math.log((1 + seno) / (1 - seno)) / (4 * math.pi)) * n
+    return min(max(int(x), 0), n - 1), min(max(int(y), 0), n - 1)
+
+def casillas(lat, lng):
+    """(zoom, x, y, casilla) del punto en cada zoom de la agrupación."""
+    gx, gy = _global(lat, lng, ZOOM_AGRUPACION + BITS_CASILLA)
+    mascara = (1 << BITS_CASILLA) - 1
+    for zoom in range(ZOOM_AGRUPACION + 1):
+        cx, cy = gx >> (ZOOM_AGRUPACION - zoom), gy >> (ZOOM_AGRUPACION - zoom)
+        casilla = (cy & mascara) << BITS_CASILLA | (cx & mascara)
+        yield zoom, cx >> BITS_CASILLA, cy >> BITS_CASILLA, casilla
+
+
+def rellenar(apps, schema_editor):
+    """Carga inicial de los contadores con los eventos publicados que ya existen."""
+    Evento = apps.get_model('eventos', 'Evento')
+    AgrupacionMapa = apps.get_model('eventos', 'AgrupacionMapa')
+    grupos = defaultdict(lambda: [0, 0.0, 0.0])
+    publicados = Evento.objects.filter(
+        estado='publicado', lat__isnull=False, lng__isnull=False
+    ).values_list('lat', 'lng', 'categoria')
+    for lat, lng, categoria in publicados.iterator(chunk_size=2000):
+        for clave in casillas(lat, lng):
+            grupo = grupos[(*clave, categoria)]
+            grupo[0] += 1
+            grupo[1] += lat
+            grupo[2] += lng
+    AgrupacionMapa.objects.bulk_create(
+        (
+            AgrupacionMapa(zoom=z, x=x, y=y, casilla=c, categoria=cat, total=t, suma_lat=sl, suma_lng=sg)
+            for (z, x, y, c, cat), (t, sl, sg) in grupos.items()
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0002_evento_actualizado_en'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['lat', 'lng'], name='idx_evento_coordenadas'),
+        ),
+        migrations.CreateModel(
+            name='AgrupacionMapa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zoom', models.PositiveSmallIntegerField()),
+                ('x', models.IntegerField()),
+                ('y', models.IntegerField()),
+                ('casilla', models.PositiveSmallIntegerField()),
+                ('categoria', models.CharField(choices=[('concierto', 'Concierto'), ('exposicion', 'Exposición'), ('teatro', 'Teatro'), ('charla', 'Charla/Conferencia'), ('fiesta', 'Fiesta popular'), ('otros', 'Otros')], max_length=20)),
+                ('total', models.IntegerField(default=0)),
+                ('suma_lat', models.FloatField(default=0)),
+                ('suma_lng', models.FloatField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('zoom', 'x', 'y', 'casilla', 'categoria'), name='uniq_agrupacion_mapa')],
+            },
+        ),
+        migrations.RunPython(rellenar, migrations.RunPython.noop),
+    ]
@@ -50,11 +50,40 @@ class Evento(models.Model):
 
     creado_por_id = models.IntegerField(db_index=True)
     creado_en = models.DateTimeField(auto_now_add=True)
+    # Cambia en cada escritura: da el ETag / Last-Modified de la API
+    actualizado_en = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = _("Evento")
         verbose_name_plural = _("Eventos")
         ordering = ["fecha_inicio"]
+        indexes = [
+            # Puntos de una tesela del mapa (ver teselas.py)
+            models.Index(fields=["lat", "lng"], name="idx_evento_coordenadas"),
+        ]
 
     def __str__(self):
-        return f"{self.nombre} ({self.fecha_inicio})"
\ No newline at end of file
+        return f"{self.nombre} ({self.fecha_inicio})"
+
+class AgrupacionMapa(models.Model):
+    """
+    Eventos publicados por zoom, tesela, casilla de la rejilla 8 x 8 y
+    categoría, con la suma de sus coordenadas para el centroide. La mantiene
+    teselas.py.
+    """
+    zoom = models.PositiveSmallIntegerField()
+    x = models.IntegerField()
+    y = models.IntegerField()
+    casilla = models.PositiveSmallIntegerField()
+    categoria = models.CharField(max_length=20, choices=CategoriaEvento.choices)
+    total = models.IntegerField(default=0)
+    suma_lat = models.FloatField(default=0)
+    suma_lng = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            # Destino del upsert y a la vez el índice de lectura de una tesela
+            models.UniqueConstraint(
+                fields=["zoom", "x", "y", "casilla", "categoria"], name="uniq_agrupacion_mapa"
+            ),
+        ]
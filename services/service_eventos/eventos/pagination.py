@@ -0,0 +1,8 @@
+from rest_framework.pagination import LimitOffsetPagination
+
+class PaginacionOpcional(LimitOffsetPagination):
+    """
+    Paginación limit/offset que solo se activa si el cliente envía ?limit=.
+    Sin ese parámetro el listado sale completo, como hasta ahora.
+    """
+    max_limit = 1000
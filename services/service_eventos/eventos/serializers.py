@@ -1,8 +1,27 @@
 from rest_framework import serializers
 from .models import Evento
 
-class EventoSerializer(serializers.ModelSerializer):
+class CamposPedidosMixin:
+    """
+    Serializa solo los campos de view.campos (?view= / ?fields=, ver
+    FiltroCampos). `columnas` dice qué columnas del modelo necesita cada campo
+    que no es una columna con su mismo nombre.
+    """
+    columnas = {}
+
+    def get_fields(self):
+        campos = super().get_fields()
+        pedidos = getattr(self.context.get('view'), 'campos', None)
+        if pedidos is None:
+            return campos
+        return {nombre: campo for nombre, campo in campos.items() if nombre in pedidos}
+
+class EventoSerializer(CamposPedidosMixin, serializers.ModelSerializer):
     class Meta:
         model = Evento
         fields = '__all__'
-        read_only_fields = ['estado', 'creado_por_id', 'creado_en']
\ No newline at end of file
+        read_only_fields = ['estado', 'creado_por_id', 'creado_en']
+
+class IdsLoteSerializer(serializers.Serializer):
+    """Cuerpo de la moderación en lote: {"ids": [1, 2, 3]}."""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), min_length=1, max_length=1000)
@@ -1,13 +1,20 @@
+import importlib
+
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase
 from rest_framework import status
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from . import teselas
 from .models import Evento, EstadoEvento, CategoriaEvento
 from django.utils import timezone
 
 class EventoAPITests(APITestCase):
 
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(username='testuser', password='password123')
 
         self.evento = Evento.objects.create(
@@ -48,4 +55,127 @@ class EventoAPITests(APITestCase):
         nuevo = Evento.objects.latest('creado_en')
         self.assertEqual(nuevo.estado, EstadoEvento.PENDIENTE)
         # Nota: Si en la vista pusiste 'creado_por_id=1' fijo, esto será 1.
-        # Si pusiste self.request.user.id, será self.user.id.
\ No newline at end of file
+        # Si pusiste self.request.user.id, será self.user.id.
+
+    def test_get_eventos_paginados(self):
+        """Con ?limit= la lista sale paginada"""
+        response = self.client.get(self.list_url, {'limit': 10})
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['nombre'], "Concierto Test")
+
+    def test_total_eventos_filtrado(self):
+        """El total respeta los filtros sin listar los eventos"""
+        total_url = reverse('evento-total')
+        self.assertEqual(self.client.get(total_url).data['total'], 1)
+        self.assertEqual(self.client.get(total_url, {'categoria': 'teatro'}).data['total'], 0)
+
+    def test_multi_get_por_ids(self):
+        """?ids= devuelve los eventos pedidos en su orden, en una sola consulta (más la del ETag)"""
+        otro = Evento.objects.create(
+            nombre="Teatro Test", descripcion="-", fecha_inicio=timezone.now(),
+            lat=37.2, lng=-3.2, categoria=CategoriaEvento.TEATRO,
+            estado=EstadoEvento.PUBLICADO, creado_por_id=self.user.id
+        )
+        with self.assertNumQueries(2):
+            response = self.client.get(self.list_url, {'ids': f"{otro.id},{self.evento.id}"})
+        self.assertEqual([e['id'] for e in response.data], [otro.id, self.evento.id])
+        self.assertEqual(self.client.get(self.list_url, {'ids': 'a'}).status_code, 400)
+
+    def test_proyeccion_view_y_fields(self):
+        """?view= y ?fields= recortan la respuesta y las columnas leídas"""
+        response = self.client.get(self.list_url, {'view': 'map'})
+        self.assertEqual(set(response.data[0]), {'id', 'nombre', 'categoria', 'lat', 'lng'})
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(self.list_url, {'fields': 'nombre,fecha_inicio'})
+        self.assertEqual(set(response.data[0]), {'id', 'nombre', 'fecha_inicio'})
+        self.assertNotIn('"descripcion"', consultas[-1]['sql'])
+
+        self.assertEqual(self.client.get(self.list_url, {'view': 'mini'}).status_code, 400)
+        self.assertEqual(self.client.get(self.list_url, {'fields': 'clave'}).status_code, 400)
+
+    def test_crear_y_moderar_en_lote(self):
+        """Alta en un solo INSERT y aprobación en un solo UPDATE, con resultado por item"""
+        moderador = User(id=7, username='moderador')
+        moderador.rol = 'admin'
+        self.client.force_authenticate(user=moderador)
+        datos = [
+            {"nombre": "Uno", "descripcion": "-", "fecha_inicio": "2025-11-15T21:00:00Z",
+             "lat": 37.17, "lng": -3.59, "categoria": "concierto"},
+            {"nombre": "Dos", "descripcion": "-", "categoria": "teatro"},
+        ]
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('evento-crear-lote'), datos, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        uno, dos = response.data['resultados']
+        self.assertIn('fecha_inicio', dos['errores'])
+        self.assertEqual(Evento.objects.get(pk=uno['id']).estado, EstadoEvento.PENDIENTE)
+
+        response = self.client.put(reverse('evento-aprobar-lote'), {'ids': [uno['id'], 999]}, format='json')
+        self.assertEqual(response.data['actualizados'], 1)
+        self.assertEqual(response.data['resultados'][1]['ok'], False)
+        self.assertEqual(Evento.objects.get(pk=uno['id']).estado, EstadoEvento.PUBLICADO)
+
+        moderador.rol = 'usuario'
+        response = self.client.put(reverse('evento-rechazar-lote'), {'ids': [uno['id']]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_get_condicional(self):
+        """Con un ETag vigente el servicio contesta 304 sin cuerpo; al moderar cambia"""
+        etag = self.client.get(self.list_url)['ETag']
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+        detalle = reverse('evento-detail', args=[self.evento.id])
+        etag_detalle = self.client.get(detalle)['ETag']
+        self.assertEqual(self.client.get(detalle, HTTP_IF_NONE_MATCH=etag_detalle).status_code, 304)
+
+        moderador = User(id=7, username='moderador')
+        moderador.rol = 'admin'
+        self.client.force_authenticate(user=moderador)
+        self.client.put(reverse('evento-rechazar-lote'), {'ids': [self.evento.id]}, format='json')
+        self.assertEqual(self.client.get(detalle, HTTP_IF_NONE_MATCH=etag_detalle).status_code, 200)
+
+    def test_cache_publica_sin_sql_e_invalidada_al_escribir(self):
+        """Los anónimos reciben la respuesta guardada sin consultas hasta que algo cambia"""
+        self.client.get(self.list_url)
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(self.list_url), "Concierto Test")
+
+        self.evento.nombre = "Concierto Cambiado"
+        self.evento.save()
+        self.assertContains(self.client.get(self.list_url), "Concierto Cambiado")
+
+    def test_teselas_del_mapa(self):
+        """Grupos por tesela con total por categoría, al día tras moderar en lote"""
+        url = reverse('evento-tesela', kwargs={'z': 0, 'x': 0, 'y': 0})
+        otros = Evento.objects.bulk_create([
+            Evento(nombre=f"E{i}", descripcion="-", fecha_inicio=timezone.now(), lat=37.1 + i / 100,
+                   lng=-3.1, categoria=CategoriaEvento.TEATRO, creado_por_id=1)
+            for i in range(3)
+        ])
+        self.user.rol = 'admin'
+        self.client.force_authenticate(user=self.user)
+        self.client.put(reverse('evento-aprobar-lote'), {'ids': [e.id for e in otros]}, format='json')
+        self.client.force_authenticate(user=None)
+
+        with self.settings(MAPA_PUNTOS_TESELA=2):
+            grupo, = self.client.get(url).data['features']
+            self.assertEqual(grupo['properties']['categorias'], {'concierto': 1, 'teatro': 3})
+            self.evento.estado = EstadoEvento.CANCELADO
+            self.evento.save()
+            grupo, = self.client.get(url).data['features']
+            self.assertEqual(grupo['properties']['total'], 3)
+
+        # Con pocos eventos van sueltos (la tesela guardada era de otro umbral)
+        cache.clear()
+        puntos = self.client.get(url).data['features']
+        self.assertEqual(sorted(p['properties']['id'] for p in puntos), [e.id for e in otros])
+        self.assertEqual(self.client.get(reverse('evento-tesela', kwargs={'z': 1, 'x': 2, 'y': 0})).status_code, 400)
+
+    def test_la_migracion_usa_la_misma_rejilla(self):
+        """La carga inicial lleva su copia de la rejilla: debe dar las mismas casillas"""
+        migracion = importlib.import_module('eventos.migrations.0003_agrupacionmapa')
+        for lat, lng in [(37.18, -3.6), (89.9, 180.0), (-89.9, -180.0)]:
+            self.assertEqual(list(migracion.casillas(lat, lng)), list(teselas.casillas(lat, lng)))
@@ -0,0 +1,18 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interacciones', '0002_alter_favorito_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voto',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -47,6 +47,8 @@ class Voto(models.Model):
     
     valor = models.SmallIntegerField() # 1 a 5 estrellas
     creado_en = models.DateTimeField(auto_now_add=True)
+    # Cambia en cada upsert: permite detectar votos modificados sin listarlos
+    actualizado_en = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = _("Voto")
@@ -106,4 +106,67 @@ class InteraccionesAPITests(APITestCase):
         # 2. Quitar Like (Borrar)
         response = self.client.post(self.favoritos_toggle_url, data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertFalse(Favorito.objects.filter(usuario_id=user.id, evento_id=self.evento_id_prueba).exists())
\ No newline at end of file
+        self.assertFalse(Favorito.objects.filter(usuario_id=user.id, evento_id=self.evento_id_prueba).exists())
+
+    # --- TEST HUELLA DE INTERACCIONES ---
+
+    def test_huella_cambia_con_cada_interaccion(self):
+        """La huella cambia al dar like, al votar y al cambiar el voto, y las escrituras la devuelven."""
+        from django.contrib.auth.models import User
+        user = User.objects.create_user(username='snapshot', password='password')
+        self.client.force_authenticate(user=user)
+        huella_url = reverse('mis-interacciones-huella')
+
+        inicial = self.client.get(huella_url).data['huella']
+
+        response = self.client.post(self.favoritos_toggle_url, {'lugar_id': self.lugar_id_prueba})
+        tras_favorito = response.data['huella']
+        self.assertNotEqual(tras_favorito, inicial)
+
+        response = self.client.post(self.votar_url, {'lugar_id': self.lugar_id_prueba, 'valor': 4})
+        tras_voto = response.data['huella']
+        self.assertNotEqual(tras_voto, tras_favorito)
+
+        response = self.client.post(self.votar_url, {'lugar_id': self.lugar_id_prueba, 'valor': 2})
+        self.assertNotEqual(response.data['huella'], tras_voto)
+        self.assertEqual(self.client.get(huella_url).data['huella'], response.data['huella'])
+
+    # --- TEST GET CONDICIONAL ---
+
+    def test_mis_votos_y_comentarios_responden_304(self):
+        """Con el ETag vigente no se reenvía la lista; un cambio de voto lo invalida."""
+        from django.contrib.auth.models import User
+        user = User.objects.create_user(username='condicional', password='password')
+        self.client.force_authenticate(user=user)
+        self.client.post(self.votar_url, {'lugar_id': self.lugar_id_prueba, 'valor': 4})
+
+        etag = self.client.get(self.mis_votos_url)['ETag']
+        response = self.client.get(self.mis_votos_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+        self.client.post(self.votar_url, {'lugar_id': self.lugar_id_prueba, 'valor': 2})
+        self.assertEqual(self.client.get(self.mis_votos_url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+        etag = self.client.get(self.comentarios_lugar_url)['ETag']
+        self.assertEqual(self.client.get(self.comentarios_lugar_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.client.post(self.comentarios_lugar_url, {'texto': 'Nuevo'})
+        self.assertEqual(self.client.get(self.comentarios_lugar_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    # --- TEST EXPORTACIÓN ---
+
+    def test_export_votos_solo_staff_y_paginado(self):
+        """Solo organizadores/admin exportan, y el listado se pagina con ?limit=."""
+        from django.contrib.auth.models import User
+        user = User.objects.create_user(username='staff', password='password')
+        for lugar_id in (1, 2, 3):
+            Voto.objects.create(usuario_id=9, lugar_id=lugar_id, valor=3)
+        url = reverse('export-votos')
+
+        self.client.force_authenticate(user=user)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        user.rol = 'admin'
+        response = self.client.get(url, {'limit': 2})
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([v['lugar_id'] for v in response.data['results']], [1, 2])
@@ -5,7 +5,11 @@ from .views import (
     FavoritoToggleView, 
     FavoritoListView,
     VotoListView,     
-    VotoResumenView    
+    VotoResumenView,
+    HuellaInteraccionesView,
+    ComentarioExportView,
+    VotoExportView,
+    FavoritoExportView
 )
 
 urlpatterns = [
@@ -20,5 +24,11 @@ urlpatterns = [
 
     # Consultas de Datos
     path('mis-votos/', VotoListView.as_view(), name='mis-votos'),
+    path('mis-interacciones/huella/', HuellaInteraccionesView.as_view(), name='mis-interacciones-huella'),
     path('votos/resumen/<str:tipo>/<int:pk>/', VotoResumenView.as_view(), name='voto-resumen'),
+
+    # Exportación (staff)
+    path('export/comentarios/', ComentarioExportView.as_view(), name='export-comentarios'),
+    path('export/votos/', VotoExportView.as_view(), name='export-votos'),
+    path('export/favoritos/', FavoritoExportView.as_view(), name='export-favoritos'),
 ]
\ No newline at end of file
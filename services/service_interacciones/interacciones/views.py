@@ -2,12 +2,28 @@ from rest_framework import generics, permissions, status, views
 from rest_framework.response import Response
 from .models import Comentario, Voto, Favorito
 from .serializers import ComentarioSerializer, VotoSerializer, FavoritoSerializer
-from django.db.models import Avg, Count
+from .permissions import IsOrganizadorOrAdmin
+from .pagination import PaginacionOpcional
+from .condicional import GetCondicionalMixin
+from django.db.models import Avg, Count, Max
+
+def huella_interacciones(usuario_id):
+    """
+    Resumen barato de los favoritos y votos de un usuario: cambia con cada alta,
+    baja o cambio de voto, así el frontend sabe si su copia sigue siendo válida
+    sin descargar las listas completas.
+    """
+    favs = Favorito.objects.filter(usuario_id=usuario_id).aggregate(n=Count('id'), ultimo=Max('id'))
+    votos = Voto.objects.filter(usuario_id=usuario_id).aggregate(n=Count('id'), ultimo=Max('actualizado_en'))
+    ultimo_voto = votos['ultimo'].timestamp() if votos['ultimo'] else 0
+    return f"{favs['n']}.{favs['ultimo'] or 0}.{votos['n']}.{ultimo_voto}"
 
 # --- COMENTARIOS ---
-class ComentarioListCreateView(generics.ListCreateAPIView):
+class ComentarioListCreateView(GetCondicionalMixin, generics.ListCreateAPIView):
     serializer_class = ComentarioSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    # Los comentarios no se editan: basta con la fecha de alta
+    campo_modificacion = 'creado_en'
 
     def get_queryset(self):
         # Detectamos si piden comentarios de lugar o evento por los query params
@@ -55,7 +71,8 @@ class VotoUpsertView(generics.GenericAPIView):
         )
         
         status_code = status.HTTP_201_CREATED if created else status.HTTP_200_OK
-        return Response(VotoSerializer(voto).data, status=status_code)
+        datos = dict(VotoSerializer(voto).data, huella=huella_interacciones(request.user.id))
+        return Response(datos, status=status_code)
 
 # --- FAVORITOS ---
 class FavoritoToggleView(views.APIView):
@@ -77,18 +94,19 @@ class FavoritoToggleView(views.APIView):
 
         if not created:
             favorito.delete()
-            return Response({'status': 'eliminado'}, status=status.HTTP_200_OK)
+            return Response({'status': 'eliminado', 'huella': huella_interacciones(request.user.id)}, status=status.HTTP_200_OK)
         
-        return Response({'status': 'creado'}, status=status.HTTP_201_CREATED)
+        return Response({'status': 'creado', 'huella': huella_interacciones(request.user.id)}, status=status.HTTP_201_CREATED)
 
-class FavoritoListView(generics.ListAPIView):
+class FavoritoListView(GetCondicionalMixin, generics.ListAPIView):
     serializer_class = FavoritoSerializer
     permission_classes = [permissions.IsAuthenticated]
+    campo_modificacion = 'creado_en'
 
     def get_queryset(self):
         return Favorito.objects.filter(usuario_id=self.request.user.id)
     
-class VotoListView(generics.ListAPIView):
+class VotoListView(GetCondicionalMixin, generics.ListAPIView):
     """Devuelve los votos del usuario actual"""
     serializer_class = VotoSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -96,6 +114,13 @@ class VotoListView(generics.ListAPIView):
     def get_queryset(self):
         return Voto.objects.filter(usuario_id=self.request.user.id)
 
+class HuellaInteraccionesView(views.APIView):
+    """Devuelve la huella de las interacciones del usuario actual"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response({'huella': huella_interacciones(request.user.id)})
+
 class VotoResumenView(views.APIView):
     """Devuelve la nota media y el total de votos de un recurso"""
     permission_classes = [permissions.AllowAny]
@@ -119,4 +144,22 @@ class VotoResumenView(views.APIView):
         return Response({
             'media': round(datos['media'], 1) if datos['media'] else 0,
             'total': datos['total']
-        })
\ No newline at end of file
+        })
+
+# --- EXPORTACIÓN (solo organizadores y admin) ---
+class ExportacionView(generics.ListAPIView):
+    """Listado completo de una tabla, ordenado por id para paginarlo con ?limit="""
+    permission_classes = [IsOrganizadorOrAdmin]
+    pagination_class = PaginacionOpcional
+
+    def get_queryset(self):
+        return self.serializer_class.Meta.model.objects.order_by('id')
+
+class ComentarioExportView(ExportacionView):
+    serializer_class = ComentarioSerializer
+
+class VotoExportView(ExportacionView):
+    serializer_class = VotoSerializer
+
+class FavoritoExportView(ExportacionView):
+    serializer_class = FavoritoSerializer
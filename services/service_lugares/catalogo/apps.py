@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CatalogoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'catalogo'
+
+    def ready(self):
+        # Conecta las señales que invalidan la caché pública y las teselas del mapa
+        from . import cache_publica, teselas  # noqa: F401
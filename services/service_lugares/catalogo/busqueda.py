@@ -0,0 +1,59 @@
+"""
+Búsqueda de texto completo (?q=) sobre nombre, dirección y descripción.
+
+Cada motor usa su índice de texto, creado y mantenido por la migración 0004
+con triggers (así se actualiza en cualquier escritura, también en las masivas):
+
+- Postgres: columna `busqueda` (tsvector) con índice GIN, calculada con la
+  configuración es_unaccent (diccionario español + unaccent). Los términos se
+  interpretan con websearch_to_tsquery y se ordena con ts_rank_cd.
+- SQLite: tabla virtual FTS5 catalogo_lugar_fts (unicode61 sin tildes), unida
+  a los lugares por rowid (modelo LugarTexto). FTS5 no trae raíces en español,
+  así que cada término se busca como prefijo ("museo" encuentra "museos") y se
+  ordena con su `rank` (bm25).
+
+En los dos casos pesa más el nombre que la dirección, y esta más que la
+descripción. La relevancia queda anotada en `relevancia` (mayor es mejor).
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, F, FloatField, Lookup, Value
+from django.db.models.expressions import RawSQL
+
+from .models import LugarTexto
+
+CONFIG_PG = 'es_unaccent'
+
+class Coincide(Lookup):
+    """indice__coincide='...' -> MATCH de FTS5."""
+    lookup_name = 'coincide'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+LugarTexto._meta.get_field('indice').register_lookup(Coincide)
+
+def _terminos(texto):
+    return re.findall(r'\w+', texto)
+
+def _consulta_fts(texto):
+    """Consulta FTS5 segura: cada palabra entre comillas y como prefijo (AND implícito)."""
+    return ' '.join(f'"{t}"*' for t in _terminos(texto))
+
+def buscar(queryset, texto):
+    """Filtra el queryset por el texto y anota su `relevancia`."""
+    if not _terminos(texto):
+        return queryset.annotate(relevancia=Value(0.0, output_field=FloatField())).none()
+    if connections[queryset.db].vendor == 'postgresql':
+        tabla = queryset.model._meta.db_table
+        consulta = f"websearch_to_tsquery('{CONFIG_PG}', %s)"
+        return queryset.filter(
+            RawSQL(f'"{tabla}"."busqueda" @@ {consulta}', (texto,), output_field=BooleanField())
+        ).annotate(
+            relevancia=RawSQL(f'ts_rank_cd("{tabla}"."busqueda", {consulta})', (texto,), output_field=FloatField())
+        )
+    # rank es bm25 (negativo, más negativo = mejor): lo invertimos
+    return queryset.filter(texto__indice__coincide=_consulta_fts(texto)).annotate(relevancia=-F('texto__rank'))
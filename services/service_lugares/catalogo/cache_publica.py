@@ -0,0 +1,77 @@
+"""
+Caché de las respuestas públicas del catálogo (listados y detalles de los
+visitantes anónimos), ya serializadas y con sus validadores (ETag y
+Last-Modified), así que una petición que acierta no hace ninguna consulta SQL.
+
+Las claves llevan un número de versión del catálogo. Cualquier escritura en un
+lugar (alta, edición, aprobación, rechazo, borrado, también en lote) sube la
+versión y con eso deja inservibles todas las entradas a la vez, sin buscar ni
+borrar claves: las viejas caducan solas (CATALOGO_CACHE_TTL).
+
+La versión se sube al escribir y otra vez al confirmar la transacción, para que
+una lectura que se cuele entre medias no deje guardados datos sin confirmar.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+from .condicional import responder
+from .models import Lugar
+
+CLAVE_VERSION = 'catalogo-publico:lugares:version'
+
+def version():
+    v = cache.get(CLAVE_VERSION)
+    if v is None:
+        # Se empieza en el instante actual: si Redis perdió la versión, la nueva
+        # no coincide con ninguna de las que ya usaron las entradas guardadas
+        cache.add(CLAVE_VERSION, time.time_ns(), None)
+        v = cache.get(CLAVE_VERSION)
+    return v
+
+def _subir_version():
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.add(CLAVE_VERSION, time.time_ns(), None)
+
+def invalidar():
+    """Invalida todas las respuestas públicas guardadas (ahora y al confirmar)."""
+    _subir_version()
+    transaction.on_commit(_subir_version)
+
+@receiver([post_save, post_delete], sender=Lugar)
+def _al_escribir_lugar(sender, **kwargs):
+    invalidar()
+
+def _clave(request):
+    url = hashlib.sha256(request.build_absolute_uri().encode()).hexdigest()
+    return f"catalogo-publico:lugares:{version()}:{url}"
+
+def servir(request, generar):
+    """
+    Para visitantes anónimos devuelve la respuesta guardada (o un 304 si el
+    cliente ya la tiene); si no hay, la genera con generar() y la guarda.
+    """
+    if request.user.is_authenticated or not settings.CATALOGO_CACHE_TTL:
+        return generar()
+    k = _clave(request)
+    entrada = cache.get(k)
+    if entrada is not None:
+        return responder(request, entrada['etag'], entrada['last_modified'], lambda: Response(entrada['datos']))
+
+    response = generar()
+    if response.status_code == 200:
+        cache.set(k, {
+            'datos': response.data,
+            'etag': response['ETag'],
+            'last_modified': parse_http_date_safe(response.get('Last-Modified', '')),
+        }, settings.CATALOGO_CACHE_TTL)
+    return response
@@ -0,0 +1,123 @@
+"""
+Índice espacial por código Morton (curva Z) para lugares.
+
+Cada lugar guarda en `celda` el entrelazado de bits de su latitud y longitud
+cuantizadas a una rejilla de 2^16 x 2^16 (unos 300 x 600 m en Granada). Los
+puntos cercanos tienen códigos cercanos, así que un bbox se traduce en unos
+pocos rangos de `celda` que el índice B-tree resuelve como escaneos de rango,
+igual en SQLite que en Postgres. Los rangos cubren algo más que el bbox: los
+candidatos se refinan después con las coordenadas exactas (y con haversine
+para las búsquedas por radio).
+"""
+import math
+
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+BITS = 16
+CELDAS = 1 << BITS
+RADIO_TIERRA_KM = 6371.0088
+KM_POR_GRADO = 111.32
+
+def _cuantizar(lat, lng):
+    y = min(int((lat + 90.0) / 180.0 * CELDAS), CELDAS - 1)
+    x = min(int((lng + 180.0) / 360.0 * CELDAS), CELDAS - 1)
+    return x, y
+
+def _separar_bits(v):
+    """Inserta un 0 entre cada bit de un entero de 16 bits."""
+    v &= 0xFFFF
+    v = (v | (v << 8)) & 0x00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F
+    v = (v | (v << 2)) & 0x33333333
+    v = (v | (v << 1)) & 0x55555555
+    return v
+
+def _morton(x, y):
+    return _separar_bits(x) | (_separar_bits(y) << 1)
+
+def celda(lat, lng):
+    """Código Morton de unas coordenadas, o None si faltan."""
+    if lat is None or lng is None:
+        return None
+    return _morton(*_cuantizar(lat, lng))
+
+def _rangos_caja(x0, y0, x1, y1):
+    """Rangos [desde, hasta] de códigos que cubren la caja de celdas, ordenados y fusionados."""
+    lado = max(x1 - x0 + 1, y1 - y0 + 1)
+    # Bajamos hasta nodos de ~1/4 del lado de la caja: pocos rangos y poco sobrante
+    nivel_max = BITS - max(0, int(math.log2(max(lado / 4, 1))))
+    rangos = []
+
+    def visitar(nivel, x, y):
+        tamano = 1 << (BITS - nivel)
+        nx0, ny0 = x * tamano, y * tamano
+        nx1, ny1 = nx0 + tamano - 1, ny0 + tamano - 1
+        if nx0 > x1 or nx1 < x0 or ny0 > y1 or ny1 < y0:
+            return
+        dentro = x0 <= nx0 and nx1 <= x1 and y0 <= ny0 and ny1 <= y1
+        if dentro or nivel == nivel_max:
+            desde = _morton(nx0, ny0)
+            hasta = desde + tamano * tamano - 1
+            if rangos and rangos[-1][1] + 1 == desde:
+                rangos[-1][1] = hasta
+            else:
+                rangos.append([desde, hasta])
+            return
+        # Hijos en orden Z: así los rangos salen ya ordenados
+        for hy in (0, 1):
+            for hx in (0, 1):
+                visitar(nivel + 1, 2 * x + hx, 2 * y + hy)
+
+    visitar(0, 0, 0)
+    return rangos
+
+def _cajas(oeste, sur, este, norte):
+    """Un bbox que cruza el antimeridiano (oeste > este) son dos cajas."""
+    if oeste <= este:
+        return [(oeste, sur, este, norte)]
+    return [(oeste, sur, 180.0, norte), (-180.0, sur, este, norte)]
+
+def filtro_bbox(oeste, sur, este, norte):
+    """Q con los rangos de celda (índice) y la comprobación exacta de coordenadas."""
+    filtro = Q()
+    for o, s, e, n in _cajas(oeste, sur, este, norte):
+        x0, y0 = _cuantizar(s, o)
+        x1, y1 = _cuantizar(n, e)
+        rangos = Q()
+        for desde, hasta in _rangos_caja(x0, y0, x1, y1):
+            rangos |= Q(celda__range=(desde, hasta))
+        filtro |= rangos & Q(lat__range=(s, n), lng__range=(o, e))
+    return filtro
+
+def bbox_de_radio(lat, lng, radio_km):
+    """Caja que contiene el círculo (oeste, sur, este, norte)."""
+    dlat = radio_km / KM_POR_GRADO
+    cos_lat = math.cos(math.radians(lat))
+    dlng = 180.0 if cos_lat < 1e-6 else min(180.0, radio_km / (KM_POR_GRADO * cos_lat))
+    sur, norte = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    if dlng >= 180.0:
+        return -180.0, sur, 180.0, norte
+    oeste, este = lng - dlng, lng + dlng
+    # Normalizamos al rango [-180, 180]; si se sale, el bbox cruza el antimeridiano
+    if oeste < -180.0:
+        oeste += 360.0
+    if este > 180.0:
+        este -= 360.0
+    return oeste, sur, este, norte
+
+def distancia_km(lat, lng):
+    """Expresión haversine (en km) desde el punto dado hasta cada lugar."""
+    lat0, lng0 = math.radians(lat), math.radians(lng)
+    dlat = Radians(F('lat')) - Value(lat0)
+    dlng = Radians(F('lng')) - Value(lng0)
+    a = Power(Sin(dlat / 2), 2) + Value(math.cos(lat0)) * Cos(Radians(F('lat'))) * Power(Sin(dlng / 2), 2)
+    # Least evita que el redondeo deje la raíz en 1.0000001 (fuera del dominio de asin)
+    return Value(2 * RADIO_TIERRA_KM) * ASin(Least(Sqrt(a), Value(1.0)), output_field=FloatField())
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Distancia en km entre dos puntos (versión Python de distancia_km)."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((p2 - p1) / 2) ** 2
+         + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * RADIO_TIERRA_KM * math.asin(math.sqrt(a))
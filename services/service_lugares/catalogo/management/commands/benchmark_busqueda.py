@@ -0,0 +1,87 @@
+"""
+Mide la búsqueda ?q= con un catálogo sintético grande.
+
+    python manage.py benchmark_busqueda --filas 1000000
+
+Inserta los lugares dentro de una transacción que se deshace al terminar (la
+base de datos queda como estaba) y lanza cada consulta varias veces, igual que
+la primera página de la API: filtro de visibles, orden por relevancia y 20
+resultados. Imprime la mediana, el p95 y el máximo por consulta.
+"""
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from catalogo import busqueda
+from catalogo.models import Categoria, EstadoAprobacion, Lugar
+
+PALABRAS = (
+    "plaza calle mirador jardín museo galería taller patio carmen fuente "
+    "palacio torre muralla iglesia convento aljibe puerta cuesta paseo río "
+    "vistas flamenco cerámica azulejo tapas vino artesanía libros música teatro "
+    "nazarí mudéjar barroco renacentista andalusí romántico histórico moderno"
+).split()
+BARRIOS = ["Albaicín", "Realejo", "Sacromonte", "Centro", "Zaidín", "Cartuja", "Chana", "Beiro"]
+
+# (texto buscado, qué mide)
+CONSULTAS = [
+    ("ceramica", "palabra frecuente, sin tilde"),
+    ("Albaicín mirador", "dos términos"),
+    ("nazari palacio torre", "tres términos"),
+    ("zxq4217", "término raro (pocos resultados)"),
+    ("inexistente", "sin resultados"),
+]
+
+class Command(BaseCommand):
+    help = "Mide la búsqueda de texto completo sobre un catálogo sintético (se deshace al terminar)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=1_000_000)
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument('--lote', type=int, default=5000)
+
+    def handle(self, *args, filas, repeticiones, lote, **options):
+        with transaction.atomic():
+            self._cargar(filas, lote)
+            self._medir(repeticiones)
+            transaction.set_rollback(True)
+
+    def _cargar(self, filas, lote):
+        rng = random.Random(42)
+        inicio = time.perf_counter()
+        for desde in range(0, filas, lote):
+            Lugar.objects.bulk_create([
+                Lugar(
+                    nombre=f"{rng.choice(PALABRAS).capitalize()} {rng.choice(BARRIOS)} {i}",
+                    descripcion=' '.join(rng.choices(PALABRAS, k=12)) + (f" zxq{i}" if i % 100_000 == 4217 else ''),
+                    direccion=f"Calle {rng.choice(PALABRAS).capitalize()} {rng.randint(1, 200)}, {rng.choice(BARRIOS)}",
+                    categoria=rng.choice(Categoria.values),
+                    estado=EstadoAprobacion.APROBADO,
+                    creado_por_id=1,
+                )
+                for i in range(desde, min(desde + lote, filas))
+            ], batch_size=lote)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE catalogo_lugar")
+        self.stdout.write(f"{filas} lugares cargados en {time.perf_counter() - inicio:.1f} s ({connection.vendor})")
+
+    def _medir(self, repeticiones):
+        visibles = Lugar.objects.filter(estado=EstadoAprobacion.APROBADO, publicado=True)
+        for texto, descripcion in CONSULTAS:
+            tiempos = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                resultados = list(busqueda.buscar(visibles, texto).order_by('-relevancia', 'id')[:20])
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            total = busqueda.buscar(visibles, texto).count()
+            tiempos.sort()
+            p95 = tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))]
+            self.stdout.write(
+                f"{texto!r:26} {descripcion:34} coincidencias={total:<8} "
+                f"mediana={statistics.median(tiempos):7.2f} ms  p95={p95:7.2f} ms  "
+                f"máx={tiempos[-1]:7.2f} ms  primera={resultados[0].nombre if resultados else '-'}"
+            )
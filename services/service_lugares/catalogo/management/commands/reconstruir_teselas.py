@@ -0,0 +1,20 @@
+"""
+Recalcula desde cero los contadores de las teselas del mapa.
+
+    python manage.py reconstruir_teselas
+
+Normalmente no hace falta (cada escritura los ajusta); sirve para repararlos
+si se cambiaron lugares por fuera de la API, con SQL a mano o un loaddata.
+"""
+from django.core.management.base import BaseCommand
+
+from catalogo import teselas
+from catalogo.models import AgrupacionMapa
+
+
+class Command(BaseCommand):
+    help = "Recalcula los contadores de las teselas del mapa a partir de los lugares."
+
+    def handle(self, *args, **options):
+        teselas.reconstruir()
+        self.stdout.write(f"{AgrupacionMapa.objects.count()} casillas del mapa recalculadas.")
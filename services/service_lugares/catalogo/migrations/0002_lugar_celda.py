@@ -0,0 +1,49 @@
+from django.db import migrations, models
+
+# Copia de la celda Morton de catalogo/geo.py tal como era al crear el campo:
+# una migración no debe importar el código vivo de la app. Si geo.py cambia de
+# rejilla, las celdas se recalculan en una migración nueva.
+BITS = 16
+CELDAS = 1 << BITS
+
+def _separar_bits(v):
+    v &= 0xFFFF
+    v = (v | (v << 8)) & 0x00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F
+    v = (v | (v << 2)) & 0x33333333
+    v = (v | (v << 1)) & 0x55555555
+    return v
+
+def celda(lat, lng):
+    y = min(int((lat + 90.0) / 180.0 * CELDAS), CELDAS - 1)
+    x = min(int((lng + 180.0) / 360.0 * CELDAS), CELDAS - 1)
+    return _separar_bits(x) | (_separar_bits(y) << 1)
+
+
+def calcular_celdas(apps, schema_editor):
+    Lugar = apps.get_model('catalogo', 'Lugar')
+    lugares = list(Lugar.objects.exclude(lat=None).exclude(lng=None).only('id', 'lat', 'lng'))
+    for lugar in lugares:
+        lugar.celda = celda(lugar.lat, lugar.lng)
+    Lugar.objects.bulk_update(lugares, ['celda'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0001_initial'),
+    ]
+
+    operations = [
+        # El índice (lat, lng) solo servía para rangos de latitud; lo sustituye celda
+        migrations.RemoveIndex(
+            model_name='lugar',
+            name='idx_lugar_coords',
+        ),
+        migrations.AddField(
+            model_name='lugar',
+            name='celda',
+            field=models.BigIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(calcular_celdas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0002_lugar_celda'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lugar',
+            index=models.Index(fields=['-creado_en', 'id'], name='idx_lugar_recientes'),
+        ),
+    ]
@@ -0,0 +1,125 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Postgres: tsvector con pesos (A nombre, B dirección, C descripción) + GIN
+VECTOR_PG = """
+    setweight(to_tsvector('es_unaccent', coalesce({t}.nombre, '')), 'A') ||
+    setweight(to_tsvector('es_unaccent', coalesce({t}.direccion, '')), 'B') ||
+    setweight(to_tsvector('es_unaccent', coalesce({t}.descripcion, '')), 'C')
+"""
+
+CREAR_PG = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """
+    DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'es_unaccent') THEN
+            CREATE TEXT SEARCH CONFIGURATION es_unaccent (COPY = spanish);
+            ALTER TEXT SEARCH CONFIGURATION es_unaccent
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+        END IF;
+    END $$
+    """,
+    "ALTER TABLE catalogo_lugar ADD COLUMN busqueda tsvector",
+    f"""
+    CREATE FUNCTION catalogo_lugar_busqueda() RETURNS trigger AS $$
+    BEGIN
+        NEW.busqueda := {VECTOR_PG.format(t='NEW')};
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER catalogo_lugar_busqueda BEFORE INSERT OR UPDATE OF nombre, direccion, descripcion
+    ON catalogo_lugar FOR EACH ROW EXECUTE FUNCTION catalogo_lugar_busqueda()
+    """,
+    f"UPDATE catalogo_lugar SET busqueda = {VECTOR_PG.format(t='catalogo_lugar')}",
+    "CREATE INDEX idx_lugar_busqueda ON catalogo_lugar USING GIN (busqueda)",
+]
+
+BORRAR_PG = [
+    "DROP TRIGGER IF EXISTS catalogo_lugar_busqueda ON catalogo_lugar",
+    "DROP FUNCTION IF EXISTS catalogo_lugar_busqueda()",
+    "ALTER TABLE catalogo_lugar DROP COLUMN IF EXISTS busqueda",
+]
+
+# SQLite: tabla FTS5 de contenido externo sincronizada con triggers
+COLUMNAS = "nombre, descripcion, direccion"
+NUEVAS = "new.nombre, new.descripcion, new.direccion"
+VIEJAS = "old.nombre, old.descripcion, old.direccion"
+
+CREAR_SQLITE = [
+    f"""
+    CREATE VIRTUAL TABLE catalogo_lugar_fts USING fts5(
+        {COLUMNAS}, content='catalogo_lugar', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3 4'
+    )
+    """,
+    # Pesos de nombre, descripción y dirección para el rank (se guarda en la tabla)
+    "INSERT INTO catalogo_lugar_fts(catalogo_lugar_fts, rank) VALUES ('rank', 'bm25(5.0, 1.0, 2.0)')",
+    f"""
+    CREATE TRIGGER catalogo_lugar_fts_ai AFTER INSERT ON catalogo_lugar BEGIN
+        INSERT INTO catalogo_lugar_fts(rowid, {COLUMNAS}) VALUES (new.id, {NUEVAS});
+    END
+    """,
+    f"""
+    CREATE TRIGGER catalogo_lugar_fts_ad AFTER DELETE ON catalogo_lugar BEGIN
+        INSERT INTO catalogo_lugar_fts(catalogo_lugar_fts, rowid, {COLUMNAS}) VALUES ('delete', old.id, {VIEJAS});
+    END
+    """,
+    f"""
+    CREATE TRIGGER catalogo_lugar_fts_au AFTER UPDATE OF {COLUMNAS} ON catalogo_lugar BEGIN
+        INSERT INTO catalogo_lugar_fts(catalogo_lugar_fts, rowid, {COLUMNAS}) VALUES ('delete', old.id, {VIEJAS});
+        INSERT INTO catalogo_lugar_fts(rowid, {COLUMNAS}) VALUES (new.id, {NUEVAS});
+    END
+    """,
+    "INSERT INTO catalogo_lugar_fts(catalogo_lugar_fts) VALUES ('rebuild')",
+]
+
+BORRAR_SQLITE = [
+    "DROP TRIGGER IF EXISTS catalogo_lugar_fts_ai",
+    "DROP TRIGGER IF EXISTS catalogo_lugar_fts_ad",
+    "DROP TRIGGER IF EXISTS catalogo_lugar_fts_au",
+    "DROP TABLE IF EXISTS catalogo_lugar_fts",
+]
+
+SENTENCIAS = {
+    'postgresql': (CREAR_PG, BORRAR_PG),
+    'sqlite': (CREAR_SQLITE, BORRAR_SQLITE),
+}
+
+
+def _ejecutar(schema_editor, indice):
+    # Otros motores se quedan sin ?q= (catalogo.busqueda solo sabe de estos dos)
+    sentencias = SENTENCIAS.get(schema_editor.connection.vendor)
+    for sql in sentencias[indice] if sentencias else []:
+        schema_editor.execute(sql)
+
+
+def crear_indice(apps, schema_editor):
+    _ejecutar(schema_editor, 0)
+
+
+def borrar_indice(apps, schema_editor):
+    _ejecutar(schema_editor, 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0003_lugar_idx_recientes'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, borrar_indice),
+        migrations.CreateModel(
+            name='LugarTexto',
+            fields=[
+                ('lugar', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='texto', serialize=False, to='catalogo.lugar')),
+                ('indice', models.TextField(db_column='catalogo_lugar_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'catalogo_lugar_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -2,6 +2,8 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from . import geo
+
 class Categoria(models.TextChoices):
     MIRADOR = "mirador", _("Mirador")
     BAR = "bar", _("Bar con encanto")
@@ -29,6 +31,8 @@ class Lugar(models.Model):
         validators=[MinValueValidator(-180.0), MaxValueValidator(180.0)],
         null=True, blank=True
     )
+    # Código Morton de (lat, lng) para las búsquedas por zona (ver geo.py)
+    celda = models.BigIntegerField(null=True, blank=True, editable=False, db_index=True)
 
     categoria = models.CharField(
         max_length=30, 
@@ -55,13 +59,60 @@ class Lugar(models.Model):
         verbose_name_plural = _("Lugares")
         ordering = ["-creado_en"]
         indexes = [
-            models.Index(fields=["lat", "lng"], name="idx_lugar_coords"),
             models.Index(fields=["categoria", "estado", "publicado"], name="idx_lugar_filtros"),
+            # Orden del listado y de la paginación por cursor
+            models.Index(fields=["-creado_en", "id"], name="idx_lugar_recientes"),
         ]
 
+    def save(self, *args, **kwargs):
+        self.celda = geo.celda(self.lat, self.lng)
+        if kwargs.get('update_fields') is not None and {'lat', 'lng'} & set(kwargs['update_fields']):
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'celda'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.nombre} ({self.categoria})"
 
     @property
     def esta_aprobado(self):
-        return self.estado == EstadoAprobacion.APROBADO
\ No newline at end of file
+        return self.estado == EstadoAprobacion.APROBADO
+
+class LugarTexto(models.Model):
+    """
+    Tabla virtual FTS5 con el texto de cada lugar, solo en SQLite (la crea y
+    la mantiene al día la migración 0004). Sirve para que busqueda.py una la
+    búsqueda con los lugares en la misma consulta.
+    """
+    lugar = models.OneToOneField(
+        Lugar, primary_key=True, db_column='rowid', related_name='texto',
+        on_delete=models.DO_NOTHING, db_constraint=False,
+    )
+    # Columna oculta con el nombre de la tabla, la que recibe el MATCH
+    indice = models.TextField(db_column='catalogo_lugar_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'catalogo_lugar_fts'
+
+class AgrupacionMapa(models.Model):
+    """
+    Lugares visibles por zoom, tesela, casilla de la rejilla 8 x 8 y categoría,
+    con la suma de sus coordenadas para el centroide. La mantiene teselas.py.
+    """
+    zoom = models.PositiveSmallIntegerField()
+    x = models.IntegerField()
+    y = models.IntegerField()
+    casilla = models.PositiveSmallIntegerField()
+    categoria = models.CharField(max_length=30, choices=Categoria.choices)
+    total = models.IntegerField(default=0)
+    suma_lat = models.FloatField(default=0)
+    suma_lng = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            # Destino del upsert y a la vez el índice de lectura de una tesela
+            models.UniqueConstraint(
+                fields=["zoom", "x", "y", "casilla", "categoria"], name="uniq_agrupacion_mapa"
+            ),
+        ]
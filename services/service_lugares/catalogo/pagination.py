@@ -0,0 +1,120 @@
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+def _invertir(orden):
+    return tuple(campo[1:] if campo.startswith('-') else f'-{campo}' for campo in orden)
+
+def _valor(registro, campo):
+    valor = registro[campo] if isinstance(registro, dict) else getattr(registro, campo)
+    # Fechas en ISO completo (con microsegundos): la posición tiene que ser exacta
+    return valor.isoformat() if hasattr(valor, 'isoformat') else valor
+
+def _despues_de(orden, posicion):
+    """
+    Filtro de los registros que van detrás de `posicion` en `orden`, comparando
+    la tupla entera: (a, b, id) > (x, y, z) es a > x, o a = x y b > y, o...
+    """
+    filtro, iguales = Q(), {}
+    for campo, valor in zip(orden, posicion):
+        nombre = campo.lstrip('-')
+        operador = 'lt' if campo.startswith('-') else 'gt'
+        filtro |= Q(**iguales, **{f'{nombre}__{operador}': valor})
+        iguales[nombre] = valor
+    return filtro
+
+
+class PaginacionCursor(CursorPagination):
+    """
+    Paginación por cursor sobre (-creado_en, id), que es lo que cubre el índice
+    idx_lugar_recientes. Cada página filtra por la posición del último registro
+    (WHERE creado_en < ...) en lugar de saltar filas con OFFSET, así cuesta lo
+    mismo la primera que la página mil, y los lugares que se crean mientras
+    alguien pagina caen antes de su cursor: no desplazan ni repiten resultados.
+
+    El cursor guarda la posición completa, todos los campos del orden hasta el
+    id, y no solo el primero como el CursorPagination de DRF: con muchos
+    empates (la misma distancia, relevancia o nombre) DRF tiene que saltarlos
+    con un offset limitado a offset_cutoff y, pasado ese límite, repite páginas
+    sin terminar nunca. Con la tupla entera cada posición es única.
+
+    - ?limit= fija el tamaño de página (como mucho max_page_size).
+    - Con ?ordering=, ?near= o ?q= el cursor sigue ese orden (nombre,
+      distancia, relevancia...).
+    - El multi-get (?ids=) ya está acotado a 100 y respeta el orden pedido,
+      así que sale sin paginar.
+    """
+    ordering = ('-creado_en', 'id')
+    page_size = 100
+    page_size_query_param = 'limit'
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if 'ids' in request.query_params:
+            return None
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        # Hacia atrás (enlace 'previous') se recorre el orden invertido y se da la vuelta a la página
+        atras = bool(self.cursor and self.cursor.reverse)
+        orden = _invertir(self.ordering) if atras else self.ordering
+        queryset = queryset.order_by(*orden)
+        if self.cursor:
+            queryset = queryset.filter(_despues_de(orden, self.cursor.position))
+
+        registros = list(queryset[:self.page_size + 1])
+        self.page = registros[:self.page_size]
+        hay_mas = len(registros) > self.page_size
+        if atras:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, hay_mas
+        else:
+            self.has_next, self.has_previous = hay_mas, self.cursor is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        # Sin ?ordering= explícito, las búsquedas siguen ordenadas por cercanía o relevancia
+        if not request.query_params.get('ordering'):
+            if request.query_params.get('near'):
+                return ('distancia', 'id')
+            if request.query_params.get('q', '').strip():
+                return ('-relevancia', 'id')
+        orden = super().get_ordering(request, queryset, view)
+        # La posición tiene que ser única: siempre termina en el id
+        if not {'id', '-id'} & set(orden):
+            orden = (*orden, 'id')
+        return orden
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None:
+            return None
+        try:
+            posicion = json.loads(cursor.position)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(posicion, list) or len(posicion) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=0, reverse=cursor.reverse, position=posicion)
+
+    def _enlace(self, registro, reverse):
+        posicion = json.dumps([_valor(registro, campo.lstrip('-')) for campo in self.ordering])
+        return self.encode_cursor(Cursor(offset=0, reverse=reverse, position=posicion))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._enlace(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self._enlace(self.page[0], reverse=True)
@@ -1,9 +1,26 @@
 from rest_framework import serializers
 from .models import Lugar
 
-class LugarSerializer(serializers.ModelSerializer):
+class CamposPedidosMixin:
+    """
+    Serializa solo los campos de view.campos (?view= / ?fields=, ver
+    FiltroCampos). `columnas` dice qué columnas del modelo necesita cada campo
+    que no es una columna con su mismo nombre.
+    """
+    columnas = {}
+
+    def get_fields(self):
+        campos = super().get_fields()
+        pedidos = getattr(self.context.get('view'), 'campos', None)
+        if pedidos is None:
+            return campos
+        return {nombre: campo for nombre, campo in campos.items() if nombre in pedidos}
+
+class LugarSerializer(CamposPedidosMixin, serializers.ModelSerializer):
     categoria_nombre = serializers.CharField(source='get_categoria_display', read_only=True)
     estado_nombre = serializers.CharField(source='get_estado_display', read_only=True)
+    # Solo en las búsquedas con ?near= (km hasta el punto pedido), ver get_fields
+    distancia = serializers.SerializerMethodField()
 
     class Meta:
         model = Lugar
@@ -11,9 +28,33 @@ class LugarSerializer(serializers.ModelSerializer):
             'id', 'nombre', 'descripcion', 'direccion', 
             'lat', 'lng', 'categoria', 'categoria_nombre',
             'estado', 'estado_nombre', 'creado_por_id', 
-            'creado_en', 'esta_aprobado'
+            'creado_en', 'esta_aprobado', 'distancia'
         ]
         read_only_fields = [
             'estado', 'estado_nombre', 'creado_por_id', 
             'creado_en', 'esta_aprobado'
-        ]
\ No newline at end of file
+        ]
+
+    columnas = {
+        'categoria_nombre': ('categoria',),
+        'estado_nombre': ('estado',),
+        'esta_aprobado': ('estado',),
+        'distancia': (),
+    }
+
+    def get_fields(self):
+        campos = super().get_fields()
+        request = self.context.get('request')
+        # Fuera de ?near= no hay distancia: el campo ni aparece (ni como null)
+        if request is not None and not request.query_params.get('near'):
+            campos.pop('distancia', None)
+        return campos
+
+    def get_distancia(self, obj):
+        distancia = getattr(obj, 'distancia', None)
+        return round(distancia, 3) if distancia is not None else None
+
+
+class IdsLoteSerializer(serializers.Serializer):
+    """Cuerpo de la moderación en lote: {"ids": [1, 2, 3]}."""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), min_length=1, max_length=1000)
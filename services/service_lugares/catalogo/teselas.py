@@ -0,0 +1,249 @@
+"""
+Agrupación del mapa por teselas z/x/y (las mismas que pinta Leaflet).
+
+Cada tesela se divide en una rejilla de 8 x 8 casillas. La tabla
+AgrupacionMapa guarda, para cada zoom hasta ZOOM_AGRUPACION, tesela, casilla y
+categoría, cuántos lugares visibles caen ahí y la suma de sus coordenadas (el
+centroide es suma / total). Se mantiene de forma incremental: cada escritura
+suma o resta el lugar en las casillas de su posición antigua y nueva, con un
+upsert por casilla, sin recorrer el catálogo.
+
+Una tesela se sirve así:
+- Con pocos lugares (MAPA_PUNTOS_TESELA) o por encima de ZOOM_AGRUPACION,
+  los puntos sueltos, buscados con el índice Morton (ver geo.py).
+- Si no, un grupo por casilla con su total y el desglose por categoría.
+
+El GeoJSON de cada tesela se guarda en la caché y cada escritura borra solo
+las teselas por las que pasa el lugar cambiado (una por zoom), así que mover el
+mapa a cualquier zoom es una lectura de la caché o una consulta por índice.
+Las claves llevan además una versión propia de las teselas: reconstruir() la
+sube para descartarlas todas sin tocar el resto de la caché del servicio.
+"""
+import math
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import geo
+from .models import AgrupacionMapa, EstadoAprobacion, Lugar
+
+# Hasta este zoom se mantienen los contadores; más cerca siempre van puntos
+ZOOM_AGRUPACION = 16
+# Zoom máximo que se sirve (el de Leaflet con teselas de OpenStreetMap)
+ZOOM_MAX = 20
+# Bits de la rejilla de casillas dentro de cada tesela (3 -> 8 x 8)
+BITS_CASILLA = 3
+LAT_MAX = 85.0511287798
+
+def _global(lat, lng, zoom):
+    """Coordenadas enteras en la rejilla de 2^zoom x 2^zoom de Web Mercator."""
+    n = 1 << zoom
+    lat = max(-LAT_MAX, min(LAT_MAX, lat))
+    seno = math.sin(math.radians(lat))
+    x = (lng + 180.0) / 360.0 * n
+    y = (0.5 - math.log((1 + seno) / (1 - seno)) / (4 * math.pi)) * n
+    return min(max(int(x), 0), n - 1), min(max(int(y), 0), n - 1)
+
+def casillas(lat, lng):
+    """(zoom, x, y, casilla) del punto en cada zoom de la agrupación."""
+    gx, gy = _global(lat, lng, ZOOM_AGRUPACION + BITS_CASILLA)
+    mascara = (1 << BITS_CASILLA) - 1
+    for zoom in range(ZOOM_AGRUPACION + 1):
+        cx, cy = gx >> (ZOOM_AGRUPACION - zoom), gy >> (ZOOM_AGRUPACION - zoom)
+        casilla = (cy & mascara) << BITS_CASILLA | (cx & mascara)
+        yield zoom, cx >> BITS_CASILLA, cy >> BITS_CASILLA, casilla
+
+def bbox_tesela(z, x, y):
+    """(oeste, sur, este, norte) de la tesela."""
+    n = 1 << z
+    lat = lambda fila: math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * fila / n))))
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+CLAVE_VERSION = 'teselas:lugares:version'
+
+def _version():
+    v = cache.get(CLAVE_VERSION)
+    if v is None:
+        # Desde el instante actual: si la caché perdió la versión, no se repite una vieja
+        cache.add(CLAVE_VERSION, time.time_ns(), None)
+        v = cache.get(CLAVE_VERSION)
+    return v
+
+def _subir_version():
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.add(CLAVE_VERSION, time.time_ns(), None)
+
+def _clave(z, x, y, version):
+    return f"teselas:lugares:{version}:{z}:{x}:{y}"
+
+def _claves_punto(lat, lng):
+    """Claves de caché de todas las teselas (a cualquier zoom) que contienen el punto."""
+    gx, gy = _global(lat, lng, ZOOM_MAX)
+    version = _version()
+    return [_clave(z, gx >> (ZOOM_MAX - z), gy >> (ZOOM_MAX - z), version) for z in range(ZOOM_MAX + 1)]
+
+def punto(lugar):
+    """(lat, lng, categoria) si el lugar sale en el mapa público, si no None."""
+    if lugar is None or lugar['lat'] is None or lugar['lng'] is None:
+        return None
+    if lugar['estado'] != EstadoAprobacion.APROBADO or not lugar['publicado']:
+        return None
+    return lugar['lat'], lugar['lng'], lugar['categoria']
+
+CAMPOS = ('lat', 'lng', 'categoria', 'estado', 'publicado')
+
+
+class Cambios:
+    """Acumula altas y bajas de puntos y las aplica de una vez a la tabla y a la caché."""
+
+    def __init__(self):
+        self.deltas = defaultdict(lambda: [0, 0.0, 0.0])
+        self.claves = set()
+
+    def _sumar(self, p, signo):
+        lat, lng, categoria = p
+        for zoom, x, y, casilla in casillas(lat, lng):
+            delta = self.deltas[(zoom, x, y, casilla, categoria)]
+            delta[0] += signo
+            delta[1] += signo * lat
+            delta[2] += signo * lng
+
+    def mover(self, antes, despues, invalidar=False):
+        """
+        Cambia un lugar de `antes` a `despues` (dicts con CAMPOS, o None si no
+        existía). invalidar=True borra sus teselas aunque el punto no cambie
+        (p. ej. si cambió el nombre que sale en el popup).
+        """
+        p_antes, p_despues = punto(antes), punto(despues)
+        if p_antes != p_despues:
+            if p_antes:
+                self._sumar(p_antes, -1)
+            if p_despues:
+                self._sumar(p_despues, 1)
+        if p_antes != p_despues or invalidar:
+            for p in {p_antes, p_despues} - {None}:
+                self.claves.update(_claves_punto(p[0], p[1]))
+
+    def aplicar(self):
+        filas = [(*k, *v) for k, v in self.deltas.items() if v[0]]
+        if filas:
+            tabla = AgrupacionMapa._meta.db_table
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f"INSERT INTO {tabla} (zoom, x, y, casilla, categoria, total, suma_lat, suma_lng) "
+                    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s) "
+                    "ON CONFLICT (zoom, x, y, casilla, categoria) DO UPDATE SET "
+                    f"total = {tabla}.total + excluded.total, "
+                    f"suma_lat = {tabla}.suma_lat + excluded.suma_lat, "
+                    f"suma_lng = {tabla}.suma_lng + excluded.suma_lng",
+                    filas,
+                )
+                cursor.executemany(
+                    f"DELETE FROM {tabla} WHERE zoom = %s AND x = %s AND y = %s AND casilla = %s "
+                    "AND categoria = %s AND total <= 0",
+                    [fila[:5] for fila in filas if fila[5] < 0],
+                )
+        if self.claves:
+            claves = list(self.claves)
+            # Ahora y al confirmar: una lectura entre medias no deja guardada la tesela vieja
+            cache.delete_many(claves)
+            transaction.on_commit(lambda: cache.delete_many(claves))
+
+
+@receiver(pre_save, sender=Lugar)
+def _antes_de_guardar(sender, instance, **kwargs):
+    instance._mapa_antes = (
+        Lugar.objects.filter(pk=instance.pk).values(*CAMPOS).first() if instance.pk else None
+    )
+
+@receiver(post_save, sender=Lugar)
+def _al_guardar(sender, instance, **kwargs):
+    cambios = Cambios()
+    despues = {campo: getattr(instance, campo) for campo in CAMPOS}
+    cambios.mover(getattr(instance, '_mapa_antes', None), despues, invalidar=True)
+    cambios.aplicar()
+
+@receiver(post_delete, sender=Lugar)
+def _al_borrar(sender, instance, **kwargs):
+    cambios = Cambios()
+    cambios.mover({campo: getattr(instance, campo) for campo in CAMPOS}, None)
+    cambios.aplicar()
+
+def reconstruir(lugares=None):
+    """Recalcula la tabla entera desde los lugares (carga inicial o reparación)."""
+    lugares = Lugar.objects if lugares is None else lugares
+    cambios = Cambios()
+    for lugar in lugares.values(*CAMPOS).iterator(chunk_size=2000):
+        cambios.mover(None, lugar)
+    with transaction.atomic():
+        AgrupacionMapa.objects.all().delete()
+        cambios.aplicar()
+    # No se sabe qué teselas cambiaron: una versión nueva las descarta todas
+    # (ahora y al confirmar, por si una lectura se cuela entre medias)
+    _subir_version()
+    transaction.on_commit(_subir_version)
+
+
+def _feature(lat, lng, propiedades):
+    return {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [lng, lat]}, 'properties': propiedades}
+
+def _puntos(z, x, y):
+    oeste, sur, este, norte = bbox_tesela(z, x, y)
+    lugares = list(
+        Lugar.objects.filter(estado=EstadoAprobacion.APROBADO, publicado=True)
+        .filter(geo.filtro_bbox(oeste, sur, este, norte))
+        # Las teselas comparten borde: cada punto va solo a la que lo contiene
+        .exclude(lat=sur).exclude(lng=este)
+        .order_by('id')
+        .values('id', 'nombre', 'categoria', 'lat', 'lng')[:settings.MAPA_PUNTOS_MAX + 1]
+    )
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            _feature(l['lat'], l['lng'], {'id': l['id'], 'nombre': l['nombre'], 'categoria': l['categoria']})
+            for l in lugares[:settings.MAPA_PUNTOS_MAX]
+        ],
+        'truncado': len(lugares) > settings.MAPA_PUNTOS_MAX,
+    }
+
+def _calcular(z, x, y):
+    if z > ZOOM_AGRUPACION:
+        return _puntos(z, x, y)
+    grupos = defaultdict(lambda: {'total': 0, 'suma_lat': 0.0, 'suma_lng': 0.0, 'categorias': {}})
+    for casilla, categoria, total, suma_lat, suma_lng in AgrupacionMapa.objects.filter(
+        zoom=z, x=x, y=y
+    ).values_list('casilla', 'categoria', 'total', 'suma_lat', 'suma_lng'):
+        grupo = grupos[casilla]
+        grupo['total'] += total
+        grupo['suma_lat'] += suma_lat
+        grupo['suma_lng'] += suma_lng
+        grupo['categorias'][categoria] = total
+    if sum(g['total'] for g in grupos.values()) <= settings.MAPA_PUNTOS_TESELA:
+        return _puntos(z, x, y)
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            _feature(
+                round(g['suma_lat'] / g['total'], 6), round(g['suma_lng'] / g['total'], 6),
+                {'grupo': True, 'total': g['total'], 'categorias': g['categorias']},
+            )
+            for _, g in sorted(grupos.items())
+        ],
+        'truncado': False,
+    }
+
+def tesela(z, x, y):
+    """GeoJSON de la tesela: de la caché o calculado y guardado."""
+    k = _clave(z, x, y, _version())
+    datos = cache.get(k)
+    if datos is None:
+        datos = _calcular(z, x, y)
+        cache.set(k, datos, settings.MAPA_TESELAS_TTL)
+    return datos
@@ -1,10 +1,19 @@
 # services/service_lugares/catalogo/tests.py
 
+import importlib
+import random
+from datetime import timedelta
+
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase
 from rest_framework import status
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from .models import Lugar, EstadoAprobacion, Categoria
+from . import cache_publica, geo, teselas
+from .models import AgrupacionMapa, Lugar, EstadoAprobacion, Categoria
 
 class LugarAPITests(APITestCase):
 
@@ -106,4 +115,533 @@ class LugarAPITests(APITestCase):
         # 4. Comprobamos que la lógica de 'perform_create' funcionó
         nuevo_lugar = Lugar.objects.get(nombre="Lugar de Test Autenticado")
         self.assertEqual(nuevo_lugar.creado_por_id, self.user.id)
-        self.assertEqual(nuevo_lugar.estado, EstadoAprobacion.PENDIENTE)
\ No newline at end of file
+        self.assertEqual(nuevo_lugar.estado, EstadoAprobacion.PENDIENTE)
+
+    # --- Tests de PAGINACIÓN ---
+
+    def test_paginacion_por_cursor(self):
+        """
+        PRUEBA: La lista sale paginada por cursor (más recientes primero) y
+        siguiendo 'next' se recorre entera sin repetir, aunque se creen lugares
+        mientras tanto. El cursor es opaco: no expone offset ni posición.
+        """
+        self.user.rol = 'admin'
+        self.client.force_authenticate(user=self.user)
+        for i in range(3):
+            Lugar.objects.create(nombre=f"Extra {i}", descripcion="-", creado_por_id=self.user.id)
+
+        response = self.client.get(self.list_create_url, {'limit': 2})
+        self.assertNotIn('count', response.data)
+        self.assertNotIn('offset', response.data['next'])
+        vistos = [l['id'] for l in response.data['results']]
+
+        nuevo = Lugar.objects.create(nombre="Creado a mitad", descripcion="-", creado_por_id=self.user.id)
+        url = response.data['next']
+        while url:
+            response = self.client.get(url)
+            vistos += [l['id'] for l in response.data['results']]
+            url = response.data['next']
+
+        esperados = Lugar.objects.exclude(pk=nuevo.pk).order_by('-creado_en', 'id')
+        self.assertEqual(vistos, [l.id for l in esperados])
+
+    def test_limit_acotado(self):
+        """PRUEBA: ?limit= no puede pedir más de max_page_size registros de golpe."""
+        response = self.client.get(self.list_create_url, {'limit': 100000})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+
+    # --- Tests de FILTROS, ORDEN y TOTALES ---
+
+    def test_filtros_orden_y_total(self):
+        """
+        PRUEBA: El staff filtra por estado/categoría en el servidor, ordena con
+        ?ordering= y obtiene el total sin descargar la lista.
+        """
+        self.user.rol = 'admin'
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.list_create_url, {'estado': 'pendiente'})
+        self.assertEqual([l['id'] for l in response.data['results']], [self.lugar_pendiente.id])
+
+        response = self.client.get(self.list_create_url, {'ordering': 'nombre'})
+        self.assertEqual(response.data['results'][0]['id'], self.lugar_aprobado.id)
+
+        total_url = reverse('lugar-total')
+        self.assertEqual(self.client.get(total_url).data['total'], 2)
+        self.assertEqual(self.client.get(total_url, {'categoria': 'bar'}).data['total'], 1)
+
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(total_url).data['total'], 1)
+
+    def test_no_ordena_por_columnas_con_pocos_valores(self):
+        """
+        PRUEBA: ?ordering=estado o categoria no se aceptan (el cursor se pierde
+        entre tantos empates) y el listado sale en su orden por defecto.
+        """
+        self.user.rol = 'admin'
+        self.client.force_authenticate(user=self.user)
+        por_defecto = [l['id'] for l in self.client.get(self.list_create_url).data['results']]
+
+        for campo in ('estado', '-estado', 'categoria', '-categoria'):
+            response = self.client.get(self.list_create_url, {'ordering': campo})
+            self.assertEqual([l['id'] for l in response.data['results']], por_defecto)
+
+    # --- Tests de MULTI-GET (?ids=) ---
+
+    def test_multi_get_por_ids(self):
+        """
+        PRUEBA: ?ids= devuelve varios lugares en una consulta (más la de los
+        validadores del ETag), en el orden pedido y sin los que el usuario no
+        puede ver.
+        """
+        otro = Lugar.objects.create(
+            nombre="Otro Aprobado", descripcion="-", lat=37.3, lng=-3.3,
+            categoria=Categoria.PLAZA, estado=EstadoAprobacion.APROBADO,
+            publicado=True, creado_por_id=self.user.id
+        )
+        ids = f"{otro.id},{self.lugar_pendiente.id},{self.lugar_aprobado.id},999"
+
+        with self.assertNumQueries(2):
+            response = self.client.get(self.list_create_url, {'ids': ids})
+        self.assertEqual([l['id'] for l in response.data], [otro.id, self.lugar_aprobado.id])
+
+        self.assertEqual(self.client.get(self.list_create_url, {'ids': '1,x'}).status_code, 400)
+        demasiados = ','.join(str(i) for i in range(1, 102))
+        self.assertEqual(self.client.get(self.list_create_url, {'ids': demasiados}).status_code, 400)
+
+    def test_proyeccion_view_map(self):
+        response = self.client.get(self.list_create_url, {'view': 'map'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'nombre', 'categoria', 'lat', 'lng'})
+
+    def test_proyeccion_no_lee_columnas_sin_usar(self):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(self.list_create_url, {'fields': 'nombre,categoria_nombre'})
+        self.assertEqual(response.data['results'][0], {
+            'id': self.lugar_aprobado.id, 'nombre': "Lugar Aprobado de Prueba", 'categoria_nombre': "Mirador",
+        })
+        # La primera consulta es la de los validadores del ETag
+        self.assertEqual(len(consultas), 2)
+        self.assertNotIn('"descripcion"', consultas[1]['sql'])
+
+    def test_proyeccion_invalida(self):
+        self.assertEqual(self.client.get(self.list_create_url, {'view': 'mini'}).status_code, 400)
+        self.assertEqual(self.client.get(self.list_create_url, {'fields': 'nombre,clave'}).status_code, 400)
+
+
+@override_settings(CATALOGO_CACHE_TTL=0)
+class LugarCondicionalTests(APITestCase):
+    """ETag / Last-Modified en listado y detalle (sin la caché pública delante)."""
+
+    def setUp(self):
+        self.lugar = Lugar.objects.create(
+            nombre="Mirador", descripcion="-", estado=EstadoAprobacion.APROBADO, creado_por_id=1,
+        )
+        self.url = reverse('lugar-list')
+
+    def test_listado_304_sin_consultar_la_lista(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_listado_cambia_con_altas_ediciones_y_otros_parametros(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertNotEqual(self.client.get(self.url, {'view': 'map'})['ETag'], etag)
+
+        self.lugar.nombre = "Mirador de San Nicolás"
+        self.lugar.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        etag = response['ETag']
+        Lugar.objects.create(nombre="Otro", descripcion="-", estado=EstadoAprobacion.APROBADO, creado_por_id=1)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_detalle_condicional(self):
+        url = reverse('lugar-detail', args=[self.lugar.id])
+        response = self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304
+        )
+        Lugar.objects.filter(pk=self.lugar.pk).update(actualizado_en=self.lugar.actualizado_en + timedelta(seconds=5))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+
+class LugarCachePublicaTests(APITestCase):
+    """Caché de las respuestas anónimas, invalidada subiendo la versión del catálogo."""
+
+    def setUp(self):
+        cache.clear()
+        self.lugar = Lugar.objects.create(
+            nombre="Mirador", descripcion="-", estado=EstadoAprobacion.APROBADO, creado_por_id=1,
+        )
+        self.url = reverse('lugar-list')
+        self.detalle = reverse('lugar-detail', args=[self.lugar.id])
+
+    def test_acierto_sin_sql_y_con_304(self):
+        primera = self.client.get(self.url)
+        self.client.get(self.detalle)
+        with self.assertNumQueries(0):
+            segunda = self.client.get(self.url)
+            self.assertEqual(self.client.get(self.detalle).data['nombre'], "Mirador")
+            no_modificada = self.client.get(self.url, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(segunda.data, primera.data)
+        self.assertEqual(segunda['ETag'], primera['ETag'])
+        self.assertEqual(no_modificada.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_escrituras_suben_la_version(self):
+        self.client.get(self.url)
+        version = cache_publica.version()
+
+        self.lugar.nombre = "Mirador de San Nicolás"
+        self.lugar.save()
+        self.assertGreater(cache_publica.version(), version)
+        self.assertEqual(self.client.get(self.url).data['results'][0]['nombre'], "Mirador de San Nicolás")
+
+        moderador = User(id=7, username='moderador')
+        moderador.rol = 'admin'
+        self.client.force_authenticate(user=moderador)
+        self.client.put(reverse('lugar-rechazar-lote'), {'ids': [self.lugar.id]}, format='json')
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(self.url).data['results'], [])
+
+        self.lugar.delete()
+        self.assertEqual(self.client.get(self.detalle).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_usuarios_autenticados_no_usan_la_cache(self):
+        self.client.get(self.url)
+        self.client.force_authenticate(user=User(id=3, username='otro'))
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+
+class LugarLoteTests(APITestCase):
+    """Alta y moderación en lote."""
+
+    def setUp(self):
+        self.moderador = User(id=7, username='moderador')
+        self.moderador.rol = 'admin'
+        self.client.force_authenticate(user=self.moderador)
+
+    def test_crear_lote_en_una_consulta_con_resultado_por_item(self):
+        datos = [
+            {"nombre": "Uno", "descripcion": "-", "lat": 37.17, "lng": -3.59, "categoria": "mirador"},
+            {"nombre": "Dos", "descripcion": "-", "categoria": "monumento"},
+            {"nombre": "Tres", "descripcion": "-", "categoria": "plaza"},
+        ]
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('lugar-crear-lote'), datos, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['creados'], 2)
+        uno, dos, tres = response.data['resultados']
+        self.assertTrue(uno['ok'])
+        self.assertIn('categoria', dos['errores'])
+        lugar = Lugar.objects.get(pk=uno['id'])
+        self.assertEqual((lugar.estado, lugar.creado_por_id), (EstadoAprobacion.PENDIENTE, 7))
+        self.assertEqual(lugar.celda, geo.celda(37.17, -3.59))
+        self.assertEqual(Lugar.objects.get(pk=tres['id']).nombre, "Tres")
+
+    def test_crear_lote_invalido(self):
+        url = reverse('lugar-crear-lote')
+        self.assertEqual(self.client.post(url, {"nombre": "x"}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, [{"nombre": ""}], format='json').status_code, 400)
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.post(url, [], format='json').status_code, 401)
+
+    def test_aprobar_y_rechazar_lote(self):
+        ids = [
+            Lugar.objects.create(nombre=f"L{i}", descripcion="-", creado_por_id=1).id
+            for i in range(3)
+        ]
+        response = self.client.put(reverse('lugar-aprobar-lote'), {'ids': [*ids, 999]}, format='json')
+        self.assertEqual(response.data['actualizados'], 3)
+        self.assertEqual(response.data['resultados'][-1], {'id': 999, 'ok': False, 'error': 'No existe'})
+        self.assertEqual(Lugar.objects.filter(estado=EstadoAprobacion.APROBADO).count(), 3)
+
+        self.client.put(reverse('lugar-rechazar-lote'), {'ids': ids[:1]}, format='json')
+        rechazado = Lugar.objects.get(pk=ids[0])
+        self.assertEqual((rechazado.estado, rechazado.publicado), (EstadoAprobacion.RECHAZADO, False))
+
+    def test_moderar_lote_requiere_moderador(self):
+        self.moderador.rol = 'usuario'
+        response = self.client.put(reverse('lugar-aprobar-lote'), {'ids': [1]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class LugarGeoTests(APITestCase):
+    """Búsquedas por zona (?bbox=) y por radio (?near=) con el índice Morton."""
+
+    def setUp(self):
+        # bulk_create no invalida la caché pública: que no sirva datos de otro test
+        cache.clear()
+        rng = random.Random(7)
+        Lugar.objects.bulk_create([
+            Lugar(nombre=f"Lugar {i}", descripcion="-", lat=lat, lng=lng,
+                  celda=geo.celda(lat, lng), estado=EstadoAprobacion.APROBADO,
+                  publicado=True, creado_por_id=1)
+            for i, (lat, lng) in enumerate(
+                (37.0 + rng.random() * 0.4, -3.8 + rng.random() * 0.4) for _ in range(300)
+            )
+        ])
+        self.url = reverse('lugar-list')
+
+    def test_save_calcula_la_celda(self):
+        lugar = Lugar.objects.create(nombre="Nuevo", descripcion="-", lat=37.17, lng=-3.59, creado_por_id=1)
+        self.assertEqual(lugar.celda, geo.celda(37.17, -3.59))
+
+    def test_la_migracion_usa_la_misma_celda(self):
+        """La migración que rellena `celda` lleva su copia del código Morton: debe coincidir."""
+        migracion = importlib.import_module('catalogo.migrations.0002_lugar_celda')
+        self.assertNotIn('geo', vars(migracion))
+        for lat, lng in [(37.17, -3.59), (90.0, 180.0), (-90.0, -180.0), (0.0, 0.0)]:
+            self.assertEqual(migracion.celda(lat, lng), geo.celda(lat, lng))
+
+    def test_bbox_coincide_con_la_busqueda_exhaustiva(self):
+        """Los rangos de celda no pierden ningún punto y el refinado quita los de fuera."""
+        for oeste, sur, este, norte in [(-3.7, 37.1, -3.55, 37.2), (-3.62, 37.05, -3.61, 37.35), (-10, 30, 10, 40)]:
+            response = self.client.get(self.url, {'bbox': f"{oeste},{sur},{este},{norte}", 'limit': 1000})
+            esperados = {
+                l.id for l in Lugar.objects.all()
+                if sur <= l.lat <= norte and oeste <= l.lng <= este
+            }
+            self.assertEqual({l['id'] for l in response.data['results']}, esperados)
+
+    def test_bbox_usa_el_indice_de_celda(self):
+        consulta = str(Lugar.objects.filter(geo.filtro_bbox(-3.7, 37.1, -3.55, 37.2)).query)
+        self.assertIn('"celda" BETWEEN', consulta)
+
+    def test_near_filtra_por_radio_y_ordena_por_distancia(self):
+        lat, lng, radio = 37.2, -3.6, 5
+        response = self.client.get(self.url, {'near': f"{lat},{lng}", 'radius': radio, 'limit': 1000})
+        resultados = response.data['results']
+
+        esperados = {
+            l.id for l in Lugar.objects.all()
+            if geo.haversine_km(lat, lng, l.lat, l.lng) <= radio
+        }
+        self.assertEqual({l['id'] for l in resultados}, esperados)
+        distancias = [l['distancia'] for l in resultados]
+        self.assertEqual(distancias, sorted(distancias))
+        self.assertLessEqual(distancias[-1], radio)
+
+    def test_distancia_solo_en_busquedas_near(self):
+        """Sin ?near= la respuesta no lleva el campo distancia, ni siquiera a null."""
+        lugar = self.client.get(self.url, {'limit': 1}).data['results'][0]
+        self.assertNotIn('distancia', lugar)
+        detalle = self.client.get(reverse('lugar-detail', args=[lugar['id']])).data
+        self.assertNotIn('distancia', detalle)
+        self.assertEqual(self.client.get(self.url, {'fields': 'id,distancia'}).status_code, 200)
+
+    def test_parametros_invalidos(self):
+        for params in [{'bbox': '1,2,3'}, {'bbox': '0,50,1,40'}, {'near': 'a,b'}, {'near': '37,-3', 'radius': '500'}]:
+            self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+    def test_bbox_que_cruza_el_antimeridiano(self):
+        Lugar.objects.create(nombre="Fiyi", descripcion="-", lat=-17.7, lng=178.0,
+                             estado=EstadoAprobacion.APROBADO, creado_por_id=1)
+        Lugar.objects.create(nombre="Samoa", descripcion="-", lat=-13.8, lng=-172.0,
+                             estado=EstadoAprobacion.APROBADO, creado_por_id=1)
+        response = self.client.get(self.url, {'bbox': '170,-20,-170,-10'})
+        self.assertEqual(sorted(l['nombre'] for l in response.data['results']), ['Fiyi', 'Samoa'])
+
+
+class LugarPaginacionTests(APITestCase):
+    """Paginación por cursor con muchos empates en el campo del orden."""
+
+    def setUp(self):
+        cache.clear()
+        # Más empates que el offset_cutoff (1000) de DRF: misma posición, nombre y texto
+        Lugar.objects.bulk_create([
+            Lugar(nombre="Museo", descripcion="Museo de barrio", lat=37.2, lng=-3.6,
+                  celda=geo.celda(37.2, -3.6), estado=EstadoAprobacion.APROBADO,
+                  publicado=True, creado_por_id=1)
+            for _ in range(1300)
+        ])
+        self.url = reverse('lugar-list')
+
+    def _recorrer(self, params):
+        ids, url, paginas = [], self.url, 0
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids += [l['id'] for l in response.data['results']]
+            url, params = response.data['next'], None
+            paginas += 1
+            self.assertLessEqual(paginas, 14)
+        return ids
+
+    def test_empates_no_repiten_ni_dejan_fuera_registros(self):
+        """
+        PRUEBA: con 1300 lugares a la misma distancia, con la misma relevancia
+        o el mismo nombre, el cursor los recorre todos una sola vez y termina.
+        """
+        todos = set(Lugar.objects.values_list('id', flat=True))
+        for params in ({'near': '37.2,-3.6', 'radius': 1}, {'q': 'museo'}, {'ordering': 'nombre'}, {'ordering': '-nombre'}):
+            ids = self._recorrer({**params, 'limit': 100})
+            self.assertEqual(len(ids), 1300, params)
+            self.assertEqual(set(ids), todos, params)
+
+    def test_enlace_previous_vuelve_a_la_pagina_anterior(self):
+        primera = self.client.get(self.url, {'ordering': 'nombre', 'limit': 100}).data
+        segunda = self.client.get(primera['next']).data
+        anterior = self.client.get(segunda['previous']).data
+        self.assertEqual([l['id'] for l in anterior['results']], [l['id'] for l in primera['results']])
+        self.assertEqual(self.client.get(self.url, {'cursor': 'no-es-un-cursor'}).status_code, 404)
+
+
+class LugarBusquedaTests(APITestCase):
+    """Búsqueda de texto completo (?q=) con relevancia."""
+
+    def setUp(self):
+        datos = [
+            ("Mirador de San Nicolás", "Vistas a la Alhambra.", "Plaza de San Nicolás, Albaicín"),
+            ("Bar Los Diamantes", "Tapas de pescado junto al mirador.", "Calle Navas 28"),
+            ("Museo de la Alhambra", "Arte nazarí y cerámica.", "Palacio de Carlos V"),
+            ("Carmen de los Mártires", "Jardines románticos.", "Paseo de los Mártires"),
+        ]
+        self.lugares = {
+            nombre: Lugar.objects.create(
+                nombre=nombre, descripcion=descripcion, direccion=direccion,
+                estado=EstadoAprobacion.APROBADO, publicado=True, creado_por_id=1,
+            )
+            for nombre, descripcion, direccion in datos
+        }
+        self.url = reverse('lugar-list')
+
+    def _buscar(self, texto, **params):
+        response = self.client.get(self.url, {'q': texto, **params})
+        self.assertEqual(response.status_code, 200)
+        return [l['nombre'] for l in response.data['results']]
+
+    def test_busca_en_nombre_descripcion_y_direccion(self):
+        self.assertEqual(set(self._buscar("alhambra")), {"Mirador de San Nicolás", "Museo de la Alhambra"})
+        self.assertEqual(self._buscar("navas"), ["Bar Los Diamantes"])
+
+    def test_sin_distinguir_tildes_ni_mayusculas(self):
+        self.assertEqual(self._buscar("NAZARI ceramica"), ["Museo de la Alhambra"])
+        self.assertEqual(self._buscar("martires"), ["Carmen de los Mártires"])
+
+    def test_el_nombre_pesa_mas_que_la_descripcion(self):
+        self.assertEqual(self._buscar("mirador"), ["Mirador de San Nicolás", "Bar Los Diamantes"])
+
+    def test_se_actualiza_al_guardar_y_borrar(self):
+        lugar = self.lugares["Bar Los Diamantes"]
+        lugar.nombre = "Bodega Castañeda"
+        lugar.save()
+        self.assertEqual(self._buscar("castaneda"), ["Bodega Castañeda"])
+        self.assertEqual(self._buscar("diamantes"), [])
+        lugar.delete()
+        self.assertEqual(self._buscar("castaneda"), [])
+
+    def test_solo_visibles_y_texto_sin_terminos(self):
+        self.lugares["Museo de la Alhambra"].estado = EstadoAprobacion.PENDIENTE
+        self.lugares["Museo de la Alhambra"].save()
+        self.assertEqual(self._buscar("alhambra"), ["Mirador de San Nicolás"])
+        self.assertEqual(self._buscar('"*'), [])
+        self.assertEqual(len(self._buscar("  ")), 3)
+
+
+@override_settings(MAPA_PUNTOS_TESELA=5)
+class LugarTeselasTests(APITestCase):
+    """Teselas agrupadas del mapa, mantenidas al escribir."""
+
+    def setUp(self):
+        cache.clear()
+        self.moderador = User(id=7, username='moderador')
+        self.moderador.rol = 'admin'
+        rng = random.Random(3)
+        self.lugares = [
+            Lugar.objects.create(
+                nombre=f"Lugar {i}", descripcion="-", lat=37.1 + rng.random() * 0.2,
+                lng=-3.7 + rng.random() * 0.2, categoria=[Categoria.BAR, Categoria.PLAZA][i % 2],
+                estado=EstadoAprobacion.APROBADO, creado_por_id=1,
+            )
+            for i in range(20)
+        ]
+
+    def tesela(self, z, lat=37.2, lng=-3.6):
+        x, y = teselas._global(lat, lng, z)
+        return self.client.get(reverse('lugar-tesela', kwargs={'z': z, 'x': x, 'y': y}))
+
+    def grupos(self, z):
+        return [f['properties'] for f in self.tesela(z).data['features']]
+
+    def test_grupos_con_total_por_categoria(self):
+        grupos = self.grupos(0)
+        self.assertEqual(len(grupos), 1)
+        self.assertEqual(grupos[0]['total'], 20)
+        self.assertEqual(grupos[0]['categorias'], {'bar': 10, 'plaza': 10})
+        # Más cerca los grupos se reparten entre casillas y luego teselas
+        self.assertGreater(len(self.grupos(8)), 1)
+        self.assertEqual(sum(g['total'] for g in self.grupos(8)), 20)
+
+    def test_la_segunda_lectura_sale_de_la_cache(self):
+        self.tesela(5)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.tesela(5).status_code, 200)
+
+    def test_escrituras_ajustan_los_contadores_y_la_cache(self):
+        self.assertEqual(self.grupos(3)[0]['total'], 20)
+        uno, dos = self.lugares[:2]
+        uno.estado = EstadoAprobacion.RECHAZADO
+        uno.save()
+        dos.delete()
+        self.assertEqual(self.grupos(3)[0]['total'], 18)
+
+        # Moderar en lote no pasa por save(): lo ajusta la vista
+        self.client.force_authenticate(user=self.moderador)
+        ids = [l.id for l in self.lugares[2:6]]
+        self.client.put(reverse('lugar-rechazar-lote'), {'ids': ids}, format='json')
+        self.assertEqual(self.grupos(3)[0]['total'], 14)
+        self.client.put(reverse('lugar-aprobar-lote'), {'ids': [uno.id, *ids]}, format='json')
+        self.assertEqual(self.grupos(3)[0]['total'], 19)
+
+        # Al mover un lugar lejos sale de la tesela
+        uno.lat, uno.lng = 40.4, -3.7
+        uno.save()
+        self.assertEqual(self.grupos(3)[0]['total'], 18)
+
+        antes = sorted(AgrupacionMapa.objects.values_list('zoom', 'x', 'y', 'casilla', 'categoria', 'total'))
+        teselas.reconstruir()
+        despues = sorted(AgrupacionMapa.objects.values_list('zoom', 'x', 'y', 'casilla', 'categoria', 'total'))
+        self.assertEqual(antes, despues)
+
+    def test_puntos_sueltos_de_cerca_o_con_pocos_lugares(self):
+        features = self.tesela(teselas.ZOOM_MAX - 2, self.lugares[0].lat, self.lugares[0].lng).data['features']
+        self.assertEqual([f['properties']['id'] for f in features], [self.lugares[0].id])
+        Lugar.objects.filter(pk__in=[l.id for l in self.lugares[5:]]).update(publicado=False)
+        teselas.reconstruir()
+        features = self.tesela(0).data['features']
+        self.assertEqual(sorted(f['properties']['id'] for f in features), [l.id for l in self.lugares[:5]])
+
+    def test_la_migracion_usa_la_misma_rejilla(self):
+        """La carga inicial lleva su copia de la rejilla: debe dar las mismas casillas."""
+        migracion = importlib.import_module('catalogo.migrations.0005_agrupacionmapa')
+        self.assertNotIn('teselas', vars(migracion))
+        for lugar in self.lugares[:5] + [Lugar(lat=89.9, lng=180.0), Lugar(lat=-89.9, lng=-180.0)]:
+            self.assertEqual(list(migracion.casillas(lugar.lat, lugar.lng)), list(teselas.casillas(lugar.lat, lugar.lng)))
+
+    def test_reconstruir_solo_descarta_las_teselas(self):
+        """reconstruir() no vacía la caché entera: la versión de la caché pública sigue ahí."""
+        version = cache_publica.version()
+        cache.set('otra-clave', 1)
+        self.tesela(3)
+        teselas.reconstruir()
+        self.assertEqual(cache.get('otra-clave'), 1)
+        self.assertEqual(cache_publica.version(), version)
+        with CaptureQueriesContext(connection) as consultas:
+            self.tesela(3)
+        self.assertGreater(len(consultas), 0)
+
+    def test_tesela_fuera_de_rango(self):
+        for z, x, y in [(21, 0, 0), (2, 4, 0), (2, 0, 4)]:
+            response = self.client.get(reverse('lugar-tesela', kwargs={'z': z, 'x': x, 'y': y}))
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,25 +1,53 @@
-from rest_framework import viewsets, permissions
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from . import cache_publica, geo, teselas
 from .models import Lugar, EstadoAprobacion
-from .serializers import LugarSerializer
+from .serializers import IdsLoteSerializer, LugarSerializer
 from .permissions import IsOrganizadorOrAdmin
+from .pagination import PaginacionCursor
+from .condicional import GetCondicionalMixin
+from .filters import FiltroBusqueda, FiltroCampos, FiltroExacto, FiltroGeo, FiltroIds, OrdenEstable
 
-class LugarViewSet(viewsets.ModelViewSet):
+class LugarViewSet(GetCondicionalMixin, viewsets.ModelViewSet):
     serializer_class = LugarSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = PaginacionCursor
+    # Cada uno puede reordenar: ?ordering= manda sobre la distancia y esta sobre la relevancia
+    filter_backends = [FiltroExacto, FiltroBusqueda, FiltroGeo, OrdenEstable, FiltroIds, FiltroCampos]
+    filtros_exactos = ['estado', 'categoria']
+    # Estado y categoría se filtran (filtros_exactos), no se ordenan: con tan
+    # pocos valores el orden lo daría casi entero el id
+    ordering_fields = ['creado_en', 'nombre']
+    # Proyecciones de ?view= (None = todos los campos)
+    vistas = {
+        'map': ['id', 'nombre', 'categoria', 'lat', 'lng'],
+        'card': ['id', 'nombre', 'categoria', 'categoria_nombre', 'direccion', 'lat', 'lng', 'distancia'],
+        'full': None,
+    }
+    campos = None
+    max_lote = 1000
 
     def get_queryset(self):
         user = self.request.user
         rol = getattr(user, 'rol', None)
         
         if user.is_authenticated and rol in ['admin', 'organizador']:
-            return Lugar.objects.all().order_by('-creado_en')
+            return Lugar.objects.all().order_by('-creado_en', 'id')
         
         return Lugar.objects.filter(
             estado=EstadoAprobacion.APROBADO, 
             publicado=True
-        ).order_by('-creado_en')
+        ).order_by('-creado_en', 'id')
+
+    def list(self, request, *args, **kwargs):
+        return cache_publica.servir(request, lambda: super(LugarViewSet, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return cache_publica.servir(request, lambda: super(LugarViewSet, self).retrieve(request, *args, **kwargs))
 
     def perform_create(self, serializer):
         serializer.save(
@@ -27,6 +55,19 @@ class LugarViewSet(viewsets.ModelViewSet):
             estado=EstadoAprobacion.PENDIENTE
         )
 
+    @action(detail=False, methods=['get'])
+    def total(self, request):
+        """Número de registros visibles con los filtros aplicados, sin listarlos"""
+        return Response({'total': self.filter_queryset(self.get_queryset()).count()})
+
+    @action(detail=False, methods=['get'], url_path=r'teselas/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)')
+    def tesela(self, request, z, x, y):
+        """Tesela z/x/y del mapa público: grupos con su total por categoría o puntos sueltos"""
+        z, x, y = int(z), int(x), int(y)
+        if z > teselas.ZOOM_MAX or x >= 1 << z or y >= 1 << z:
+            raise ValidationError({'detail': f'Tesela fuera de rango (zoom de 0 a {teselas.ZOOM_MAX}).'})
+        return Response(teselas.tesela(z, x, y))
+
     @action(detail=True, methods=['put'], permission_classes=[IsOrganizadorOrAdmin])
     def aprobar(self, request, pk=None):
         lugar = self.get_object()
@@ -41,4 +82,76 @@ class LugarViewSet(viewsets.ModelViewSet):
         lugar.estado = EstadoAprobacion.RECHAZADO
         lugar.publicado = False
         lugar.save()
-        return Response({'status': 'Lugar rechazado'})
\ No newline at end of file
+        return Response({'status': 'Lugar rechazado'})
+
+    # --- Operaciones en lote ---
+
+    @action(detail=False, methods=['post'], url_path='lote')
+    def crear_lote(self, request):
+        """
+        Crea una lista de lugares (pendientes de revisión) con un solo
+        bulk_create en una transacción. Los que no validan se saltan y se
+        informa de cada uno por su posición en la lista.
+        """
+        if not isinstance(request.data, list) or not 0 < len(request.data) <= self.max_lote:
+            raise ValidationError({'detail': f'Se espera una lista de 1 a {self.max_lote} lugares.'})
+        validos, resultados = [], []
+        for indice, datos in enumerate(request.data):
+            serializer = self.get_serializer(data=datos)
+            if serializer.is_valid():
+                lugar = Lugar(
+                    **serializer.validated_data,
+                    creado_por_id=request.user.id,
+                    estado=EstadoAprobacion.PENDIENTE,
+                )
+                # bulk_create no pasa por save()
+                lugar.celda = geo.celda(lugar.lat, lugar.lng)
+                validos.append(lugar)
+                resultados.append({'indice': indice, 'ok': True})
+            else:
+                resultados.append({'indice': indice, 'ok': False, 'errores': serializer.errors})
+
+        # bulk_create ya va en una transacción (varios INSERT si el lote no cabe en uno)
+        creados = iter(Lugar.objects.bulk_create(validos))
+        # bulk_create y update() no emiten señales: la caché pública se invalida aquí
+        cache_publica.invalidar()
+        for resultado in resultados:
+            if resultado['ok']:
+                resultado['id'] = next(creados).id
+        return Response(
+            {'creados': len(validos), 'resultados': resultados},
+            status=status.HTTP_201_CREATED if validos else status.HTTP_400_BAD_REQUEST,
+        )
+
+    def _moderar_lote(self, request, **cambios):
+        """Aplica los cambios a los ids del cuerpo con un solo UPDATE y da el resultado de cada id."""
+        serializer = IdsLoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        with transaction.atomic():
+            lugares = Lugar.objects.select_for_update().filter(pk__in=ids)
+            antes = {fila.pop('pk'): fila for fila in lugares.values('pk', *teselas.CAMPOS)}
+            existentes = set(antes)
+            # update() se salta el auto_now de actualizado_en
+            actualizados = lugares.update(actualizado_en=timezone.now(), **cambios)
+            cache_publica.invalidar()
+            # Tampoco para el mapa: sus contadores se ajustan con las filas de antes
+            mapa = teselas.Cambios()
+            for fila in antes.values():
+                mapa.mover(fila, {**fila, **cambios})
+            mapa.aplicar()
+        return Response({
+            'actualizados': actualizados,
+            'resultados': [
+                {'id': pk, 'ok': True} if pk in existentes else {'id': pk, 'ok': False, 'error': 'No existe'}
+                for pk in ids
+            ],
+        })
+
+    @action(detail=False, methods=['put'], url_path='lote/aprobar', permission_classes=[IsOrganizadorOrAdmin])
+    def aprobar_lote(self, request):
+        return self._moderar_lote(request, estado=EstadoAprobacion.APROBADO, publicado=True)
+
+    @action(detail=False, methods=['put'], url_path='lote/rechazar', permission_classes=[IsOrganizadorOrAdmin])
+    def rechazar_lote(self, request):
+        return self._moderar_lote(request, estado=EstadoAprobacion.RECHAZADO, publicado=False)
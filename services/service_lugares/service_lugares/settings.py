@@ -99,6 +99,42 @@ DATABASES = {
 }
 
 
+# ------------------------------------------------------------------------------
+# 4.1 CACHE (Redis compartido en producción / memoria local en desarrollo)
+# ------------------------------------------------------------------------------
+
+# Con varios workers la caché debe ser compartida para que las invalidaciones
+# lleguen a todos; sin REDIS_URL cada proceso usa su propia memoria.
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'culturemap-lugares',
+        }
+    }
+
+# Segundos que se guardan las respuestas públicas del catálogo (ver
+# catalogo/cache_publica.py); las escrituras las invalidan antes
+CATALOGO_CACHE_TTL = int(os.environ.get('CATALOGO_CACHE_TTL', '300'))
+
+# Teselas del mapa (ver catalogo/teselas.py): cada escritura borra las suyas,
+# así que pueden vivir mucho en la caché
+MAPA_TESELAS_TTL = int(os.environ.get('MAPA_TESELAS_TTL', '86400'))
+# Con hasta tantos lugares una tesela va como puntos sueltos y no agrupada
+MAPA_PUNTOS_TESELA = int(os.environ.get('MAPA_PUNTOS_TESELA', '50'))
+# Tope de puntos por tesela (solo se alcanza por encima del zoom de agrupación)
+MAPA_PUNTOS_MAX = int(os.environ.get('MAPA_PUNTOS_MAX', '500'))
+
+
 # ------------------------------------------------------------------------------
 # 5. PASSWORD VALIDATION & I18N
 # ------------------------------------------------------------------------------
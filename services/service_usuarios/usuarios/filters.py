@@ -0,0 +1,19 @@
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+class FiltroExacto(BaseFilterBackend):
+    """Filtra por igualdad con los campos de view.filtros_exactos (ej: ?estado=pendiente)."""
+    def filter_queryset(self, request, queryset, view):
+        filtros = {
+            campo: request.query_params[campo]
+            for campo in getattr(view, 'filtros_exactos', [])
+            if request.query_params.get(campo)
+        }
+        return queryset.filter(**filtros)
+
+class OrdenEstable(OrderingFilter):
+    """OrderingFilter (?ordering=) que desempata por id para que las páginas no se solapen."""
+    def get_ordering(self, request, queryset, view):
+        orden = super().get_ordering(request, queryset, view)
+        if orden and not {'id', '-id'} & set(orden):
+            orden = [*orden, 'id']
+        return orden
@@ -93,4 +93,22 @@ class UsuarioAPITests(APITestCase):
 
         response = self.client.post(self.token_url, login_data_mal, format='json')
 
-        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    # --- Tests de Gestión (Admin) ---
+
+    def test_admin_filtra_y_cuenta_usuarios_por_rol(self):
+        """
+        PRUEBA: El admin lista usuarios paginados y filtrados por rol, y
+        obtiene el total sin listarlos.
+        """
+        admin = User.objects.create_user(username='admin', password='password123', rol='admin')
+        User.objects.create_user(username='org', password='password123', rol='organizador')
+        User.objects.create_user(username='ana', password='password123')
+        self.client.force_authenticate(user=admin)
+
+        response = self.client.get(reverse('usuario-list'), {'rol': 'organizador', 'limit': 10})
+        self.assertEqual([u['username'] for u in response.data['results']], ['org'])
+
+        self.assertEqual(self.client.get(reverse('usuario-total')).data['total'], 3)
+        self.assertEqual(self.client.get(reverse('usuario-total'), {'rol': 'usuario'}).data['total'], 1)
@@ -2,10 +2,12 @@ from django.contrib.auth import get_user_model
 from rest_framework import generics, permissions, viewsets, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework_simplejwt.views import TokenObtainPairView
 
 from .permissions import IsAdmin
+from .pagination import PaginacionOpcional
+from .filters import FiltroExacto, OrdenEstable
 from .serializers import (
     UserRegistrationSerializer, 
     MyTokenObtainPairSerializer, 
@@ -27,9 +29,18 @@ class MyTokenObtainPairView(TokenObtainPairView):
 
 class UserViewSet(viewsets.ModelViewSet):
     """Vista para administradores: gestión completa de usuarios"""
-    queryset = User.objects.all().order_by('-date_joined')
+    queryset = User.objects.all().order_by('-date_joined', '-id')
     serializer_class = UserManagementSerializer
     permission_classes = [IsAdmin]
+    pagination_class = PaginacionOpcional
+    filter_backends = [FiltroExacto, OrdenEstable]
+    filtros_exactos = ['rol']
+    ordering_fields = ['date_joined', 'username', 'puntos', 'rol']
+
+    @action(detail=False, methods=['get'])
+    def total(self, request):
+        """Número de registros visibles con los filtros aplicados, sin listarlos"""
+        return Response({'total': self.filter_queryset(self.get_queryset()).count()})
 
 # --- GAMIFICACIÓN Y PERFIL ---
 
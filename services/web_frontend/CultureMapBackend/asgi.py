@@ -13,4 +13,24 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'CultureMapBackend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from lugares import api_client_async  # noqa: E402  (necesita los settings cargados)
+
+
+async def application(scope, receive, send):
+    """
+    Django solo atiende HTTP: el ciclo de vida (lifespan) de uvicorn se
+    contesta aquí para cerrar al apagar el worker las conexiones keep-alive
+    con los microservicios.
+    """
+    if scope['type'] != 'lifespan':
+        return await django_application(scope, receive, send)
+    while True:
+        mensaje = await receive()
+        if mensaje['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif mensaje['type'] == 'lifespan.shutdown':
+            await api_client_async.cerrar()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
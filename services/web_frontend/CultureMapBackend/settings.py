@@ -52,8 +52,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'lugares.middleware.PlazoPaginaMiddleware',  # Plazo total de las llamadas a microservicios
     "whitenoise.middleware.WhiteNoiseMiddleware",  # Static files serving
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'lugares.middleware.RenovarTokenMiddleware',  # Renueva el JWT antes de que caduque
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -95,6 +97,64 @@ DATABASES = {
 }
 
 
+# ------------------------------------------------------------------------------
+# 4.1 CACHE (Redis compartido en producción / memoria local en desarrollo)
+# ------------------------------------------------------------------------------
+
+# Con varios workers la caché debe ser compartida para que las invalidaciones
+# lleguen a todos; sin REDIS_URL cada proceso usa su propia memoria.
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'culturemap-frontend',
+        }
+    }
+
+# Sesiones sin consultas por página: el frontend no guarda datos propios y la
+# sesión solo lleva el token y el perfil, así que leerla no debe costar una consulta.
+# SESSION_MODO=cache  -> en la caché (por defecto). Con Redis, solo ahí; sin
+#                        Redis la locmem de cada proceso va delante de la tabla
+#                        django_session, que la comparte entre workers y reinicios
+# SESSION_MODO=db     -> tabla django_session, como antes
+# SESSION_MODO=cookie -> cookie firmada, sin estado en el servidor. La cookie no
+#                        va cifrada y lleva el access y el refresh token: solo
+#                        para pruebas
+SESSION_MODO = os.environ.get('SESSION_MODO', 'cache')
+SESSION_ENGINE = {
+    'cache': 'django.contrib.sessions.backends.cache' if REDIS_URL else 'django.contrib.sessions.backends.cached_db',
+    'cookie': 'django.contrib.sessions.backends.signed_cookies',
+    'db': 'django.contrib.sessions.backends.db',
+}[SESSION_MODO]
+SESSION_COOKIE_HTTPONLY = True
+# Sesión de un día, como el refresh token de service-usuarios
+SESSION_COOKIE_AGE = int(os.environ.get('SESSION_COOKIE_AGE', str(60 * 60 * 24)))
+
+# Segundos que se sirve el catálogo público (lugares/eventos) sin volver a pedirlo
+CATALOGO_CACHE_TTL = int(os.environ.get('CATALOGO_CACHE_TTL', '60'))
+# Segundos extra que una copia pasada se sigue sirviendo mientras se recarga en
+# segundo plano, o mientras el servicio esté caído
+CATALOGO_CACHE_STALE = int(os.environ.get('CATALOGO_CACHE_STALE', '86400'))
+
+# Snapshot de favoritos y votos de cada usuario: cada cuántos segundos se
+# comprueba su huella contra service-interacciones y cuánto vive como máximo
+INTERACCIONES_REVALIDAR = int(os.environ.get('INTERACCIONES_REVALIDAR', '30'))
+INTERACCIONES_SNAPSHOT_TTL = int(os.environ.get('INTERACCIONES_SNAPSHOT_TTL', '3600'))
+
+# Segundos que se guarda el HTML de las páginas públicas para visitantes
+# anónimos (ver lugares/cache_pagina.py); 0 la desactiva
+PAGINA_CACHE_TTL = int(os.environ.get('PAGINA_CACHE_TTL', '60'))
+
+
 # ------------------------------------------------------------------------------
 # 5. PASSWORD VALIDATION & I18N
 # ------------------------------------------------------------------------------
@@ -140,6 +200,60 @@ API_LUGARES_URL = os.environ.get('API_LUGARES_URL', 'http://service-lugares:8000
 API_INTERACCIONES_URL = os.environ.get('API_INTERACCIONES_URL', 'http://service-interacciones:8000/api/interacciones')
 API_EVENTOS_URL = os.environ.get('API_EVENTOS_URL', 'http://service-eventos:8000/api')
 
+# Clave con la que service-usuarios firma los JWT (su SECRET_KEY). Permite leer
+# id y rol del token sin llamar a /me/ (ver lugares/tokens.py).
+JWT_SIGNING_KEY = os.environ.get('JWT_SIGNING_KEY', SECRET_KEY)
+# Segundos antes de que caduque el access token en los que ya se pide uno nuevo
+# con el refresh token (ver lugares/renovacion.py)
+JWT_RENOVAR_ANTES = int(os.environ.get('JWT_RENOVAR_ANTES', '300'))
+
+# Clientes httpx keep-alive con los microservicios (ver lugares/api_client_async.py)
+API_TIMEOUT = float(os.environ.get('API_TIMEOUT', '5'))
+API_POOL_MAXSIZE = int(os.environ.get('API_POOL_MAXSIZE', '20'))
+API_POOL_IDLE_TIMEOUT = float(os.environ.get('API_POOL_IDLE_TIMEOUT', '60'))
+API_RETRY_TOTAL = int(os.environ.get('API_RETRY_TOTAL', '2'))
+
+# Presupuesto de latencia por microservicio (API_TIMEOUT_<SERVICIO>) y plazo
+# total de una página: ninguna llamada espera más de lo que le queda a la página.
+# Interacciones es prescindible en las páginas, así que se le da menos margen.
+API_TIMEOUTS = {
+    servicio: float(os.environ.get(f'API_TIMEOUT_{servicio.upper()}', defecto))
+    for servicio, defecto in [
+        ('usuarios', API_TIMEOUT), ('lugares', API_TIMEOUT),
+        ('eventos', API_TIMEOUT), ('interacciones', 2),
+    ]
+}
+API_PLAZO_PAGINA = float(os.environ.get('API_PLAZO_PAGINA', '8'))
+
+# Circuit breaker por microservicio (ver lugares/resiliencia.py)
+CB_VENTANA = int(os.environ.get('CB_VENTANA', '20'))              # últimas llamadas consideradas
+CB_MIN_LLAMADAS = int(os.environ.get('CB_MIN_LLAMADAS', '10'))    # mínimo para poder abrir
+CB_UMBRAL_FALLOS = float(os.environ.get('CB_UMBRAL_FALLOS', '0.5'))
+CB_LLAMADA_LENTA = float(os.environ.get('CB_LLAMADA_LENTA', '1.5'))  # segundos
+CB_UMBRAL_LENTAS = float(os.environ.get('CB_UMBRAL_LENTAS', '0.5'))
+CB_ESPERA = float(os.environ.get('CB_ESPERA', '15'))              # segundos abierto antes de probar
+CB_PRUEBAS = int(os.environ.get('CB_PRUEBAS', '1'))               # llamadas de prueba en semiabierto
+
+# Ids por petición al multi-get de lugares/eventos (?ids=; máximo 100 en los servicios)
+API_MULTI_GET_MAX = int(os.environ.get('API_MULTI_GET_MAX', '100'))
+
+# Segundos que se guarda el cuerpo de un GET con ETag / Last-Modified para
+# revalidarlo con una petición condicional (ver lugares/revalidacion.py)
+API_REVALIDACION_TTL = int(os.environ.get('API_REVALIDACION_TTL', '86400'))
+
+# Filas por página al exportar en streaming (máximo 1000 en los servicios)
+API_EXPORT_PAGE_SIZE = int(os.environ.get('API_EXPORT_PAGE_SIZE', '500'))
+
+# Filas por página al descargar un catálogo paginado entero (lista pública de
+# lugares; máximo 1000 en los servicios)
+API_CATALOGO_PAGE_SIZE = int(os.environ.get('API_CATALOGO_PAGE_SIZE', '1000'))
+
+# Filas por página en las tablas del dashboard
+DASHBOARD_PAGE_SIZE = int(os.environ.get('DASHBOARD_PAGE_SIZE', '25'))
+
+# Máximo de puntos por respuesta del GeoJSON del mapa
+MAPA_MAX_FEATURES = int(os.environ.get('MAPA_MAX_FEATURES', '2000'))
+
 
 # ------------------------------------------------------------------------------
 # 9. LOGGING (JSON & Console)
@@ -1,9 +1,65 @@
-import requests
+import threading
+import time
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+
+import httpx
 from django.conf import settings
 
+from . import conexiones, resiliencia
+
+# Errores con los que una llamada se da por fallida (red, timeout o circuito abierto)
+ERRORES_API = (httpx.HTTPError, resiliencia.ServicioNoDisponible)
+
+_cliente = None
+_cliente_lock = threading.Lock()
+
+def _cliente_sync():
+    """httpx.Client del proceso, compartido por los hilos (es thread-safe)."""
+    global _cliente
+    with _cliente_lock:
+        if _cliente is None:
+            _cliente = httpx.Client(
+                timeout=settings.API_TIMEOUT,
+                # Los límites van en el transporte: con un transport propio httpx ignora los del cliente
+                transport=httpx.HTTPTransport(
+                    retries=settings.API_RETRY_TOTAL,
+                    limits=httpx.Limits(
+                        max_keepalive_connections=settings.API_POOL_MAXSIZE,
+                        keepalive_expiry=settings.API_POOL_IDLE_TIMEOUT,
+                    ),
+                ),
+                # El cliente se comparte entre usuarios: nunca guardamos cookies de los servicios
+                cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+                event_hooks=conexiones.GANCHOS,
+            )
+        return _cliente
+
+def indexar_favoritos(favoritos):
+    """Agrupa la lista de favoritos del servicio en ids de lugares y eventos, en su orden."""
+    resultado = {'lugares': [], 'eventos': []}
+    if isinstance(favoritos, list):
+        for f in favoritos:
+            if f.get('lugar_id'): resultado['lugares'].append(f['lugar_id'])
+            elif f.get('evento_id'): resultado['eventos'].append(f['evento_id'])
+    return resultado
+
+def indexar_votos(votos):
+    """Convierte la lista de votos del servicio en {id: valor} por tipo."""
+    resultado = {'lugares': {}, 'eventos': {}}
+    if isinstance(votos, list):
+        for v in votos:
+            if v.get('lugar_id'): resultado['lugares'][v['lugar_id']] = v['valor']
+            elif v.get('evento_id'): resultado['eventos'][v['evento_id']] = v['valor']
+    return resultado
+
 class ApiClient:
-    """Cliente centralizado para comunicar con los microservicios."""
-    
+    """
+    Lo que queda del cliente síncrono. Las páginas usan AsyncApiClient; aquí
+    solo está el POST que necesita la renovación del JWT cuando el middleware
+    corre en modo síncrono (ver renovacion.renovar), y las utilidades que
+    comparten los dos clientes.
+    """
+
     @staticmethod
     def _get_headers(token=None):
         return {'Authorization': f'Bearer {token}'} if token else {}
@@ -22,139 +78,33 @@ class ApiClient:
                 return []
         return []
 
-    # --- MÉTODOS HTTP GENÉRICOS ---
+    # --- MÉTODOS HTTP ---
 
     @staticmethod
-    def get(url, token=None, params=None):
+    def _enviar(metodo, url, token=None, **kwargs):
+        """
+        Lanza la petición por el cliente keep-alive del proceso, pasando por el
+        circuit breaker del microservicio destino y dentro del plazo de la página.
+        """
+        circuito = resiliencia.circuito_para(url)
+        timeout = circuito.permitir()
+        headers = {**ApiClient._get_headers(token), **kwargs.pop('headers', {})}
+        inicio = time.monotonic()
         try:
-            response = requests.get(url, headers=ApiClient._get_headers(token), params=params, timeout=5)
-            return ApiClient._process_response(response)
-        except requests.RequestException:
-            return []
+            response = _cliente_sync().request(metodo, url, headers=headers, timeout=timeout, **kwargs)
+        except Exception as e:
+            circuito.registrar_error(time.monotonic() - inicio, timeout, isinstance(e, httpx.TimeoutException))
+            raise
+        circuito.registrar(time.monotonic() - inicio, fallo=response.status_code >= 500)
+        return response
 
     @staticmethod
     def post(url, data=None, token=None):
         try:
-            response = requests.post(url, json=data, headers=ApiClient._get_headers(token), timeout=5)
+            response = ApiClient._enviar('POST', url, token, json=data)
             # CORRECCIÓN LOGIN: Devolvemos el JSON si es 200/201
             if response.status_code in [200, 201]:
                 return response.json()
             return None
-        except requests.RequestException:
-            return None
-
-    @staticmethod
-    def put(url, data=None, token=None):
-        try:
-            response = requests.put(url, json=data, headers=ApiClient._get_headers(token), timeout=5)
-            if response.status_code in [200, 201]:
-                return response.json()
-            return None
-        except requests.RequestException:
+        except ERRORES_API:
             return None
-    
-    @staticmethod
-    def patch(url, data=None, token=None):
-        try:
-            response = requests.patch(url, json=data, headers=ApiClient._get_headers(token), timeout=5)
-            if response.status_code in [200, 201]:
-                return response.json()
-            return None
-        except requests.RequestException:
-            return None
-
-    @staticmethod
-    def delete(url, token):
-        try:
-            requests.delete(url, headers=ApiClient._get_headers(token), timeout=5)
-            return True
-        except requests.RequestException:
-            return False
-
-    # --- LUGARES Y EVENTOS ---
-    
-    @staticmethod
-    def get_lugares(pk=None, token=None):
-        endpoint = f"{settings.API_LUGARES_URL}/lugares/"
-        if pk: endpoint += f"{pk}/"
-        return ApiClient.get(endpoint, token=token)
-
-    @staticmethod
-    def get_eventos(pk=None, token=None):
-        endpoint = f"{settings.API_EVENTOS_URL}/eventos/"
-        if pk: endpoint += f"{pk}/"
-        return ApiClient.get(endpoint, token=token)
-
-    # --- INTERACCIONES (Votos, Favoritos, Comentarios) ---
-
-    @staticmethod
-    def get_comentarios(recurso_id, tipo='lugar'):
-        url = f"{settings.API_INTERACCIONES_URL}/comentarios/{tipo}/{recurso_id}/"
-        return ApiClient.get(url)
-
-    @staticmethod
-    def get_mis_favoritos(token):
-        url = f"{settings.API_INTERACCIONES_URL}/favoritos/"
-        favoritos = ApiClient.get(url, token=token)
-        resultado = {'lugares': [], 'eventos': []}
-        if isinstance(favoritos, list):
-            for f in favoritos:
-                if f.get('lugar_id'): resultado['lugares'].append(f['lugar_id'])
-                elif f.get('evento_id'): resultado['eventos'].append(f['evento_id'])
-        return resultado
-
-    @staticmethod
-    def toggle_favorito(recurso_id, tipo, token):
-        url = f"{settings.API_INTERACCIONES_URL}/favoritos/toggle/"
-        data = {'lugar_id': recurso_id} if tipo == 'lugar' else {'evento_id': recurso_id}
-        return ApiClient.post(url, data=data, token=token)
-
-    @staticmethod
-    def enviar_voto(recurso_id, tipo, valor, token):
-        url = f"{settings.API_INTERACCIONES_URL}/votar/"
-        data = {'valor': valor, 'lugar_id' if tipo == 'lugar' else 'evento_id': recurso_id}
-        return ApiClient.post(url, data=data, token=token)
-
-    @staticmethod
-    def get_mis_votos(token):
-        url = f"{settings.API_INTERACCIONES_URL}/mis-votos/"
-        votos = ApiClient.get(url, token=token)
-        resultado = {'lugares': {}, 'eventos': {}}
-        if isinstance(votos, list):
-            for v in votos:
-                if v.get('lugar_id'): resultado['lugares'][v['lugar_id']] = v['valor']
-                elif v.get('evento_id'): resultado['eventos'][v['evento_id']] = v['valor']
-        return resultado
-
-    @staticmethod
-    def get_resumen_votos(recurso_id, tipo):
-        url = f"{settings.API_INTERACCIONES_URL}/votos/resumen/{tipo}/{recurso_id}/"
-        return ApiClient.get(url)
-
-    # --- USUARIOS Y GAMIFICACIÓN ---
-
-    @staticmethod
-    def get_me(token):
-        """Obtiene datos del usuario logueado (ID, Rol, Puntos...)"""
-        # IMPORTANTE: Asegúrate de que API_USUARIOS_URL en settings no tenga slash final extra si aquí ponemos /me/
-        # Normalmente API_USUARIOS_URL es http://service-usuarios:8000/api
-        url = f"{settings.API_USUARIOS_URL}/me/"
-        return ApiClient.get(url, token=token)
-
-    @staticmethod
-    def get_perfil_publico(user_id):
-        url = f"{settings.API_USUARIOS_URL}/{user_id}/perfil/"
-
-        # Depende de tu urls.py del backend. Si usaste router, es 'users/'.
-        return ApiClient.get(url)
-
-    @staticmethod
-    def get_ranking():
-        url = f"{settings.API_USUARIOS_URL}/ranking/"
-        return ApiClient.get(url)
-
-    @staticmethod
-    def sumar_puntos(user_id, cantidad, token):
-        url = f"{settings.API_USUARIOS_URL}/{user_id}/puntos/"
-        # Usamos PATCH para actualizar parcialmente
-        return ApiClient.patch(url, data={'puntos': cantidad}, token=token)
\ No newline at end of file
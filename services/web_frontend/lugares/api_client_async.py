@@ -0,0 +1,405 @@
+"""
+Cliente asyncio de los microservicios para las vistas async servidas por ASGI.
+
+Usa un httpx.AsyncClient por event loop, que mantiene las conexiones abiertas
+con cada microservicio. Con uvicorn hay un único loop por worker, así que todas
+las peticiones de ese proceso comparten el mismo pool de conexiones; se cierra
+al apagar el worker (ver CultureMapBackend/asgi.py) o con cerrar(). La
+reutilización de esas conexiones se cuenta en conexiones.py.
+"""
+import asyncio
+import time
+import weakref
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+
+import httpx
+from django.conf import settings
+
+from . import cache_catalogo, conexiones, resiliencia, revalidacion, tokens, vuelo_unico
+from .api_client import ApiClient, indexar_favoritos, indexar_votos
+
+_clientes = weakref.WeakKeyDictionary()
+
+# Errores con los que una llamada se da por fallida (red, timeout o circuito abierto)
+ERRORES_API = (httpx.HTTPError, resiliencia.ServicioNoDisponible)
+
+def _cliente():
+    loop = asyncio.get_running_loop()
+    cliente = _clientes.get(loop)
+    if cliente is None:
+        cliente = httpx.AsyncClient(
+            timeout=settings.API_TIMEOUT,
+            # Los límites van en el transporte: con un transport propio httpx ignora los del cliente
+            transport=httpx.AsyncHTTPTransport(
+                retries=settings.API_RETRY_TOTAL,
+                limits=httpx.Limits(
+                    max_keepalive_connections=settings.API_POOL_MAXSIZE,
+                    keepalive_expiry=settings.API_POOL_IDLE_TIMEOUT,
+                ),
+            ),
+            # El cliente se comparte entre usuarios: nunca guardamos cookies de los servicios
+            cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+            event_hooks=conexiones.GANCHOS_ASYNC,
+        )
+        _clientes[loop] = cliente
+    return cliente
+
+async def cerrar():
+    """Cierra el cliente del loop actual y sus conexiones (al apagar el worker)."""
+    cliente = _clientes.pop(asyncio.get_running_loop(), None)
+    if cliente is not None:
+        await cliente.aclose()
+
+
+class AsyncApiClient:
+    """Cliente asyncio para comunicar con los microservicios desde vistas async."""
+
+    # --- MÉTODOS HTTP GENÉRICOS ---
+
+    @staticmethod
+    async def _request(metodo, url, token=None, **kwargs):
+        """
+        Lanza la petición y, si el servicio rechaza el token (401), la repite
+        una vez con el token renovado de la sesión.
+        """
+        response = await AsyncApiClient._enviar(metodo, url, token, **kwargs)
+        if response.status_code == 401 and token:
+            nuevo = await tokens.arenovar_tras_401(token)
+            if nuevo:
+                response = await AsyncApiClient._enviar(metodo, url, nuevo, **kwargs)
+        return response
+
+    @staticmethod
+    async def _enviar(metodo, url, token=None, **kwargs):
+        """
+        Lanza la petición por el cliente keep-alive del loop, pasando por el
+        circuit breaker del microservicio destino y dentro del plazo de la página.
+        """
+        circuito = resiliencia.circuito_para(url)
+        timeout = circuito.permitir()
+        headers = {**ApiClient._get_headers(token), **kwargs.pop('headers', {})}
+        inicio = time.monotonic()
+        try:
+            response = await _cliente().request(metodo, url, headers=headers, timeout=timeout, **kwargs)
+        except asyncio.CancelledError:
+            # Nos cancelaron a nosotros (p. ej. el cliente cerró): no dice nada del servicio
+            circuito.liberar()
+            raise
+        except Exception as e:
+            circuito.registrar_error(time.monotonic() - inicio, timeout, isinstance(e, httpx.TimeoutException))
+            raise
+        circuito.registrar(time.monotonic() - inicio, fallo=response.status_code >= 500)
+        return response
+
+    @staticmethod
+    async def get(url, token=None, params=None):
+        try:
+            return await AsyncApiClient.get_o_error(url, token, params)
+        except resiliencia.ServicioNoDisponible:
+            resiliencia.marcar_degradada()
+            return []
+
+    @staticmethod
+    async def get_o_error(url, token=None, params=None):
+        """
+        Como get, pero un fallo del servicio (red, 5xx o circuito abierto) lanza
+        ServicioNoDisponible en lugar de confundirse con una respuesta vacía.
+        """
+        # Los GET idénticos simultáneos comparten una sola llamada al servicio
+        return await vuelo_unico.acompartir(
+            vuelo_unico.clave(url, token, params), lambda: AsyncApiClient._get(url, token, params)
+        )
+
+    @staticmethod
+    async def _get(url, token=None, params=None):
+        k = revalidacion.clave(url, token, params)
+        guardada = await revalidacion.aobtener(k)
+        try:
+            response = await AsyncApiClient._request(
+                'GET', url, token, params=params, headers=revalidacion.cabeceras(guardada)
+            )
+        except httpx.HTTPError as e:
+            raise resiliencia.ServicioNoDisponible(str(e)) from e
+        if response.status_code >= 500:
+            raise resiliencia.ServicioNoDisponible(f"{response.status_code} en {url}")
+        if response.status_code == 304 and guardada:
+            return guardada['datos']
+        datos = ApiClient._process_response(response)
+        await revalidacion.aguardar(k, response, datos)
+        return datos
+
+    @staticmethod
+    async def post(url, data=None, token=None):
+        try:
+            response = await AsyncApiClient._request('POST', url, token, json=data)
+            if response.status_code in [200, 201]:
+                return response.json()
+            return None
+        except ERRORES_API:
+            return None
+
+    @staticmethod
+    async def put(url, data=None, token=None):
+        try:
+            response = await AsyncApiClient._request('PUT', url, token, json=data)
+            if response.status_code in [200, 201]:
+                return response.json()
+            return None
+        except ERRORES_API:
+            return None
+
+    @staticmethod
+    async def patch(url, data=None, token=None):
+        try:
+            response = await AsyncApiClient._request('PATCH', url, token, json=data)
+            if response.status_code in [200, 201]:
+                return response.json()
+            return None
+        except ERRORES_API:
+            return None
+
+    @staticmethod
+    async def delete(url, token):
+        try:
+            await AsyncApiClient._request('DELETE', url, token)
+            return True
+        except ERRORES_API:
+            return False
+
+    @staticmethod
+    def estadisticas_conexiones():
+        """Reutilización de conexiones por microservicio (hits = sin handshake)."""
+        return conexiones.estadisticas()
+
+    @staticmethod
+    def estado_circuitos():
+        """Estado del circuit breaker de cada microservicio."""
+        return resiliencia.estado()
+
+    @staticmethod
+    def estadisticas_vuelo_unico():
+        """GET que salieron al servicio frente a los que compartieron una llamada en curso."""
+        return vuelo_unico.estadisticas()
+
+    @staticmethod
+    async def get_pagina(url, token=None, params=None):
+        """
+        Pide una página de un listado con ?limit= y la devuelve entera
+        ({'next', 'previous', 'results'} y 'count' si el servicio lo da);
+        vacía si hay error.
+        """
+        try:
+            return await AsyncApiClient.get_pagina_o_error(url, token, params)
+        except ERRORES_API:
+            resiliencia.marcar_degradada()
+            return {'count': 0, 'next': None, 'previous': None, 'results': []}
+
+    @staticmethod
+    async def get_pagina_o_error(url, token=None, params=None):
+        """Como get_pagina, pero los fallos del servicio lanzan ServicioNoDisponible."""
+        k = revalidacion.clave(url, token, params, tipo='pagina')
+        guardada = await revalidacion.aobtener(k)
+        try:
+            response = await AsyncApiClient._request(
+                'GET', url, token, params=params, headers=revalidacion.cabeceras(guardada)
+            )
+        except httpx.HTTPError as e:
+            raise resiliencia.ServicioNoDisponible(str(e)) from e
+        if response.status_code >= 500:
+            raise resiliencia.ServicioNoDisponible(f"{response.status_code} en {url}")
+        if response.status_code == 304 and guardada:
+            return guardada['datos']
+        if response.status_code == 200:
+            datos = response.json()
+            await revalidacion.aguardar(k, response, datos)
+            return datos
+        return {'count': 0, 'next': None, 'previous': None, 'results': []}
+
+    @staticmethod
+    async def get_todo_o_error(url, token=None):
+        """
+        Como get_o_error, pero si el listado viene paginado sigue los enlaces
+        'next' y devuelve las filas de todas las páginas. Un fallo a mitad lanza
+        ServicioNoDisponible: una lista a medias no debe pasar por completa.
+        """
+        recursos, params = [], {'limit': settings.API_CATALOGO_PAGE_SIZE}
+        while url:
+            pagina = await AsyncApiClient.get_pagina_o_error(url, token, params)
+            if isinstance(pagina, list):
+                return pagina  # El servicio no pagina este listado
+            recursos.extend(pagina.get('results', []))
+            # 'next' ya incluye el limit y el cursor
+            url, params = pagina.get('next'), None
+        return recursos
+
+    @staticmethod
+    async def get_total(url, token=None, params=None):
+        """Lee un endpoint de conteo (.../total/) y devuelve el número, 0 si falla."""
+        datos = await AsyncApiClient.get(url, token=token, params=params)
+        return datos.get('total', 0) if isinstance(datos, dict) else 0
+
+    @staticmethod
+    async def iterar_paginas(url, token=None):
+        """
+        Recorre un listado paginado con ?limit= siguiendo los enlaces 'next' y
+        devuelve cada página de resultados en cuanto llega. Un error a mitad
+        se propaga: mejor cortar la descarga que entregar un fichero incompleto.
+        """
+        params = {'limit': settings.API_EXPORT_PAGE_SIZE}
+        while url:
+            response = await AsyncApiClient._request('GET', url, token, params=params)
+            response.raise_for_status()
+            datos = response.json()
+            yield datos['results']
+            # 'next' ya incluye limit y offset (o el cursor)
+            url, params = datos['next'], None
+
+    # --- FAN-OUT CONCURRENTE ---
+
+    @staticmethod
+    async def en_paralelo(llamadas):
+        """
+        Espera a la vez un dict {nombre: corrutina} y devuelve {nombre: resultado}.
+        La página tarda lo que la llamada más lenta y no la suma de todas.
+        """
+        resultados = await asyncio.gather(*llamadas.values())
+        return dict(zip(llamadas.keys(), resultados))
+
+    # --- LUGARES Y EVENTOS ---
+
+    @staticmethod
+    async def get_lugares(pk=None, token=None):
+        endpoint = f"{settings.API_LUGARES_URL}/lugares/"
+        if pk: endpoint += f"{pk}/"
+        if token:
+            return await AsyncApiClient.get(endpoint, token=token)
+        cargar = AsyncApiClient.get_o_error if pk else AsyncApiClient.get_todo_o_error
+        return await cache_catalogo.aobtener_o_cargar('lugares', pk, lambda: cargar(endpoint))
+
+    @staticmethod
+    async def get_eventos(pk=None, token=None):
+        endpoint = f"{settings.API_EVENTOS_URL}/eventos/"
+        if pk: endpoint += f"{pk}/"
+        if token:
+            return await AsyncApiClient.get(endpoint, token=token)
+        return await cache_catalogo.aobtener_o_cargar('eventos', pk, lambda: AsyncApiClient.get_o_error(endpoint))
+
+    @staticmethod
+    async def get_lugares_en_zona(bbox):
+        """
+        Página con los lugares públicos dentro de (oeste, sur, este, norte),
+        filtrados por el índice espacial de service-lugares y solo con los
+        campos del mapa (?view=map). Se piden MAPA_MAX_FEATURES (el servicio
+        puede dar menos): si queda 'next', el mapa va recortado. Lanza
+        ServicioNoDisponible si falla.
+        """
+        url = f"{settings.API_LUGARES_URL}/lugares/"
+        return await AsyncApiClient.get_pagina_o_error(url, params={
+            'bbox': ','.join(f"{v:.5f}" for v in bbox),
+            'view': 'map',
+            'limit': settings.MAPA_MAX_FEATURES,
+        })
+
+    @staticmethod
+    async def get_tesela(capa, z, x, y):
+        """
+        Tesela z/x/y del mapa de 'lugares' o 'eventos', ya agrupada por el
+        servicio (grupos con total por categoría o puntos sueltos). Lanza
+        ServicioNoDisponible si falla.
+        """
+        base = settings.API_LUGARES_URL if capa == 'lugares' else settings.API_EVENTOS_URL
+        return await AsyncApiClient.get_o_error(f"{base}/{capa}/teselas/{z}/{x}/{y}/")
+
+    @staticmethod
+    async def get_por_ids(catalogo, ids):
+        """
+        Varios lugares o eventos de una vez con el multi-get del servicio
+        (?ids=1,2,3), en el orden de ids. Se parte en lotes de API_MULTI_GET_MAX,
+        que se piden a la vez. Los que no existen o no son públicos no vuelven.
+        """
+        base = settings.API_LUGARES_URL if catalogo == 'lugares' else settings.API_EVENTOS_URL
+        url = f"{base}/{catalogo}/"
+        lote = settings.API_MULTI_GET_MAX
+        lotes = [ids[i:i + lote] for i in range(0, len(ids), lote)]
+        respuestas = await asyncio.gather(*[
+            AsyncApiClient.get(url, params={'ids': ','.join(str(pk) for pk in parte)})
+            for parte in lotes
+        ])
+        return [recurso for respuesta in respuestas if isinstance(respuesta, list) for recurso in respuesta]
+
+    # --- INTERACCIONES (Votos, Favoritos, Comentarios) ---
+
+    @staticmethod
+    async def get_comentarios(recurso_id, tipo='lugar'):
+        url = f"{settings.API_INTERACCIONES_URL}/comentarios/{tipo}/{recurso_id}/"
+        return await AsyncApiClient.get(url)
+
+    @staticmethod
+    async def get_mis_favoritos(token):
+        url = f"{settings.API_INTERACCIONES_URL}/favoritos/"
+        return indexar_favoritos(await AsyncApiClient.get(url, token=token))
+
+    @staticmethod
+    async def toggle_favorito(recurso_id, tipo, token):
+        url = f"{settings.API_INTERACCIONES_URL}/favoritos/toggle/"
+        data = {'lugar_id': recurso_id} if tipo == 'lugar' else {'evento_id': recurso_id}
+        return await AsyncApiClient.post(url, data=data, token=token)
+
+    @staticmethod
+    async def enviar_voto(recurso_id, tipo, valor, token):
+        url = f"{settings.API_INTERACCIONES_URL}/votar/"
+        data = {'valor': valor, 'lugar_id' if tipo == 'lugar' else 'evento_id': recurso_id}
+        return await AsyncApiClient.post(url, data=data, token=token)
+
+    @staticmethod
+    async def get_mis_votos(token):
+        url = f"{settings.API_INTERACCIONES_URL}/mis-votos/"
+        return indexar_votos(await AsyncApiClient.get(url, token=token))
+
+    @staticmethod
+    async def get_huella_interacciones(token):
+        url = f"{settings.API_INTERACCIONES_URL}/mis-interacciones/huella/"
+        datos = await AsyncApiClient.get(url, token=token)
+        return datos.get('huella') if isinstance(datos, dict) else None
+
+    @staticmethod
+    async def get_resumen_votos(recurso_id, tipo):
+        url = f"{settings.API_INTERACCIONES_URL}/votos/resumen/{tipo}/{recurso_id}/"
+        return await AsyncApiClient.get(url)
+
+    # --- USUARIOS Y GAMIFICACIÓN ---
+
+    @staticmethod
+    async def get_ranking():
+        url = f"{settings.API_USUARIOS_URL}/ranking/"
+        return await AsyncApiClient.get(url)
+
+    @staticmethod
+    async def registrar(data):
+        """Alta de usuario. Devuelve (ok, mensaje_error)."""
+        try:
+            response = await AsyncApiClient._request('POST', f"{settings.API_USUARIOS_URL}/register/", json=data)
+        except ERRORES_API:
+            return False, "Error de conexión"
+        if response.status_code == 201:
+            return True, None
+        return False, f"Error: {response.text}"
+
+    @staticmethod
+    async def cambiar_rol(user_id, rol, token):
+        url = f"{settings.API_USUARIOS_URL}/users/{user_id}/"
+        return await AsyncApiClient.patch(url, data={'rol': rol}, token=token)
+
+    @staticmethod
+    async def get_me(token):
+        """Datos del usuario logueado (ID, Rol, Puntos...)"""
+        return await AsyncApiClient.get(f"{settings.API_USUARIOS_URL}/me/", token=token)
+
+    @staticmethod
+    async def get_perfil_publico(user_id):
+        return await AsyncApiClient.get(f"{settings.API_USUARIOS_URL}/{user_id}/perfil/")
+
+    @staticmethod
+    async def sumar_puntos(user_id, cantidad, token):
+        url = f"{settings.API_USUARIOS_URL}/{user_id}/puntos/"
+        return await AsyncApiClient.patch(url, data={'puntos': cantidad}, token=token)
@@ -0,0 +1,85 @@
+"""
+Caché compartida del catálogo público (lugares y eventos) con stale-while-revalidate.
+
+Cada entrada guarda los datos y hasta cuándo están frescos:
+- Frescos (CATALOGO_CACHE_TTL segundos): se sirven sin llamar al servicio.
+- Pasados (hasta CATALOGO_CACHE_STALE segundos más): se sirven al momento y se
+  lanza una recarga en segundo plano, así la página no espera al servicio.
+- Si el servicio falla (red, 5xx o circuito abierto), se sigue sirviendo la
+  última copia buena en lugar de una lista vacía.
+
+Las escrituras que hace el propio frontend (crear, aprobar/rechazar, borrar)
+invalidan las entradas afectadas.
+"""
+import asyncio
+import contextvars
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .resiliencia import ServicioNoDisponible, marcar_degradada
+
+logger = logging.getLogger(__name__)
+
+# Referencias a las recargas async en curso (el loop solo guarda referencias débiles)
+_tareas = set()
+
+def clave(tipo, pk=None):
+    return f"catalogo-swr:{tipo}:{pk}" if pk else f"catalogo-swr:{tipo}:lista"
+
+def _entrada(datos):
+    return {'datos': datos, 'fresco_hasta': time.time() + settings.CATALOGO_CACHE_TTL}
+
+def _timeout():
+    return settings.CATALOGO_CACHE_TTL + settings.CATALOGO_CACHE_STALE
+
+def _es_fresca(entrada):
+    return time.time() < entrada['fresco_hasta']
+
+async def _aguardar(k, datos):
+    # Una respuesta vacía (recurso inexistente) no se guarda y borra la copia anterior
+    if datos:
+        await cache.aset(k, _entrada(datos), _timeout())
+    else:
+        await cache.adelete(k)
+
+async def _arecargar(k, cargar):
+    try:
+        await _aguardar(k, await cargar())
+    except ServicioNoDisponible as e:
+        logger.warning("No se pudo recargar %s, se mantiene la copia anterior: %s", k, e)
+    finally:
+        await cache.adelete(f"{k}:recargando")
+
+async def aobtener_o_cargar(tipo, pk, cargar):
+    """
+    Devuelve la entrada cacheada o la carga con cargar(), una corrutina que
+    debe lanzar ServicioNoDisponible si el servicio falla.
+    """
+    k = clave(tipo, pk)
+    entrada = await cache.aget(k)
+    if entrada is not None:
+        # Solo un worker recarga cada clave a la vez; los demás siguen sirviendo la copia
+        if not _es_fresca(entrada) and await cache.aadd(f"{k}:recargando", True, settings.API_PLAZO_PAGINA):
+            # Contexto vacío: la recarga no hereda el plazo de la página que la lanzó
+            tarea = asyncio.get_running_loop().create_task(_arecargar(k, cargar), context=contextvars.Context())
+            _tareas.add(tarea)
+            tarea.add_done_callback(_tareas.discard)
+        return entrada['datos']
+
+    try:
+        datos = await cargar()
+    except ServicioNoDisponible:
+        marcar_degradada()
+        return []
+    await _aguardar(k, datos)
+    return datos
+
+async def ainvalidar(tipo, pk=None):
+    """Borra la lista pública y, si se indica, el detalle del recurso."""
+    claves = [clave(tipo)]
+    if pk:
+        claves.append(clave(tipo, pk))
+    await cache.adelete_many(claves)
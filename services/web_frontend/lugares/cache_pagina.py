@@ -0,0 +1,162 @@
+"""
+Caché de página completa para visitantes anónimos.
+
+Las páginas públicas (portada, eventos, ranking y detalles) salen idénticas
+para todo el que no ha iniciado sesión, así que su HTML se guarda entero y se
+sirve sin llamar a los microservicios ni renderizar la plantilla. Solo se usa
+con sesión vacía: en cuanto la sesión tiene algo (token, rol...) la página se
+genera como siempre.
+
+Cada vista declara de qué grupos depende (p. ej. 'lugares' y 'lugar:7'). Cada
+grupo tiene un número de versión en la caché que forma parte de la clave de la
+página; las vistas que escriben suben la versión de los grupos afectados
+(invalidar) y las páginas viejas dejan de encontrarse y caducan solas.
+
+Una página que se generó con algún servicio caído (una lista vacía, sin
+valoración...) no se guarda: se vería rota durante todo PAGINA_CACHE_TTL
+aunque el servicio ya hubiera vuelto.
+"""
+import functools
+import hashlib
+import threading
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from . import resiliencia
+
+_lock = threading.Lock()
+_contadores = {'aciertos': 0, 'fallos': 0, 'omitidas': 0, 'degradadas': 0}
+
+def _contar(nombre):
+    with _lock:
+        _contadores[nombre] += 1
+
+def _clave_version(grupo):
+    return f"pagina-version:{grupo}"
+
+def _clave(request, versiones):
+    ruta = hashlib.sha256(request.get_full_path().encode()).hexdigest()
+    return f"pagina:{ruta}:{'.'.join(str(v) for v in versiones)}"
+
+def _grupos(plantillas, kwargs):
+    return [g.format(**kwargs) for g in plantillas]
+
+def _cacheable(request):
+    return settings.PAGINA_CACHE_TTL > 0 and request.method in ('GET', 'HEAD')
+
+def _guardable(request, response):
+    # Si la plantilla usó el token CSRF, la página lleva algo propio del visitante
+    return response.status_code == 200 and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+
+def _empaquetar(response, contenido):
+    return {'contenido': contenido, 'tipo': response['Content-Type']}
+
+def _completa(marca):
+    if marca['degradada']:
+        _contar('degradadas')
+        return False
+    return True
+
+async def _guardar_al_terminar(response, contenido, k, marca):
+    """Deja pasar las partes de una respuesta en streaming y la guarda completa al final."""
+    partes = []
+    async for parte in contenido:
+        partes.append(parte)
+        yield parte
+    # Las partes se generan ahora: hasta el final no se sabe si algún servicio falló
+    if _completa(marca):
+        await cache.aset(k, _empaquetar(response, b''.join(partes)), settings.PAGINA_CACHE_TTL)
+
+def _desempaquetar(guardada):
+    return HttpResponse(guardada['contenido'], content_type=guardada['tipo'])
+
+def cache_anonima(*grupos):
+    """
+    Decora una vista (síncrona o async) para cachear su respuesta a anónimos.
+    Los grupos admiten los kwargs de la URL: @cache_anonima('lugares', 'lugar:{pk}').
+    """
+    def decorador(vista):
+        if iscoroutinefunction(vista):
+            @functools.wraps(vista)
+            async def envoltura(request, *args, **kwargs):
+                if not _cacheable(request) or await request.session.akeys():
+                    _contar('omitidas')
+                    return await vista(request, *args, **kwargs)
+                claves = [_clave_version(g) for g in _grupos(grupos, kwargs)]
+                versiones = await cache.aget_many(claves)
+                k = _clave(request, [versiones.get(c, 0) for c in claves])
+                guardada = await cache.aget(k)
+                if guardada is not None:
+                    _contar('aciertos')
+                    return _desempaquetar(guardada)
+                _contar('fallos')
+                token, marca = resiliencia.vigilar_degradacion()
+                try:
+                    response = await vista(request, *args, **kwargs)
+                finally:
+                    resiliencia.dejar_de_vigilar(token)
+                if _guardable(request, response):
+                    if response.streaming:
+                        # Se sigue enviando por partes; la copia se guarda cuando acaba
+                        response.streaming_content = _guardar_al_terminar(response, response.streaming_content, k, marca)
+                    elif _completa(marca):
+                        await cache.aset(k, _empaquetar(response, response.content), settings.PAGINA_CACHE_TTL)
+                return response
+        else:
+            @functools.wraps(vista)
+            def envoltura(request, *args, **kwargs):
+                if not _cacheable(request) or request.session.keys():
+                    _contar('omitidas')
+                    return vista(request, *args, **kwargs)
+                claves = [_clave_version(g) for g in _grupos(grupos, kwargs)]
+                versiones = cache.get_many(claves)
+                k = _clave(request, [versiones.get(c, 0) for c in claves])
+                guardada = cache.get(k)
+                if guardada is not None:
+                    _contar('aciertos')
+                    return _desempaquetar(guardada)
+                _contar('fallos')
+                token, marca = resiliencia.vigilar_degradacion()
+                try:
+                    response = vista(request, *args, **kwargs)
+                finally:
+                    resiliencia.dejar_de_vigilar(token)
+                if _guardable(request, response) and _completa(marca):
+                    cache.set(k, _empaquetar(response, response.content), settings.PAGINA_CACHE_TTL)
+                return response
+        return envoltura
+    return decorador
+
+def invalidar(*grupos):
+    """Sube la versión de los grupos: sus páginas cacheadas dejan de servirse."""
+    for grupo in grupos:
+        k = _clave_version(grupo)
+        # add() crea la versión si no existía; si ya estaba, la incrementamos
+        if not cache.add(k, 1, None):
+            try:
+                cache.incr(k)
+            except ValueError:  # caducó entre medias
+                cache.set(k, 1, None)
+
+async def ainvalidar(*grupos):
+    for grupo in grupos:
+        k = _clave_version(grupo)
+        if not await cache.aadd(k, 1, None):
+            try:
+                await cache.aincr(k)
+            except ValueError:
+                await cache.aset(k, 1, None)
+
+def estadisticas():
+    """
+    Aciertos, fallos, peticiones no cacheables (con sesión o no GET) y páginas
+    que no se guardaron por salir con algún servicio caído, en este proceso.
+    """
+    with _lock:
+        datos = dict(_contadores)
+    consultas = datos['aciertos'] + datos['fallos']
+    datos['ratio_aciertos'] = round(datos['aciertos'] / consultas, 3) if consultas else None
+    return datos
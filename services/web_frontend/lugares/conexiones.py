@@ -0,0 +1,79 @@
+"""
+Reutilización de conexiones de los clientes httpx con cada microservicio.
+
+httpx no dice si una petición fue por una conexión keep-alive ya abierta o tuvo
+que abrir otra, así que los clientes llevan estos event hooks: al salir, cada
+petición se marca con la extensión 'trace' de httpcore, que avisa cuando se
+conecta por TCP; al llegar la respuesta cuenta como miss (conexión nueva) o hit
+(conexión reutilizada) del microservicio destino.
+"""
+import threading
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+_lock = threading.Lock()
+_contadores = {}  # servicio -> {'hits': n, 'misses': n}
+
+def _bases_servicios():
+    return {
+        'usuarios': settings.API_USUARIOS_URL,
+        'lugares': settings.API_LUGARES_URL,
+        'eventos': settings.API_EVENTOS_URL,
+        'interacciones': settings.API_INTERACCIONES_URL,
+    }
+
+def servicio_de(url):
+    """Devuelve el nombre del microservicio al que apunta una URL."""
+    for nombre, base in _bases_servicios().items():
+        if url.startswith(base):
+            return nombre
+    return urlsplit(url).netloc
+
+
+class _Traza:
+    """Extensión 'trace' de httpcore: apunta si la petición abrió conexión."""
+
+    def __init__(self):
+        self.conecto = False
+
+    def _evento(self, nombre):
+        if nombre == 'connection.connect_tcp.complete':
+            self.conecto = True
+
+    def __call__(self, nombre, info):
+        self._evento(nombre)
+
+
+class _TrazaAsync(_Traza):
+    # Con el cliente async httpcore espera una corrutina
+    async def __call__(self, nombre, info):
+        self._evento(nombre)
+
+
+def _contar(response):
+    traza = response.request.extensions.get('trace')
+    if not isinstance(traza, _Traza):
+        return
+    servicio = servicio_de(str(response.request.url))
+    with _lock:
+        contadores = _contadores.setdefault(servicio, {'hits': 0, 'misses': 0})
+        contadores['misses' if traza.conecto else 'hits'] += 1
+
+def _marcar(request):
+    request.extensions['trace'] = _Traza()
+
+async def _amarcar(request):
+    request.extensions['trace'] = _TrazaAsync()
+
+async def _acontar(response):
+    _contar(response)
+
+# event_hooks para httpx.Client y httpx.AsyncClient
+GANCHOS = {'request': [_marcar], 'response': [_contar]}
+GANCHOS_ASYNC = {'request': [_amarcar], 'response': [_acontar]}
+
+def estadisticas():
+    """Hits (conexión reutilizada) y misses (conexión nueva) por microservicio."""
+    with _lock:
+        return {servicio: dict(contadores) for servicio, contadores in _contadores.items()}
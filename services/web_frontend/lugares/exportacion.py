@@ -0,0 +1,63 @@
+"""
+Exportaciones en streaming (CSV y JSONL) del catálogo y de las interacciones.
+
+Las filas se piden al microservicio página a página y cada página se escribe
+en la respuesta en cuanto llega, así la memoria no crece con el tamaño del
+catálogo y la descarga empieza antes de tener todos los datos.
+"""
+import csv
+import json
+
+from django.conf import settings
+
+from .api_client_async import AsyncApiClient
+
+# recurso -> (URL del listado, [(campo, cabecera CSV), ...])
+EXPORTACIONES = {
+    'lugares': (lambda: f"{settings.API_LUGARES_URL}/lugares/", [
+        ('id', 'ID'), ('nombre', 'Nombre'), ('categoria', 'Categoría'),
+        ('lat', 'Latitud'), ('lng', 'Longitud'), ('descripcion', 'Descripción'),
+    ]),
+    'eventos': (lambda: f"{settings.API_EVENTOS_URL}/eventos/", [
+        ('id', 'ID'), ('nombre', 'Nombre'), ('categoria', 'Categoría'),
+        ('fecha_inicio', 'Inicio'), ('fecha_fin', 'Fin'), ('estado', 'Estado'),
+        ('lat', 'Latitud'), ('lng', 'Longitud'), ('descripcion', 'Descripción'),
+    ]),
+    'comentarios': (lambda: f"{settings.API_INTERACCIONES_URL}/export/comentarios/", [
+        ('id', 'ID'), ('usuario_id', 'Usuario'), ('lugar_id', 'Lugar'),
+        ('evento_id', 'Evento'), ('texto', 'Texto'), ('creado_en', 'Fecha'),
+    ]),
+    'votos': (lambda: f"{settings.API_INTERACCIONES_URL}/export/votos/", [
+        ('id', 'ID'), ('usuario_id', 'Usuario'), ('lugar_id', 'Lugar'),
+        ('evento_id', 'Evento'), ('valor', 'Valor'), ('creado_en', 'Fecha'),
+    ]),
+    'favoritos': (lambda: f"{settings.API_INTERACCIONES_URL}/export/favoritos/", [
+        ('id', 'ID'), ('usuario_id', 'Usuario'), ('lugar_id', 'Lugar'),
+        ('evento_id', 'Evento'), ('creado_en', 'Fecha'),
+    ]),
+}
+
+FORMATOS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+class _Eco:
+    """Pseudo-fichero para csv.writer: devuelve la línea en vez de guardarla."""
+    def write(self, valor):
+        return valor
+
+async def filas(recurso, formato, token):
+    """Genera el fichero por trozos: la cabecera primero y luego una página por trozo."""
+    url, columnas = EXPORTACIONES[recurso]
+    campos = [campo for campo, _ in columnas]
+    writer = csv.writer(_Eco())
+
+    if formato == 'csv':
+        yield writer.writerow([cabecera for _, cabecera in columnas])
+
+    async for pagina in AsyncApiClient.iterar_paginas(url(), token):
+        if formato == 'csv':
+            yield ''.join(writer.writerow([fila.get(c) for c in campos]) for fila in pagina)
+        else:
+            yield ''.join(json.dumps({c: fila.get(c) for c in campos}, ensure_ascii=False) + '\n' for fila in pagina)
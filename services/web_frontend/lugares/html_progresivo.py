@@ -0,0 +1,56 @@
+"""
+Envío de una página HTML por partes.
+
+Primero sale la página entera con huecos en las zonas que dependen de los
+microservicios (navbar, mapa y scripts incluidos), así el navegador empieza a
+pintar y a cargar Leaflet sin esperar a nadie. Después, según van llegando las
+respuestas, se envía cada zona dentro de un <template id="parte-NOMBRE"> con
+una llamada a colocarParte('NOMBRE'), que la mueve a su hueco
+(<div id="hueco-NOMBRE">). Por último se cierra el documento.
+"""
+import asyncio
+import contextvars
+
+from django.http import StreamingHttpResponse
+from django.template.loader import render_to_string
+
+CIERRE = '</body>'
+
+async def _partes(request, plantilla, contexto, partes, contexto_peticion):
+    # Las llamadas arrancan en el loop que envía el cuerpo, pero con el contexto
+    # de la petición (plazo de página, renovación del token)
+    loop = asyncio.get_running_loop()
+    nombres = {
+        loop.create_task(llamada(), context=contexto_peticion): nombre
+        for nombre, (llamada, _) in partes.items()
+    }
+    try:
+        pagina = render_to_string(plantilla, contexto, request)
+        cuerpo, cierre = pagina.rsplit(CIERRE, 1)
+        yield cuerpo
+
+        por_llegar = set(nombres)
+        while por_llegar:
+            listas, por_llegar = await asyncio.wait(por_llegar, return_when=asyncio.FIRST_COMPLETED)
+            for tarea in listas:
+                nombre = nombres[tarea]
+                html = render_to_string(partes[nombre][1], {nombre: tarea.result()}, request)
+                yield (f'<template id="parte-{nombre}">{html}</template>'
+                       f'<script>colocarParte("{nombre}")</script>\n')
+
+        yield CIERRE + cierre
+    finally:
+        # Si el navegador corta la conexión no seguimos esperando a los servicios
+        for tarea in nombres:
+            tarea.cancel()
+
+def respuesta(request, plantilla, partes, contexto=None):
+    """
+    StreamingHttpResponse de la plantilla con sus partes diferidas.
+    partes es {nombre: (funcion_async, plantilla_de_la_parte)}; cada función se
+    llama sin argumentos al empezar a enviar el cuerpo.
+    """
+    return StreamingHttpResponse(
+        _partes(request, plantilla, contexto or {}, partes, contextvars.copy_context()),
+        content_type='text/html; charset=utf-8',
+    )
@@ -0,0 +1,90 @@
+"""
+GeoJSON del mapa por ventana visible.
+
+El mapa de index_lugares pide solo los puntos dentro del bbox que está
+mostrando, con las coordenadas redondeadas a la precisión que se distingue en
+pantalla a ese zoom y las propiedades mínimas para pintar el popup.
+
+Con las teselas z/x/y los servicios ya dan los grupos calculados (ver
+teselas.py en cada uno); aquí solo queda el plan B con el catálogo cacheado.
+"""
+import math
+
+from django.conf import settings
+
+# Propiedades que necesita el popup de cada capa
+PROPIEDADES = {
+    'lugares': lambda r: {'id': r['id'], 'nombre': r.get('nombre'), 'categoria': r.get('categoria')},
+    'eventos': lambda r: {'id': r['id'], 'nombre': r.get('nombre'), 'fecha': (r.get('fecha_inicio') or '')[:10]},
+}
+
+# Zoom máximo de las teselas (el de Leaflet con OpenStreetMap)
+ZOOM_MAX = 20
+
+def parsear_bbox(valor):
+    """'oeste,sur,este,norte' -> tupla de floats, o None si no es válido."""
+    try:
+        oeste, sur, este, norte = (float(v) for v in valor.split(','))
+    except (AttributeError, ValueError):
+        return None
+    if not (-90 <= sur <= norte <= 90) or not all(math.isfinite(v) for v in (oeste, este)):
+        return None
+    return oeste, sur, este, norte
+
+def normalizar_bbox(bbox):
+    """
+    Lleva las longitudes a [-180, 180] como las espera service-lugares (Leaflet
+    las da fuera de rango al dar la vuelta al mundo). Si el resultado cruza el
+    antimeridiano, queda oeste > este.
+    """
+    oeste, sur, este, norte = bbox
+    if este - oeste >= 360:
+        return -180.0, sur, 180.0, norte
+    envolver = lambda lng: lng if -180 <= lng <= 180 else (lng + 180) % 360 - 180
+    return envolver(oeste), sur, envolver(este), norte
+
+def decimales_para_zoom(zoom):
+    """Decimales suficientes para que el redondeo no se note (≈1 píxel de tesela de 256)."""
+    grados_por_pixel = 360 / (256 * 2 ** zoom)
+    return min(6, max(0, math.ceil(-math.log10(grados_por_pixel))))
+
+def _dentro(lat, lng, bbox):
+    oeste, sur, este, norte = bbox
+    if not sur <= lat <= norte:
+        return False
+    # Un bbox que cruza el antimeridiano llega con oeste > este
+    if oeste <= este:
+        return oeste <= lng <= este
+    return lng >= oeste or lng <= este
+
+def geojson(capa, recursos, bbox, zoom, truncado=False):
+    """
+    FeatureCollection con los recursos visibles del bbox (como mucho
+    MAPA_MAX_FEATURES). truncado=True indica que el servicio ya dejó fuera
+    recursos de la zona.
+    """
+    decimales = decimales_para_zoom(zoom)
+    propiedades = PROPIEDADES[capa]
+    features = []
+    for recurso in recursos if isinstance(recursos, list) else []:
+        lat, lng = recurso.get('lat'), recurso.get('lng')
+        if lat is None or lng is None or not _dentro(lat, lng, bbox):
+            continue
+        if len(features) >= settings.MAPA_MAX_FEATURES:
+            truncado = True
+            break
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [round(lng, decimales), round(lat, decimales)]},
+            'properties': propiedades(recurso),
+        })
+    return {'type': 'FeatureCollection', 'features': features, 'truncado': truncado}
+
+def tesela_valida(z, x, y):
+    return 0 <= z <= ZOOM_MAX and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+def bbox_tesela(z, x, y):
+    """(oeste, sur, este, norte) de la tesela z/x/y de Web Mercator."""
+    n = 2 ** z
+    lat = lambda fila: math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * fila / n))))
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
@@ -0,0 +1,71 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import renovacion, resiliencia, tokens
+
+class PlazoPaginaMiddleware:
+    """
+    Da a cada petición un plazo total de API_PLAZO_PAGINA segundos para todas
+    sus llamadas a los microservicios, así una dependencia degradada no puede
+    retener el worker más de ese tiempo.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = resiliencia.iniciar_plazo(settings.API_PLAZO_PAGINA)
+        try:
+            return self.get_response(request)
+        finally:
+            resiliencia.terminar_plazo(token)
+
+    async def __acall__(self, request):
+        token = resiliencia.iniciar_plazo(settings.API_PLAZO_PAGINA)
+        try:
+            return await self.get_response(request)
+        finally:
+            resiliencia.terminar_plazo(token)
+
+
+class RenovarTokenMiddleware:
+    """
+    Renueva el access token de la sesión cuando está a punto de caducar y deja
+    disponible un renovador para que AsyncApiClient repita una vez las llamadas
+    que reciban un 401. Va después de SessionMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        renovador = renovacion.Renovador(request.session)
+        renovador.anticipar()
+        token = tokens.fijar_renovador(renovador)
+        try:
+            return self.get_response(request)
+        finally:
+            tokens.quitar_renovador(token)
+
+    async def __acall__(self, request):
+        # Cargamos la sesión sin bloquear el loop; después se lee de memoria
+        await request.session.aget('access_token')
+        renovador = renovacion.Renovador(request.session)
+        await renovador.aanticipar()
+        token = tokens.fijar_renovador(renovador)
+        try:
+            return await self.get_response(request)
+        finally:
+            tokens.quitar_renovador(token)
@@ -0,0 +1,89 @@
+"""
+Pestañas del dashboard de administración.
+
+Cada pestaña pide al microservicio una sola página ya filtrada y ordenada en
+el servidor (?limit=, ?estado=, ?ordering=...); los totales de las tarjetas
+salen de los endpoints .../total/ en lugar de contar listas completas.
+"""
+from urllib.parse import parse_qs, urlsplit
+
+from django.conf import settings
+
+# Parámetros con los que los servicios paginan (se copian de los enlaces next/previous)
+PARAMS_PAGINACION = ('offset', 'cursor')
+
+PESTANAS = {
+    'lugares': {
+        'url': lambda: f"{settings.API_LUGARES_URL}/lugares/",
+        'filtros': {
+            'estado': ('Estado', [('pendiente', 'Pendiente'), ('aprobado', 'Aprobado'), ('rechazado', 'Rechazado')]),
+            'categoria': ('Categoría', [
+                ('mirador', 'Mirador'), ('bar', 'Bar con encanto'), ('galeria', 'Galería'),
+                ('tienda', 'Tienda local'), ('arte_urbano', 'Arte urbano'), ('plaza', 'Plaza'), ('otros', 'Otros'),
+            ]),
+        },
+        'ordenes': [('-creado_en', 'Más recientes'), ('creado_en', 'Más antiguos'), ('nombre', 'Nombre A-Z')],
+    },
+    'eventos': {
+        'url': lambda: f"{settings.API_EVENTOS_URL}/eventos/",
+        'filtros': {
+            'estado': ('Estado', [('pendiente', 'Pendiente'), ('publicado', 'Publicado'), ('cancelado', 'Cancelado')]),
+            'categoria': ('Categoría', [
+                ('concierto', 'Concierto'), ('exposicion', 'Exposición'), ('teatro', 'Teatro'),
+                ('charla', 'Charla/Conferencia'), ('fiesta', 'Fiesta popular'), ('otros', 'Otros'),
+            ]),
+        },
+        'ordenes': [('fecha_inicio', 'Próximos primero'), ('-fecha_inicio', 'Más lejanos primero'), ('-creado_en', 'Más recientes'), ('nombre', 'Nombre A-Z')],
+    },
+    'usuarios': {
+        'url': lambda: f"{settings.API_USUARIOS_URL}/users/",
+        'filtros': {
+            'rol': ('Rol', [('usuario', 'Usuario'), ('organizador', 'Organizador'), ('admin', 'Admin')]),
+        },
+        'ordenes': [('-date_joined', 'Más recientes'), ('username', 'Usuario A-Z'), ('-puntos', 'Más puntos')],
+    },
+}
+
+def pestanas_para(rol):
+    """La gestión de usuarios solo la ve el admin."""
+    return [nombre for nombre in PESTANAS if nombre != 'usuarios' or rol == 'admin']
+
+def leer_consulta(pestana, consulta):
+    """Devuelve (filtros, orden, paginación) válidos para la pestaña a partir de request.GET."""
+    config = PESTANAS[pestana]
+    filtros = {campo: consulta[campo] for campo in config['filtros'] if consulta.get(campo)}
+    orden = consulta.get('orden')
+    if orden not in dict(config['ordenes']):
+        orden = None
+    paginacion = {p: consulta[p] for p in PARAMS_PAGINACION if consulta.get(p)}
+    return filtros, orden, paginacion
+
+def parametros_api(filtros, orden, paginacion):
+    params = {**filtros, **paginacion, 'limit': settings.DASHBOARD_PAGE_SIZE}
+    if orden:
+        params['ordering'] = orden
+    return params
+
+def controles(pestana, filtros, orden):
+    """Selects del formulario de filtros con la opción marcada ya resuelta."""
+    config = PESTANAS[pestana]
+    selects = [
+        {'campo': campo, 'etiqueta': etiqueta,
+         'opciones': [(valor, texto, filtros.get(campo) == valor) for valor, texto in opciones]}
+        for campo, (etiqueta, opciones) in config['filtros'].items()
+    ]
+    ordenes = [(valor, texto, orden == valor) for valor, texto in config['ordenes']]
+    return selects, ordenes
+
+def enlace_pagina(consulta, url_api):
+    """Convierte el enlace next/previous del servicio en la query string del dashboard."""
+    if not url_api:
+        return None
+    consulta = consulta.copy()
+    for p in PARAMS_PAGINACION:
+        consulta.pop(p, None)
+    params_api = parse_qs(urlsplit(url_api).query)
+    for p in PARAMS_PAGINACION:
+        if p in params_api:
+            consulta[p] = params_api[p][0]
+    return '?' + consulta.urlencode()
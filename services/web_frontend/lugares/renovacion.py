@@ -0,0 +1,178 @@
+"""
+Renovación automática del access token con el refresh token de la sesión.
+
+service-usuarios emite access tokens de 60 minutos y refresh tokens de un día.
+En lugar de obligar a iniciar sesión cada hora, el frontend pide un access
+token nuevo a /token/refresh/ cuando al actual le quedan menos de
+JWT_RENOVAR_ANTES segundos, o cuando un servicio responde 401.
+
+Todas las peticiones de una misma sesión que necesitan renovar a la vez
+comparten una sola llamada: dentro del proceso con vuelo_unico y entre workers
+con un cerrojo en la caché. Quien no consigue el cerrojo espera el token que
+deja en la caché quien sí lo tiene.
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import tokens, vuelo_unico
+from .api_client import ApiClient
+from .api_client_async import AsyncApiClient
+
+logger = logging.getLogger(__name__)
+
+# Segundos que se guarda en la caché el token recién renovado para los demás workers
+RESULTADO_TTL = 60
+ESPERA_SONDEO = 0.05
+# Claves de la sesión que se borran cuando ya no se puede renovar
+CLAVES_SESION = ('access_token', 'refresh_token', 'user_id', 'rol', 'username')
+
+_lock = threading.Lock()
+_contadores = {'renovados': 0, 'fallidos': 0, 'esperados': 0}
+
+def _contar(nombre):
+    with _lock:
+        _contadores[nombre] += 1
+
+def _clave(refresh):
+    # El refresh token no se usa como clave tal cual: acabaría en Redis en claro
+    return f"jwt-renovado:{hashlib.sha256(refresh.encode()).hexdigest()}"
+
+def _url():
+    return f"{settings.API_USUARIOS_URL}/token/refresh/"
+
+def _espera_maxima():
+    return settings.API_TIMEOUTS['usuarios']
+
+# --- RENOVACIÓN COORDINADA ---
+
+def renovar(refresh):
+    """Devuelve un access token nuevo para el refresh token, o None si no se pudo."""
+    k = _clave(refresh)
+    return vuelo_unico.compartir(k, lambda: _renovar_coordinado(k, refresh))
+
+def _renovar_coordinado(k, refresh):
+    nuevo = cache.get(k)
+    if nuevo:
+        return nuevo
+    if cache.add(f"{k}:bloqueo", True, _espera_maxima() + 1):
+        try:
+            respuesta = ApiClient.post(_url(), {'refresh': refresh})
+            return _guardar(k, respuesta)
+        finally:
+            cache.delete(f"{k}:bloqueo")
+
+    # Otro worker está renovando esta misma sesión: esperamos su resultado
+    _contar('esperados')
+    limite = time.monotonic() + _espera_maxima()
+    while time.monotonic() < limite:
+        time.sleep(ESPERA_SONDEO)
+        nuevo = cache.get(k)
+        if nuevo:
+            return nuevo
+    return None
+
+def _nuevo(respuesta):
+    nuevo = respuesta.get('access') if isinstance(respuesta, dict) else None
+    _contar('renovados' if nuevo else 'fallidos')
+    return nuevo
+
+def _guardar(k, respuesta):
+    nuevo = _nuevo(respuesta)
+    if nuevo:
+        cache.set(k, nuevo, RESULTADO_TTL)
+    return nuevo
+
+async def _aguardar(k, respuesta):
+    nuevo = _nuevo(respuesta)
+    if nuevo:
+        await cache.aset(k, nuevo, RESULTADO_TTL)
+    return nuevo
+
+async def arenovar(refresh):
+    """Variante async de renovar()."""
+    k = _clave(refresh)
+    # Sin cortar la espera con el plazo de la página: una renovación abandonada
+    # cuenta como fallida y podría cerrar la sesión
+    return await vuelo_unico.acompartir(k, lambda: _arenovar_coordinado(k, refresh), plazo=False)
+
+async def _arenovar_coordinado(k, refresh):
+    nuevo = await cache.aget(k)
+    if nuevo:
+        return nuevo
+    if await cache.aadd(f"{k}:bloqueo", True, _espera_maxima() + 1):
+        try:
+            respuesta = await AsyncApiClient.post(_url(), {'refresh': refresh})
+            return await _aguardar(k, respuesta)
+        finally:
+            await cache.adelete(f"{k}:bloqueo")
+
+    _contar('esperados')
+    limite = time.monotonic() + _espera_maxima()
+    while time.monotonic() < limite:
+        await asyncio.sleep(ESPERA_SONDEO)
+        nuevo = await cache.aget(k)
+        if nuevo:
+            return nuevo
+    return None
+
+def estadisticas():
+    """Renovaciones hechas, fallidas y las resueltas esperando a otro worker."""
+    with _lock:
+        return dict(_contadores)
+
+
+class Renovador:
+    """
+    Renueva el access token de una sesión concreta. El middleware crea uno por
+    petición y AsyncApiClient lo usa (a través de tokens.arenovar_tras_401) al
+    recibir un 401.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    def _pendiente(self, rechazado):
+        """Si otra llamada de la misma página ya renovó el token, devuelve el nuevo."""
+        actual = self.session.get('access_token')
+        if actual and actual != rechazado:
+            return actual
+        return None
+
+    def _aplicar(self, nuevo, caducado):
+        if nuevo:
+            self.session['access_token'] = nuevo
+        elif caducado:
+            # Ni el access token ni el refresh sirven: hay que volver a iniciar sesión
+            for nombre in CLAVES_SESION:
+                self.session.pop(nombre, None)
+        return nuevo
+
+    def _necesita_renovar(self):
+        token = self.session.get('access_token')
+        if not token or not self.session.get('refresh_token'):
+            return False, False
+        restante = tokens.segundos_restantes(token)
+        return restante < settings.JWT_RENOVAR_ANTES, restante <= 0
+
+    def anticipar(self):
+        """Renueva antes de que caduque, para que la página no se encuentre un 401."""
+        necesita, caducado = self._necesita_renovar()
+        if necesita:
+            self._aplicar(renovar(self.session['refresh_token']), caducado)
+
+    async def aanticipar(self):
+        necesita, caducado = self._necesita_renovar()
+        if necesita:
+            self._aplicar(await arenovar(self.session['refresh_token']), caducado)
+
+    async def arenovar(self, rechazado):
+        pendiente = self._pendiente(rechazado)
+        if pendiente or not self.session.get('refresh_token'):
+            return pendiente
+        return self._aplicar(await arenovar(self.session['refresh_token']), caducado=False)
@@ -0,0 +1,183 @@
+"""
+Circuit breakers por microservicio y plazo total por petición de página.
+
+Cada microservicio tiene un circuito que mira sus últimas CB_VENTANA llamadas:
+si la proporción de fallos (error de red o 5xx) o de llamadas lentas supera el
+umbral, se abre y durante CB_ESPERA segundos las llamadas fallan al instante
+con ServicioNoDisponible, sin ocupar el worker esperando al timeout. Pasado ese
+tiempo deja pasar una llamada de prueba (semiabierto) y según su resultado se
+cierra o vuelve a abrirse.
+
+Además, cada petición de página tiene un plazo total (ver
+middleware.PlazoPaginaMiddleware): el timeout de cada llamada es el menor
+entre el del servicio y lo que le queda a la página. Si la llamada agota un
+timeout así recortado, la culpa es de la página y no del servicio: no cuenta
+como fallo de su circuito.
+
+Cuando una lectura falla y la página sigue con un valor por defecto (lista
+vacía, sin valoración...), se apunta con marcar_degradada(); cache_pagina lo
+consulta para no guardar esa página a medias.
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from . import conexiones
+
+CERRADO = 'cerrado'
+ABIERTO = 'abierto'
+SEMIABIERTO = 'semiabierto'
+
+# Instante (time.monotonic) en el que vence la página en curso; None = sin plazo
+_limite_pagina = contextvars.ContextVar('limite_pagina', default=None)
+
+
+class ServicioNoDisponible(Exception):
+    """El circuito del servicio está abierto o la página ya agotó su plazo."""
+
+
+def iniciar_plazo(segundos):
+    """Fija el plazo de la petición en curso; devuelve el token para restaurarlo."""
+    return _limite_pagina.set(time.monotonic() + segundos)
+
+def terminar_plazo(token):
+    _limite_pagina.reset(token)
+
+def quitar_plazo():
+    """Deja sin plazo el contexto actual (para trabajo compartido entre páginas)."""
+    _limite_pagina.set(None)
+
+def tiempo_restante():
+    limite = _limite_pagina.get()
+    return None if limite is None else limite - time.monotonic()
+
+# Marca de la página en curso: un dict compartido (no un valor) para que también
+# lo vean las tareas hijas, que trabajan sobre una copia del contexto
+_degradacion = contextvars.ContextVar('degradacion', default=None)
+
+def vigilar_degradacion():
+    """Empieza a anotar los fallos de la página; devuelve (token, marca)."""
+    marca = {'degradada': False}
+    return _degradacion.set(marca), marca
+
+def dejar_de_vigilar(token):
+    _degradacion.reset(token)
+
+def marcar_degradada():
+    """La página en curso sigue sin los datos de algún servicio."""
+    marca = _degradacion.get()
+    if marca is not None:
+        marca['degradada'] = True
+
+
+class Circuito:
+    """Estado del circuit breaker de un microservicio (compartido por todo el proceso)."""
+
+    def __init__(self, servicio):
+        self.servicio = servicio
+        self._lock = threading.Lock()
+        self._resultados = deque(maxlen=settings.CB_VENTANA)  # (fallo, lenta)
+        self._estado = CERRADO
+        self._abierto_desde = 0.0
+        self._pruebas_en_curso = 0
+
+    def _abrir(self):
+        self._estado = ABIERTO
+        self._abierto_desde = time.monotonic()
+        self._resultados.clear()
+
+    def _timeout(self):
+        return settings.API_TIMEOUTS.get(self.servicio, settings.API_TIMEOUT)
+
+    def permitir(self):
+        """
+        Comprueba si se puede llamar al servicio y devuelve el timeout a usar.
+        Lanza ServicioNoDisponible si el circuito está abierto o no queda plazo.
+        """
+        timeout = self._timeout()
+        restante = tiempo_restante()
+        if restante is not None:
+            if restante <= 0:
+                raise ServicioNoDisponible(f"Plazo de la página agotado antes de llamar a {self.servicio}")
+            timeout = min(timeout, restante)
+
+        with self._lock:
+            if self._estado == ABIERTO:
+                if time.monotonic() - self._abierto_desde < settings.CB_ESPERA:
+                    raise ServicioNoDisponible(f"Circuito abierto para {self.servicio}")
+                self._estado = SEMIABIERTO
+            if self._estado == SEMIABIERTO:
+                if self._pruebas_en_curso >= settings.CB_PRUEBAS:
+                    raise ServicioNoDisponible(f"Circuito semiabierto para {self.servicio}")
+                self._pruebas_en_curso += 1
+        return timeout
+
+    def registrar(self, duracion, fallo):
+        """Apunta el resultado de una llamada y decide si el circuito cambia de estado."""
+        lenta = duracion >= settings.CB_LLAMADA_LENTA
+        with self._lock:
+            if self._estado == SEMIABIERTO:
+                self._pruebas_en_curso = max(0, self._pruebas_en_curso - 1)
+                if fallo or lenta:
+                    self._abrir()
+                else:
+                    self._estado = CERRADO
+                    self._resultados.clear()
+                return
+            if self._estado == ABIERTO:
+                return
+
+            self._resultados.append((fallo, lenta))
+            total = len(self._resultados)
+            if total < settings.CB_MIN_LLAMADAS:
+                return
+            fallos = sum(1 for f, _ in self._resultados if f)
+            lentas = sum(1 for _, l in self._resultados if l)
+            if fallos / total >= settings.CB_UMBRAL_FALLOS or lentas / total >= settings.CB_UMBRAL_LENTAS:
+                self._abrir()
+
+    def registrar_error(self, duracion, timeout, por_timeout):
+        """
+        Apunta una llamada que lanzó excepción. Si agotó un timeout más corto
+        que el del servicio (recortado por el plazo de la página), no se cuenta.
+        """
+        if por_timeout and timeout < self._timeout():
+            self.liberar()
+        else:
+            self.registrar(duracion, fallo=True)
+
+    def liberar(self):
+        """Devuelve el hueco de prueba de una llamada que no llegó a terminar."""
+        with self._lock:
+            if self._estado == SEMIABIERTO:
+                self._pruebas_en_curso = max(0, self._pruebas_en_curso - 1)
+
+    def estado(self):
+        with self._lock:
+            return {
+                'estado': self._estado,
+                'llamadas': len(self._resultados),
+                'fallos': sum(1 for f, _ in self._resultados if f),
+                'lentas': sum(1 for _, l in self._resultados if l),
+            }
+
+
+_circuitos = {}
+_circuitos_lock = threading.Lock()
+
+def circuito_para(url):
+    """Circuito del microservicio al que apunta la URL."""
+    servicio = conexiones.servicio_de(url)
+    with _circuitos_lock:
+        if servicio not in _circuitos:
+            _circuitos[servicio] = Circuito(servicio)
+        return _circuitos[servicio]
+
+def estado():
+    with _circuitos_lock:
+        circuitos = list(_circuitos.values())
+    return {c.servicio: c.estado() for c in circuitos}
+
@@ -0,0 +1,52 @@
+"""
+Revalidación de GET a los microservicios con ETag / Last-Modified.
+
+Junto a cada respuesta que trae validadores se guarda en la caché su cuerpo ya
+procesado. La siguiente vez que se pide el mismo GET (misma URL, parámetros y
+token) se envían If-None-Match / If-Modified-Since: si el servicio contesta
+304, no viaja ni se parsea ningún cuerpo y se reutiliza la copia guardada.
+
+No decide cuándo se pide: las cachés de frescura (cache_catalogo, snapshot de
+interacciones) siguen igual, esto solo abarata cada vez que se vuelve a pedir.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+def clave(url, token=None, params=None, tipo='get'):
+    # El token entra hasheado: cada usuario tiene su copia y no queda en claro en la caché
+    huella = repr((url, token, sorted(params.items()) if params else None))
+    return f"revalidacion:{tipo}:{hashlib.sha256(huella.encode()).hexdigest()}"
+
+def cabeceras(entrada):
+    """Cabeceras condicionales para la copia guardada (vacías si no hay)."""
+    if not entrada:
+        return {}
+    return {
+        nombre: entrada[campo]
+        for nombre, campo in (('If-None-Match', 'etag'), ('If-Modified-Since', 'last_modified'))
+        if entrada.get(campo)
+    }
+
+def _entrada(response, datos):
+    etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+    if response.status_code != 200 or not (etag or last_modified):
+        return None
+    return {'etag': etag, 'last_modified': last_modified, 'datos': datos}
+
+def obtener(k):
+    return cache.get(k)
+
+def guardar(k, response, datos):
+    entrada = _entrada(response, datos)
+    if entrada:
+        cache.set(k, entrada, settings.API_REVALIDACION_TTL)
+
+async def aobtener(k):
+    return await cache.aget(k)
+
+async def aguardar(k, response, datos):
+    entrada = _entrada(response, datos)
+    if entrada:
+        await cache.aset(k, entrada, settings.API_REVALIDACION_TTL)
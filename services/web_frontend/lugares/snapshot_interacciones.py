@@ -0,0 +1,92 @@
+"""
+Snapshot por usuario de sus favoritos y votos, guardado en la caché de Django.
+
+Las páginas de detalle solo necesitan saber si un recurso es favorito y qué
+nota le dio el usuario. En lugar de descargar sus listas completas en cada
+visita, se guarda una copia indexada que se revalida como mucho cada
+INTERACCIONES_REVALIDAR segundos pidiendo la huella a service-interacciones
+(un agregado, no la lista). accion_favorito y accion_votar la actualizan en el
+sitio con la respuesta del servicio.
+
+Los favoritos se guardan como dict ordenado (id -> None): se comprueban igual
+de rápido que un set y mantienen el orden del servicio, del más reciente al
+más antiguo.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .api_client_async import AsyncApiClient
+
+def clave(user_id):
+    # v2: favoritos como dict ordenado (antes set), para no leer copias del formato viejo
+    return f"interacciones:v2:{user_id}"
+
+def es_favorito(snapshot, catalogo, pk):
+    return int(pk) in snapshot['favoritos'][catalogo]
+
+def mi_voto(snapshot, catalogo, pk):
+    return snapshot['votos'][catalogo].get(int(pk), 0)
+
+async def _cargar(token, huella):
+    datos = await AsyncApiClient.en_paralelo({
+        'favoritos': AsyncApiClient.get_mis_favoritos(token),
+        'votos': AsyncApiClient.get_mis_votos(token),
+    })
+    return {
+        'favoritos': {tipo: dict.fromkeys(ids) for tipo, ids in datos['favoritos'].items()},
+        'votos': datos['votos'],
+        'huella': huella,
+        'revalidado': time.time(),
+    }
+
+async def aobtener(token, user_id):
+    """Devuelve el snapshot del usuario, revalidándolo o recargándolo si hace falta."""
+    snapshot = await cache.aget(clave(user_id)) if user_id else None
+    if snapshot and time.time() - snapshot['revalidado'] < settings.INTERACCIONES_REVALIDAR:
+        return snapshot
+
+    # La huella se pide ANTES que las listas: si alguien escribe entre medias,
+    # la copia queda más nueva que su huella y la siguiente revalidación la recarga.
+    huella = await AsyncApiClient.get_huella_interacciones(token)
+    if snapshot and huella is None:
+        # Servicio caído o circuito abierto: mejor la copia que tenemos que nada
+        return snapshot
+    if snapshot and huella == snapshot['huella']:
+        snapshot['revalidado'] = time.time()
+    else:
+        snapshot = await _cargar(token, huella)
+
+    # Sin huella (servicio caído) no guardamos nada que no podamos revalidar
+    if user_id and huella:
+        await cache.aset(clave(user_id), snapshot, settings.INTERACCIONES_SNAPSHOT_TTL)
+    return snapshot
+
+async def _aplicar(user_id, respuesta, cambio):
+    snapshot = await cache.aget(clave(user_id)) if user_id else None
+    if not snapshot:
+        return
+    if not respuesta or 'huella' not in respuesta:
+        # La escritura falló o no sabemos cómo quedó: que la próxima lectura recargue
+        await cache.adelete(clave(user_id))
+        return
+    cambio(snapshot)
+    snapshot['huella'] = respuesta['huella']
+    await cache.aset(clave(user_id), snapshot, settings.INTERACCIONES_SNAPSHOT_TTL)
+
+async def aregistrar_favorito(user_id, catalogo, pk, respuesta):
+    """Aplica en el snapshot la respuesta de AsyncApiClient.toggle_favorito."""
+    def cambio(snapshot):
+        ids = snapshot['favoritos'][catalogo]
+        ids.pop(int(pk), None)
+        if respuesta['status'] == 'creado':
+            # El recién guardado va el primero, como lo devolvería el servicio
+            snapshot['favoritos'][catalogo] = {int(pk): None, **ids}
+    await _aplicar(user_id, respuesta, cambio)
+
+async def aregistrar_voto(user_id, catalogo, pk, respuesta):
+    """Aplica en el snapshot la respuesta de AsyncApiClient.enviar_voto."""
+    def cambio(snapshot):
+        snapshot['votos'][catalogo][int(pk)] = respuesta['valor']
+    await _aplicar(user_id, respuesta, cambio)
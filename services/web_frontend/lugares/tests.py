@@ -1,6 +1,1136 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import jwt
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import api_client_async, cache_catalogo, cache_pagina, conexiones, mapa, renovacion, resiliencia, snapshot_interacciones, tokens, vuelo_unico
+from .api_client import ApiClient
+from .api_client_async import AsyncApiClient
+
+def iniciar_sesion(client, **datos):
+    """Guarda datos en la sesión del cliente de pruebas sea cual sea SESSION_ENGINE."""
+    session = client.session
+    session.update(datos)
+    session.save()
+    # Con cookies firmadas la clave cambia al guardar: hay que volver a ponerla
+    client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+
+def contenido(response):
+    """Cuerpo completo de la respuesta, también si se envió por partes."""
+    if response.streaming:
+        if response.is_async:
+            async def leer():
+                return [parte async for parte in response.streaming_content]
+            return b''.join(asyncio.run(leer())).decode()
+        return b''.join(response.streaming_content).decode()
+    return response.content.decode()
+
 
 # Los tests antiguos de modelos se han movido a los microservicios.
 class FrontendTests(TestCase):
     def test_dummy(self):
-        self.assertTrue(True)
\ No newline at end of file
+        self.assertTrue(True)
+
+
+class FanOutTests(TestCase):
+
+    def test_en_paralelo_async_es_concurrente(self):
+        """Espera a la vez todas las corrutinas: tarda lo que la más lenta, no la suma."""
+        async def lenta(valor):
+            await asyncio.sleep(0.2)
+            return valor
+
+        async def pagina():
+            return await AsyncApiClient.en_paralelo({'a': lenta(1), 'b': lenta(2), 'c': lenta(3)})
+
+        inicio = time.monotonic()
+        datos = asyncio.run(pagina())
+        self.assertLess(time.monotonic() - inicio, 0.5)
+        self.assertEqual(datos, {'a': 1, 'b': 2, 'c': 3})
+
+    @patch.object(AsyncApiClient, 'get_comentarios', return_value=[{'texto': 'Genial', 'creado_en': '2025-01-01'}])
+    @patch.object(AsyncApiClient, 'get_resumen_votos', return_value={'media': 4.5, 'total': 2})
+    @patch.object(AsyncApiClient, 'get_huella_interacciones', return_value='1.1.1.0')
+    @patch.object(AsyncApiClient, 'get_mis_votos', return_value={'lugares': {7: 4}, 'eventos': {}})
+    @patch.object(AsyncApiClient, 'get_mis_favoritos', return_value={'lugares': [7], 'eventos': []})
+    @patch.object(AsyncApiClient, 'get_lugares', return_value={'id': 7, 'nombre': 'Mirador', 'categoria': 'mirador'})
+    def test_detalle_lugar_con_sesion(self, *mocks):
+        """El detalle combina las cinco lecturas en el contexto de la plantilla."""
+        iniciar_sesion(self.client, access_token='token-prueba')
+
+        response = self.client.get(reverse('detalle_lugar', kwargs={'pk': 7}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['es_favorito'])
+        self.assertEqual(response.context['mi_voto'], 4)
+        self.assertEqual(response.context['puntuacion']['total'], 2)
+
+    @patch.object(AsyncApiClient, 'get_comentarios', return_value=[])
+    @patch.object(AsyncApiClient, 'get_resumen_votos', return_value={'media': 0, 'total': 0})
+    @patch.object(AsyncApiClient, 'get_lugares', return_value=[])
+    def test_detalle_lugar_inexistente_404(self, *mocks):
+        response = self.client.get(reverse('detalle_lugar', kwargs={'pk': 99}))
+        self.assertEqual(response.status_code, 404)
+
+
+class _ServicioFalso(BaseHTTPRequestHandler):
+    """Microservicio mínimo con keep-alive (HTTP/1.1) para probar el pool."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        cuerpo = json.dumps([{'id': 1, 'nombre': 'Mirador'}]).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_POST(self):
+        # El cuerpo se lee entero para que la conexión quede lista para la siguiente
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+class PoolHttpTests(TestCase):
+
+    def setUp(self):
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), _ServicioFalso)
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.servidor.server_port}/api/catalogo"
+        conexiones._contadores.clear()
+
+    def tearDown(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+        conexiones._contadores.clear()
+
+    def _dos_llamadas(self, pausa=0):
+        async def pagina():
+            await AsyncApiClient.get(f"{self.base}/lugares/")
+            await asyncio.sleep(pausa)
+            return await AsyncApiClient.get(f"{self.base}/lugares/")
+        return asyncio.run(pagina())
+
+    def test_reutiliza_conexion_entre_llamadas(self):
+        """La segunda llamada al mismo servicio no abre una conexión nueva."""
+        with override_settings(API_LUGARES_URL=self.base):
+            lugares = self._dos_llamadas()
+
+            self.assertEqual(lugares[0]['nombre'], 'Mirador')
+            self.assertEqual(AsyncApiClient.estadisticas_conexiones()['lugares'], {'hits': 1, 'misses': 1})
+
+    def test_conexion_inactiva_se_cierra(self):
+        """Pasado el tiempo de inactividad la conexión se descarta y la siguiente llamada abre otra."""
+        with override_settings(API_LUGARES_URL=self.base, API_POOL_IDLE_TIMEOUT=0):
+            self._dos_llamadas(pausa=0.1)
+
+            self.assertEqual(AsyncApiClient.estadisticas_conexiones()['lugares'], {'hits': 0, 'misses': 2})
+
+    def test_el_post_sincrono_tambien_cuenta(self):
+        """La renovación síncrona del JWT va por su cliente httpx y suma en los mismos contadores."""
+        with override_settings(API_USUARIOS_URL=self.base):
+            self.assertEqual(ApiClient.post(f"{self.base}/token/refresh/", {'refresh': 'r'})[0]['id'], 1)
+            ApiClient.post(f"{self.base}/token/refresh/", {'refresh': 'r'})
+
+            self.assertEqual(AsyncApiClient.estadisticas_conexiones()['usuarios'], {'hits': 1, 'misses': 1})
+
+    def test_estado_servicios_muestra_las_conexiones(self):
+        with override_settings(API_LUGARES_URL=self.base):
+            self._dos_llamadas()
+        iniciar_sesion(self.client, rol='admin')
+
+        datos = self.client.get(reverse('estado_servicios')).json()
+
+        self.assertEqual(datos['pool']['lugares'], {'hits': 1, 'misses': 1})
+
+    def test_cliente_async_comparte_conexiones_en_el_loop(self):
+        """Dentro de un mismo event loop todas las llamadas usan el mismo httpx.AsyncClient."""
+        from . import api_client_async
+
+        async def pagina():
+            datos = await AsyncApiClient.en_paralelo({
+                'a': AsyncApiClient.get(f"{self.base}/lugares/"),
+                'b': AsyncApiClient.get(f"{self.base}/lugares/"),
+            })
+            return datos, len(api_client_async._clientes)
+
+        with override_settings(API_LUGARES_URL=self.base):
+            datos, clientes = asyncio.run(pagina())
+
+        self.assertEqual(datos['a'][0]['nombre'], 'Mirador')
+        self.assertEqual(clientes, 1)
+
+    def test_apagar_el_worker_cierra_el_cliente_async(self):
+        """El lifespan de ASGI cierra al apagar las conexiones keep-alive del loop."""
+        from CultureMapBackend.asgi import application
+        from . import api_client_async
+
+        async def worker():
+            await AsyncApiClient.get(f"{self.base}/lugares/")
+            cliente = api_client_async._cliente()
+            mensajes = iter([{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+            enviados = []
+
+            async def recibir():
+                return next(mensajes)
+
+            async def enviar(mensaje):
+                enviados.append(mensaje['type'])
+
+            await application({'type': 'lifespan'}, recibir, enviar)
+            return cliente, enviados, len(api_client_async._clientes)
+
+        with override_settings(API_LUGARES_URL=self.base):
+            cliente, enviados, quedan = asyncio.run(worker())
+
+        self.assertEqual(enviados, ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
+        self.assertTrue(cliente.is_closed)
+        self.assertEqual(quedan, 0)
+
+
+
+class _ServicioConEtag(BaseHTTPRequestHandler):
+    """Microservicio que contesta 304 si le mandan el ETag vigente."""
+    protocol_version = 'HTTP/1.1'
+    etag = '"v1"'
+    peticiones = []
+
+    def do_GET(self):
+        type(self).peticiones.append(self.headers.get('If-None-Match'))
+        if self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.send_header('ETag', self.etag)
+            self.end_headers()
+            return
+        cuerpo = json.dumps({'next': None, 'results': [{'id': 1, 'nombre': 'Mirador', 'etag': self.etag}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.send_header('ETag', self.etag)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class RevalidacionTests(TestCase):
+    """GET condicionales: el cuerpo se guarda con su ETag y un 304 lo reutiliza."""
+
+    def setUp(self):
+        cache.clear()
+        _ServicioConEtag.etag = '"v1"'
+        _ServicioConEtag.peticiones = []
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), _ServicioConEtag)
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.servidor.server_port}/api/catalogo/lugares/"
+
+    def tearDown(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+        cache.clear()
+
+    def _get(self, token=None):
+        return asyncio.run(AsyncApiClient.get(self.url, token=token))
+
+    def test_304_reutiliza_la_copia_y_un_cambio_la_reemplaza(self):
+        primera = self._get()
+        segunda = self._get()
+        self.assertEqual(segunda, primera)
+        self.assertEqual(_ServicioConEtag.peticiones, [None, '"v1"'])
+
+        _ServicioConEtag.etag = '"v2"'
+        self.assertEqual(self._get()[0]['etag'], '"v2"')
+        self.assertEqual(self._get()[0]['etag'], '"v2"')
+        self.assertEqual(_ServicioConEtag.peticiones[2:], ['"v1"', '"v2"'])
+
+    def test_copias_separadas_por_token_y_formato(self):
+        self._get()
+        self._get(token='otro')
+
+        async def pagina():
+            return await AsyncApiClient.get(self.url), await AsyncApiClient.get_pagina(self.url)
+
+        datos, pagina_entera = asyncio.run(pagina())
+        self.assertEqual(datos[0]['nombre'], 'Mirador')
+        self.assertEqual(pagina_entera['results'][0]['nombre'], 'Mirador')
+        # El token y el formato (lista o página entera) tienen su propia copia
+        self.assertEqual(_ServicioConEtag.peticiones, [None, None, '"v1"', None])
+
+
+class CacheCatalogoTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def _caducar(self, tipo, pk=None):
+        """Marca la entrada como pasada (fuera del TTL fresco pero dentro del stale)."""
+        k = cache_catalogo.clave(tipo, pk)
+        entrada = cache.get(k)
+        entrada['fresco_hasta'] = time.time() - 1
+        cache.set(k, entrada)
+
+    def _lugares(self, pk=None):
+        return asyncio.run(AsyncApiClient.get_lugares(pk))
+
+    @patch.object(AsyncApiClient, 'get_todo_o_error', return_value=[{'id': 1, 'nombre': 'Mirador'}])
+    def test_lista_publica_se_sirve_de_cache(self, mock_get):
+        """Dos visitas anónimas seguidas solo llegan una vez a service-lugares."""
+        self._lugares()
+        lugares = self._lugares()
+
+        self.assertEqual(lugares[0]['nombre'], 'Mirador')
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch.object(AsyncApiClient, 'get_o_error', return_value=[])
+    def test_no_cachea_respuestas_vacias(self, mock_get):
+        """Una lista vacía no se queda fijada en caché."""
+        asyncio.run(AsyncApiClient.get_eventos())
+        asyncio.run(AsyncApiClient.get_eventos())
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch.object(AsyncApiClient, 'put', return_value={'status': 'Lugar aprobado'})
+    @patch.object(AsyncApiClient, 'get_todo_o_error', return_value=[{'id': 3, 'nombre': 'Plaza'}])
+    @patch.object(AsyncApiClient, 'get_o_error', return_value={'id': 3, 'nombre': 'Plaza'})
+    def test_aprobar_invalida_lista_y_detalle(self, mock_get, mock_lista, mock_put):
+        """gestionar_recurso borra la lista pública y el detalle del lugar."""
+        self._lugares()
+        self._lugares(3)
+        self.assertEqual((mock_lista.call_count, mock_get.call_count), (1, 1))
+
+        self.client.post(reverse('gestionar_recurso', args=['lugar', 3, 'aprobar']))
+
+        self._lugares()
+        self._lugares(3)
+        self.assertEqual((mock_lista.call_count, mock_get.call_count), (2, 2))
+
+    @override_settings(API_CATALOGO_PAGE_SIZE=2)
+    def test_lista_de_lugares_sigue_todas_las_paginas(self):
+        """service-lugares pagina por cursor: el catálogo junta todas las páginas, no solo la primera."""
+        siguiente = 'http://service-lugares:8000/api/catalogo/lugares/?cursor=x&limit=2'
+        paginas = [
+            {'next': siguiente, 'previous': None, 'results': [{'id': 3}, {'id': 2}]},
+            {'next': None, 'previous': None, 'results': [{'id': 1}]},
+        ]
+        pedidas = []
+
+        async def pagina(url, token=None, params=None):
+            pedidas.append((url, params))
+            return paginas[0] if params else paginas[1]
+
+        with patch.object(AsyncApiClient, 'get_pagina_o_error', side_effect=pagina):
+            self.assertEqual([l['id'] for l in self._lugares()], [3, 2, 1])
+        self.assertEqual(pedidas, [(f"{settings.API_LUGARES_URL}/lugares/", {'limit': 2}), (siguiente, None)])
+
+    def test_copia_pasada_se_sirve_y_recarga_en_segundo_plano(self):
+        """La copia pasada sale al momento; la recarga llega después sin bloquear la página."""
+        async def recarga_lenta(endpoint):
+            await asyncio.sleep(0.3)
+            return [{'id': 1, 'nombre': 'Mirador renovado'}]
+
+        async def visitas():
+            inicio = time.monotonic()
+            primera = await AsyncApiClient.get_lugares()
+            # Con la recarga aún en curso no se lanza otra
+            segunda = await AsyncApiClient.get_lugares()
+            espera = time.monotonic() - inicio
+            await asyncio.sleep(0.5)
+            return primera, segunda, espera, await AsyncApiClient.get_lugares()
+
+        with patch.object(AsyncApiClient, 'get_todo_o_error', return_value=[{'id': 1, 'nombre': 'Mirador'}]):
+            self._lugares()
+        self._caducar('lugares')
+
+        with patch.object(AsyncApiClient, 'get_todo_o_error', side_effect=recarga_lenta) as mock_get:
+            primera, segunda, espera, despues = asyncio.run(visitas())
+
+        self.assertEqual(primera[0]['nombre'], 'Mirador')
+        self.assertEqual(segunda[0]['nombre'], 'Mirador')
+        self.assertLess(espera, 0.2)
+        self.assertEqual(despues[0]['nombre'], 'Mirador renovado')
+        self.assertEqual(mock_get.call_count, 1)
+
+    def test_sirve_copia_si_el_servicio_falla(self):
+        """Con el servicio caído se mantiene la última copia buena en vez de una lista vacía."""
+        async def visitas():
+            primera = await AsyncApiClient.get_lugares(3)
+            await asyncio.sleep(0.05)  # deja terminar la recarga fallida
+            # Sin copia previa no hay nada que servir
+            return primera, await AsyncApiClient.get_lugares(3), await AsyncApiClient.get_lugares(4)
+
+        with patch.object(AsyncApiClient, 'get_o_error', return_value={'id': 3, 'nombre': 'Plaza'}):
+            self._lugares(3)
+        self._caducar('lugares', 3)
+
+        with patch.object(AsyncApiClient, 'get_o_error', side_effect=resiliencia.ServicioNoDisponible('caído')):
+            primera, segunda, otro = asyncio.run(visitas())
+        self.assertEqual(primera['nombre'], 'Plaza')
+        self.assertEqual(segunda['nombre'], 'Plaza')
+        self.assertEqual(otro, [])
+
+
+@patch.object(AsyncApiClient, 'get_comentarios', return_value=[])
+@patch.object(AsyncApiClient, 'get_resumen_votos', return_value={'media': 0, 'total': 0})
+@patch.object(AsyncApiClient, 'get_lugares', return_value={'id': 7, 'nombre': 'Mirador', 'categoria': 'mirador'})
+class SnapshotInteraccionesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        iniciar_sesion(self.client, access_token='token-prueba', user_id=1)
+
+    def _detalle(self):
+        return self.client.get(reverse('detalle_lugar', kwargs={'pk': 7}))
+
+    @patch.object(AsyncApiClient, 'get_huella_interacciones', return_value='h1')
+    @patch.object(AsyncApiClient, 'get_mis_votos', return_value={'lugares': {}, 'eventos': {}})
+    @patch.object(AsyncApiClient, 'get_mis_favoritos', return_value={'lugares': [7], 'eventos': []})
+    def test_listas_se_descargan_una_vez(self, mock_favs, mock_votos, mock_huella, *mocks):
+        """Visitas seguidas reutilizan el snapshot; pasado el plazo solo se pide la huella."""
+        self._detalle()
+        self._detalle()
+        self.assertEqual(mock_favs.call_count, 1)
+        self.assertEqual(mock_huella.call_count, 1)
+
+        with override_settings(INTERACCIONES_REVALIDAR=0):
+            response = self._detalle()
+
+        self.assertTrue(response.context['es_favorito'])
+        self.assertEqual(mock_huella.call_count, 2)
+        self.assertEqual(mock_favs.call_count, 1)
+        self.assertEqual(mock_votos.call_count, 1)
+
+    @patch.object(AsyncApiClient, 'get_huella_interacciones', side_effect=['h1', 'h2'])
+    @patch.object(AsyncApiClient, 'get_mis_votos', return_value={'lugares': {}, 'eventos': {}})
+    @patch.object(AsyncApiClient, 'get_mis_favoritos', side_effect=[{'lugares': [], 'eventos': []}, {'lugares': [7], 'eventos': []}])
+    def test_huella_distinta_recarga(self, mock_favs, *mocks):
+        """Si la huella cambió por fuera del frontend, el snapshot se vuelve a cargar."""
+        self.assertFalse(self._detalle().context['es_favorito'])
+        with override_settings(INTERACCIONES_REVALIDAR=0):
+            self.assertTrue(self._detalle().context['es_favorito'])
+        self.assertEqual(mock_favs.call_count, 2)
+
+    @patch.object(AsyncApiClient, 'enviar_voto', return_value={'valor': 5, 'lugar_id': 7, 'huella': 'h3'})
+    @patch.object(AsyncApiClient, 'toggle_favorito', return_value={'status': 'creado', 'huella': 'h2'})
+    @patch.object(AsyncApiClient, 'get_huella_interacciones', return_value='h1')
+    @patch.object(AsyncApiClient, 'get_mis_votos', return_value={'lugares': {}, 'eventos': {}})
+    @patch.object(AsyncApiClient, 'get_mis_favoritos', return_value={'lugares': [], 'eventos': []})
+    def test_acciones_actualizan_en_el_sitio(self, mock_favs, *mocks):
+        """Dar like y votar modifican el snapshot sin volver a descargar las listas."""
+        self._detalle()
+        self.client.post(reverse('accion_favorito', args=['lugar', 7]))
+        self.client.post(reverse('accion_votar', args=['lugar', 7, 5]))
+
+        response = self._detalle()
+
+        self.assertTrue(response.context['es_favorito'])
+        self.assertEqual(response.context['mi_voto'], 5)
+        self.assertEqual(mock_favs.call_count, 1)
+        self.assertEqual(cache.get(snapshot_interacciones.clave(1))['huella'], 'h3')
+
+    @patch.object(AsyncApiClient, 'toggle_favorito', return_value={'status': 'creado', 'huella': 'h2'})
+    @patch.object(AsyncApiClient, 'get_huella_interacciones', return_value='h1')
+    @patch.object(AsyncApiClient, 'get_mis_votos', return_value={'lugares': {}, 'eventos': {}})
+    @patch.object(AsyncApiClient, 'get_mis_favoritos', return_value={'lugares': [3, 12], 'eventos': []})
+    def test_favoritos_por_orden_de_guardado(self, *mocks):
+        """El servicio los da del más reciente al más antiguo y el recién guardado pasa delante."""
+        self._detalle()
+        self.client.post(reverse('accion_favorito', args=['lugar', 7]))
+        favoritos = cache.get(snapshot_interacciones.clave(1))['favoritos']['lugares']
+        self.assertEqual(list(favoritos), [7, 3, 12])
+
+
+class ExportacionTests(TestCase):
+
+    def setUp(self):
+        iniciar_sesion(self.client, access_token='token-prueba', rol='admin')
+
+    @staticmethod
+    def _leer(response):
+        """Consume el streaming async de la respuesta como lo haría el servidor ASGI."""
+        async def leer():
+            return b''.join([trozo async for trozo in response.streaming_content])
+        return asyncio.run(leer()).decode()
+
+    def test_iterar_paginas_sigue_next(self):
+        """Se piden las páginas en orden siguiendo 'next' hasta que no hay más."""
+        paginas = [
+            {'next': 'http://svc/lugares/?limit=1&offset=1', 'results': [{'id': 1}]},
+            {'next': None, 'results': [{'id': 2}]},
+        ]
+        respuestas = [httpx.Response(200, json=p, request=httpx.Request('GET', 'http://svc/')) for p in paginas]
+
+        async def recorrer():
+            return [p async for p in AsyncApiClient.iterar_paginas('http://svc/lugares/')]
+
+        with patch.object(AsyncApiClient, '_request', side_effect=respuestas) as mock_request:
+            self.assertEqual(asyncio.run(recorrer()), [[{'id': 1}], [{'id': 2}]])
+        self.assertEqual(mock_request.call_args_list[1].args[1], 'http://svc/lugares/?limit=1&offset=1')
+
+    def test_exporta_csv_y_jsonl_en_streaming(self):
+        """Cada página del servicio se convierte en un trozo de la respuesta."""
+        async def paginas(url, token=None):
+            yield [{'id': 1, 'nombre': 'Mirador', 'categoria': 'mirador'}]
+            yield [{'id': 2, 'nombre': 'Plaza, Mayor', 'categoria': 'plaza'}]
+
+        with patch.object(AsyncApiClient, 'iterar_paginas', paginas):
+            response = self.client.get(reverse('exportar_datos', args=['lugares', 'csv']))
+            self.assertTrue(response.streaming)
+            lineas = self._leer(response).splitlines()
+
+            response = self.client.get(reverse('exportar_datos', args=['lugares', 'jsonl']))
+            jsonl = [json.loads(l) for l in self._leer(response).splitlines()]
+
+        self.assertEqual(lineas[0], 'ID,Nombre,Categoría,Latitud,Longitud,Descripción')
+        self.assertEqual(lineas[2], '2,"Plaza, Mayor",plaza,,,')
+        self.assertEqual(jsonl[1]['nombre'], 'Plaza, Mayor')
+
+    def test_exportar_requiere_staff(self):
+        iniciar_sesion(self.client, rol='usuario')
+        response = self.client.get(reverse('exportar_lugares'))
+        self.assertRedirects(response, reverse('index_lugares'), fetch_redirect_response=False)
+
+
+class DashboardTests(TestCase):
+
+    def setUp(self):
+        iniciar_sesion(self.client, access_token='token-prueba', rol='admin')
+
+    @patch.object(AsyncApiClient, 'get_total', side_effect=lambda url, token, params=None: 30 if params else 40)
+    @patch.object(AsyncApiClient, 'get_pagina', return_value={
+        'count': 30, 'previous': None,
+        'next': 'http://service-eventos:8000/api/eventos/?estado=pendiente&limit=25&offset=25',
+        'results': [{'id': 5, 'nombre': 'Concierto', 'estado': 'pendiente', 'fecha_inicio': '2025-06-01T20:00:00Z'}],
+    })
+    def test_pide_una_pagina_filtrada_y_totales(self, mock_pagina, mock_total):
+        """Solo se pide la página de la pestaña activa; los totales salen de .../total/."""
+        response = self.client.get(reverse('dashboard'), {'tab': 'eventos', 'estado': 'pendiente', 'orden': 'nombre'})
+
+        self.assertEqual(response.status_code, 200)
+        url, token, params = mock_pagina.call_args.args
+        self.assertTrue(url.endswith('/eventos/'))
+        self.assertEqual(params, {'estado': 'pendiente', 'limit': 25, 'ordering': 'nombre'})
+        self.assertEqual(sorted(c.args[0].rsplit('/', 3)[1] for c in mock_total.call_args_list), ['eventos', 'eventos', 'lugares', 'users'])
+
+        self.assertEqual(response.context['eventos'][0]['id'], 5)
+        self.assertEqual(response.context['total_filtrado'], 30)
+        self.assertEqual(response.context['total_eventos'], 40)
+        self.assertIn('offset=25', response.context['pagina_siguiente'])
+        self.assertIn('estado=pendiente', response.context['pagina_siguiente'])
+        self.assertIsNone(response.context['pagina_anterior'])
+
+    @patch.object(AsyncApiClient, 'get_total', return_value=3)
+    @patch.object(AsyncApiClient, 'get_pagina', return_value={
+        'previous': None, 'next': 'http://service-lugares:8000/api/catalogo/lugares/?cursor=cD0yMDI1&limit=25', 'results': [],
+    })
+    def test_organizador_sin_pestana_usuarios(self, mock_pagina, mock_total):
+        """Un organizador no ve usuarios; lugares pagina por cursor (sin count) y sin filtros su total es el filtrado."""
+        iniciar_sesion(self.client, rol='organizador')
+
+        response = self.client.get(reverse('dashboard'), {'tab': 'usuarios', 'orden': 'inventado'})
+
+        self.assertEqual(response.context['tab'], 'lugares')
+        self.assertNotIn('ordering', mock_pagina.call_args.args[2])
+        self.assertEqual(mock_total.call_count, 2)
+        self.assertEqual(response.context['total_lugares'], 3)
+        self.assertIn('cursor=cD0yMDI1', response.context['pagina_siguiente'])
+
+
+class MapaGeojsonTests(TestCase):
+
+    LUGARES = [
+        {'id': 1, 'nombre': 'Mirador', 'categoria': 'mirador', 'descripcion': 'Largo...', 'lat': 37.1810612, 'lng': -3.5921234},
+        {'id': 2, 'nombre': 'Lejos', 'categoria': 'bar', 'descripcion': '...', 'lat': 40.41, 'lng': -3.70},
+    ]
+
+    @patch.object(AsyncApiClient, 'get_lugares_en_zona')
+    def test_solo_puntos_del_bbox_cuantizados(self, mock_zona):
+        """Devuelve solo lo visible, con coordenadas redondeadas y propiedades mínimas."""
+        mock_zona.return_value = {'next': None, 'results': self.LUGARES}
+        response = self.client.get(reverse('mapa_geojson'), {'capa': 'lugares', 'bbox': '-3.7,37.1,-3.5,37.3', 'zoom': 13})
+        mock_zona.assert_called_once_with((-3.7, 37.1, -3.5, 37.3))
+
+        datos = response.json()
+        self.assertEqual(len(datos['features']), 1)
+        feature = datos['features'][0]
+        self.assertEqual(feature['geometry']['coordinates'], [-3.5921, 37.1811])
+        self.assertEqual(feature['properties'], {'id': 1, 'nombre': 'Mirador', 'categoria': 'mirador'})
+        self.assertIn('max-age', response['Cache-Control'])
+        self.assertFalse(datos['truncado'])
+
+    @patch.object(AsyncApiClient, 'get_lugares_en_zona')
+    def test_recortado_si_el_servicio_deja_mas_paginas(self, mock_zona):
+        mock_zona.return_value = {'next': 'http://service-lugares:8000/api/catalogo/lugares/?cursor=x', 'results': self.LUGARES}
+        response = self.client.get(reverse('mapa_geojson'), {'capa': 'lugares', 'bbox': '-3.7,37.1,-3.5,37.3'})
+        self.assertTrue(response.json()['truncado'])
+
+    @patch.object(AsyncApiClient, 'get_lugares', return_value=LUGARES)
+    @patch.object(AsyncApiClient, 'get_lugares_en_zona', side_effect=resiliencia.ServicioNoDisponible('caído'))
+    def test_sin_servicio_filtra_la_copia_del_catalogo(self, mock_zona, mock_lugares):
+        response = self.client.get(reverse('mapa_geojson'), {'capa': 'lugares', 'bbox': '-3.7,37.1,-3.5,37.3'})
+        self.assertEqual([f['properties']['id'] for f in response.json()['features']], [1])
+
+    def test_normaliza_longitudes_fuera_de_rango(self):
+        """Leaflet da longitudes de más de 180 al dar la vuelta al mundo; el servicio no las acepta."""
+        self.assertEqual(mapa.normalizar_bbox((170, 0, 190, 10)), (170, 0, -170, 10))
+        self.assertEqual(mapa.normalizar_bbox((-200, 0, 200, 10)), (-180.0, 0, 180.0, 10))
+
+    def test_parametros_invalidos_400(self):
+        response = self.client.get(reverse('mapa_geojson'), {'capa': 'usuarios', 'bbox': '1,2,3,4'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('mapa_geojson'), {'capa': 'lugares', 'bbox': 'a,b'})
+        self.assertEqual(response.status_code, 400)
+
+    @patch.object(AsyncApiClient, 'get_tesela')
+    def test_tesela_agrupada_por_el_servicio(self, mock_tesela):
+        grupo = {'type': 'FeatureCollection', 'truncado': False, 'features': [{
+            'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [-3.6, 37.18]},
+            'properties': {'grupo': True, 'total': 120, 'categorias': {'bar': 70, 'plaza': 50}},
+        }]}
+        mock_tesela.return_value = grupo
+        response = self.client.get(reverse('mapa_tesela', args=['lugares', 10, 501, 397]))
+        mock_tesela.assert_called_once_with('lugares', 10, 501, 397)
+        self.assertEqual(response.json(), grupo)
+        self.assertIn('max-age', response['Cache-Control'])
+        self.assertEqual(self.client.get(reverse('mapa_tesela', args=['lugares', 2, 4, 0])).status_code, 400)
+        self.assertEqual(self.client.get(reverse('mapa_tesela', args=['usuarios', 0, 0, 0])).status_code, 400)
+
+    @patch.object(AsyncApiClient, 'get_lugares', return_value=LUGARES)
+    @patch.object(AsyncApiClient, 'get_tesela', side_effect=resiliencia.ServicioNoDisponible('caído'))
+    def test_tesela_sin_servicio_con_la_copia_del_catalogo(self, mock_tesela, mock_lugares):
+        response = self.client.get(reverse('mapa_tesela', args=['lugares', 10, 501, 397]))
+        self.assertEqual([f['properties']['id'] for f in response.json()['features']], [1])
+
+    def test_precision_crece_con_el_zoom(self):
+        self.assertEqual(mapa.decimales_para_zoom(0), 0)
+        self.assertEqual(mapa.decimales_para_zoom(13), 4)
+        self.assertEqual(mapa.decimales_para_zoom(20), 6)
+
+    @override_settings(MAPA_MAX_FEATURES=1)
+    def test_recorta_y_avisa(self):
+        datos = mapa.geojson('lugares', self.LUGARES, (-180, -90, 180, 90), 5)
+        self.assertEqual(len(datos['features']), 1)
+        self.assertTrue(datos['truncado'])
+
+
+@override_settings(CB_MIN_LLAMADAS=2, CB_VENTANA=4, CB_ESPERA=60, API_RETRY_TOTAL=0)
+class ResilienciaTests(TestCase):
+    # Puerto cerrado: la conexión se rechaza al momento
+    CAIDO = 'http://127.0.0.1:1/api/interacciones'
+
+    def setUp(self):
+        resiliencia._circuitos.clear()
+
+    def tearDown(self):
+        resiliencia._circuitos.clear()
+
+    def test_circuito_se_abre_y_falla_rapido(self):
+        """Tras varios fallos seguidos las llamadas ni siquiera salen del proceso."""
+        url = f"{self.CAIDO}/comentarios/lugar/1/"
+        with override_settings(API_INTERACCIONES_URL=self.CAIDO):
+            asyncio.run(AsyncApiClient.get(url))
+            asyncio.run(AsyncApiClient.get(url))
+            self.assertEqual(AsyncApiClient.estado_circuitos()['interacciones']['estado'], resiliencia.ABIERTO)
+
+            with patch.object(api_client_async, '_cliente') as mock_cliente:
+                self.assertEqual(asyncio.run(AsyncApiClient.get(url)), [])
+            mock_cliente.assert_not_called()
+
+    def test_semiabierto_deja_una_prueba_y_cierra(self):
+        """Pasada la espera entra una sola llamada de prueba; si va bien el circuito se cierra."""
+        circuito = resiliencia.Circuito('lugares')
+        circuito.registrar(0.1, fallo=True)
+        circuito.registrar(0.1, fallo=True)
+        self.assertEqual(circuito.estado()['estado'], resiliencia.ABIERTO)
+
+        with override_settings(CB_ESPERA=0):
+            circuito.permitir()
+            with self.assertRaises(resiliencia.ServicioNoDisponible):
+                circuito.permitir()
+            circuito.registrar(0.1, fallo=False)
+        self.assertEqual(circuito.estado()['estado'], resiliencia.CERRADO)
+
+    def test_timeout_recortado_por_la_pagina_no_cuenta_como_fallo(self):
+        """Si el plazo de la página acortó el timeout, agotarlo no es culpa del servicio."""
+        circuito = resiliencia.Circuito('lugares')
+        propio = circuito.permitir()
+        circuito.registrar_error(0.1, propio / 10, por_timeout=True)
+        circuito.registrar_error(0.1, propio / 10, por_timeout=True)
+        self.assertEqual(circuito.estado()['llamadas'], 0)
+
+        circuito.registrar_error(0.1, propio, por_timeout=True)
+        circuito.registrar_error(0.1, propio / 10, por_timeout=False)
+        self.assertEqual(circuito.estado()['estado'], resiliencia.ABIERTO)
+
+    def test_timeout_de_la_pagina_no_abre_el_circuito(self):
+        """Una llamada cortada por el plazo de la página deja el circuito cerrado."""
+        token = resiliencia.iniciar_plazo(0.5)
+        try:
+            with patch.object(api_client_async, '_cliente') as mock_cliente:
+                mock_cliente.return_value.request = AsyncMock(side_effect=httpx.ReadTimeout('lento'))
+                for _ in range(3):
+                    asyncio.run(AsyncApiClient.post(f"{settings.API_LUGARES_URL}/lugares/", {}))
+        finally:
+            resiliencia.terminar_plazo(token)
+        self.assertEqual(AsyncApiClient.estado_circuitos()['lugares']['llamadas'], 0)
+
+    @override_settings(CB_LLAMADA_LENTA=0.5)
+    def test_llamadas_lentas_abren_el_circuito(self):
+        circuito = resiliencia.Circuito('eventos')
+        circuito.registrar(0.8, fallo=False)
+        circuito.registrar(0.9, fallo=False)
+        self.assertEqual(circuito.estado()['estado'], resiliencia.ABIERTO)
+
+    def test_plazo_de_pagina_limita_timeout_y_llega_a_los_hilos(self):
+        """El timeout nunca supera lo que queda de página, también en el fan-out."""
+        async def permitir():
+            return resiliencia.Circuito('lugares').permitir()
+
+        async def restante():
+            return resiliencia.tiempo_restante()
+
+        async def pagina():
+            token = resiliencia.iniciar_plazo(1)
+            try:
+                return await AsyncApiClient.en_paralelo({'a': permitir(), 'b': restante()})
+            finally:
+                resiliencia.terminar_plazo(token)
+
+        datos = asyncio.run(pagina())
+        self.assertLessEqual(datos['a'], 1)
+        self.assertIsNotNone(datos['b'])
+
+        token = resiliencia.iniciar_plazo(0)
+        try:
+            with self.assertRaises(resiliencia.ServicioNoDisponible):
+                resiliencia.Circuito('lugares').permitir()
+        finally:
+            resiliencia.terminar_plazo(token)
+
+    @patch.object(AsyncApiClient, 'get_lugares', return_value={'id': 7, 'nombre': 'Mirador', 'categoria': 'mirador'})
+    def test_detalle_sin_valoracion_si_interacciones_cae(self, mock_lugares):
+        """Con el circuito de interacciones abierto la ficha se pinta igual, sin la nota."""
+        circuito = resiliencia.circuito_para(f"{resiliencia.settings.API_INTERACCIONES_URL}/")
+        circuito.registrar(0.1, fallo=True)
+        circuito.registrar(0.1, fallo=True)
+
+        response = self.client.get(reverse('detalle_lugar', kwargs={'pk': 7}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['puntuacion'])
+        self.assertEqual(response.context['comentarios'], [])
+
+
+class VueloUnicoTests(TestCase):
+
+    def test_llamadas_simultaneas_comparten_una(self):
+        """Diez hilos piden lo mismo a la vez: solo uno llega al servicio."""
+        llamadas = []
+        def lenta():
+            llamadas.append(1)
+            time.sleep(0.2)
+            return {'media': 4.5, 'total': 2}
+
+        hilos = [threading.Thread(target=vuelo_unico.compartir, args=('k', lenta)) for _ in range(10)]
+        for h in hilos: h.start()
+        for h in hilos: h.join()
+        self.assertEqual(len(llamadas), 1)
+
+        # Terminada la llamada no queda nada guardado: la siguiente vuelve a salir
+        vuelo_unico.compartir('k', lenta)
+        self.assertEqual(len(llamadas), 2)
+
+    def test_claves_distintas_no_se_mezclan(self):
+        """Otro token u otros parámetros son otra llamada."""
+        self.assertNotEqual(vuelo_unico.clave('http://svc/a/', 't1'), vuelo_unico.clave('http://svc/a/', 't2'))
+        self.assertNotEqual(vuelo_unico.clave('http://svc/a/', params={'limit': 1}), vuelo_unico.clave('http://svc/a/'))
+
+    def test_error_del_lider_llega_a_todos(self):
+        def falla():
+            time.sleep(0.1)
+            raise ValueError('caído')
+
+        errores = []
+        def pedir():
+            try:
+                vuelo_unico.compartir('k', falla)
+            except ValueError as e:
+                errores.append(e)
+
+        hilos = [threading.Thread(target=pedir) for _ in range(3)]
+        for h in hilos: h.start()
+        for h in hilos: h.join()
+        self.assertEqual(len(errores), 3)
+
+    def test_async_comparte_y_sobrevive_a_la_cancelacion(self):
+        """En un loop, las corrutinas esperan la misma tarea aunque se cancele la que la lanzó."""
+        llamadas = []
+
+        async def lenta(url, token=None, params=None):
+            llamadas.append(url)
+            await asyncio.sleep(0.1)
+            return [{'id': 1}]
+
+        async def pagina():
+            lider = asyncio.ensure_future(AsyncApiClient.get('http://svc/comentarios/lugar/7/'))
+            await asyncio.sleep(0)
+            seguidores = [AsyncApiClient.get('http://svc/comentarios/lugar/7/') for _ in range(4)]
+            lider.cancel()
+            return await asyncio.gather(*seguidores)
+
+        with patch.object(AsyncApiClient, '_get', side_effect=lenta):
+            resultados = asyncio.run(pagina())
+
+        self.assertEqual(len(llamadas), 1)
+        self.assertTrue(all(r == [{'id': 1}] for r in resultados))
+
+    def test_async_cada_peticion_espera_segun_su_plazo(self):
+        """La llamada compartida no hereda el plazo de quien la lanzó; cada una espera lo que le queda."""
+        plazos = []
+
+        async def lenta(url, token=None, params=None):
+            plazos.append(resiliencia.tiempo_restante())
+            await asyncio.sleep(0.2)
+            return [{'id': 1}]
+
+        async def con_plazo(segundos):
+            token = resiliencia.iniciar_plazo(segundos)
+            try:
+                return await AsyncApiClient.get_o_error('http://svc/comentarios/lugar/7/')
+            finally:
+                resiliencia.terminar_plazo(token)
+
+        async def paginas():
+            lider = asyncio.ensure_future(con_plazo(0.05))
+            await asyncio.sleep(0)
+            seguidora = asyncio.ensure_future(con_plazo(5))
+            return await asyncio.gather(lider, seguidora, return_exceptions=True)
+
+        with patch.object(AsyncApiClient, '_get', side_effect=lenta):
+            lider, seguidora = asyncio.run(paginas())
+
+        self.assertEqual(plazos, [None])
+        self.assertIsInstance(lider, resiliencia.ServicioNoDisponible)
+        self.assertEqual(seguidora, [{'id': 1}])
+
+
+@override_settings(JWT_SIGNING_KEY='clave-compartida')
+class LoginTokenTests(TestCase):
+
+    def _token(self, clave='clave-compartida', **extra):
+        claims = {'token_type': 'access', 'exp': int(time.time()) + 3600,
+                  'user_id': 5, 'id': 5, 'username': 'ana', 'rol': 'organizador', **extra}
+        return jwt.encode(claims, clave, algorithm='HS256')
+
+    def test_login_lee_id_y_rol_del_token(self):
+        """Con la firma correcta la sesión se rellena sin llamar a /me/."""
+        with patch.object(AsyncApiClient, 'post', return_value={'access': self._token()}), \
+             patch.object(AsyncApiClient, 'get_me') as mock_me:
+            self.client.post(reverse('login'), {'username': 'ana', 'password': 'x'})
+
+        mock_me.assert_not_called()
+        self.assertEqual(self.client.session['user_id'], 5)
+        self.assertEqual(self.client.session['rol'], 'organizador')
+
+    def test_token_no_verificable_consulta_me(self):
+        """Si la firma no cuadra no se confía en los claims y se pregunta al servicio."""
+        with patch.object(AsyncApiClient, 'post', return_value={'access': self._token(clave='otra', rol='admin')}), \
+             patch.object(AsyncApiClient, 'get_me', return_value={'id': 5, 'rol': 'usuario'}) as mock_me:
+            self.client.post(reverse('login'), {'username': 'ana', 'password': 'x'})
+
+        mock_me.assert_called_once()
+        self.assertEqual(self.client.session['rol'], 'usuario')
+
+    def test_rechaza_tokens_caducados_o_de_refresco(self):
+        self.assertIsNone(tokens.verificar(self._token(exp=int(time.time()) - 10)))
+        self.assertIsNone(tokens.verificar(self._token(token_type='refresh')))
+        self.assertEqual(tokens.verificar(self._token())['rol'], 'organizador')
+
+
+@patch.object(AsyncApiClient, 'get_eventos', return_value=[])
+@patch.object(AsyncApiClient, 'get_lugares', return_value=[{'id': 1, 'nombre': 'Mirador', 'categoria': 'mirador'}])
+class SesionSinBaseDeDatosTests(TestCase):
+    """Consultas SQL por petición en una página de lectura con sesión iniciada."""
+
+    def _visitar(self):
+        iniciar_sesion(self.client, access_token='token-prueba', user_id=1, rol='usuario')
+        with CaptureQueriesContext(connection) as consultas:
+            for _ in range(5):
+                self.assertEqual(self.client.get(reverse('index_lugares')).status_code, 200)
+        return len(consultas) / 5
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db')
+    def test_referencia_sesion_en_bd(self, *mocks):
+        """Con el backend antiguo cada página consulta django_session."""
+        self.assertGreaterEqual(self._visitar(), 1)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_cookie_firmada_no_consulta(self, *mocks):
+        self.assertEqual(self._visitar(), 0)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cache')
+    def test_sesion_en_cache_no_consulta(self, *mocks):
+        self.assertEqual(self._visitar(), 0)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+    def test_sesion_en_cache_con_respaldo_en_bd_no_consulta(self, *mocks):
+        """Sin Redis la sesión vive en django_session, pero se lee de la locmem."""
+        self.assertEqual(self._visitar(), 0)
+
+    def test_por_defecto_la_sesion_no_va_en_la_cookie(self, *mocks):
+        """Los tokens no viajan en la cookie: la sesión por defecto se guarda en el servidor."""
+        self.assertIn(settings.SESSION_ENGINE, (
+            'django.contrib.sessions.backends.cache', 'django.contrib.sessions.backends.cached_db',
+        ))
+
+
+class RenovacionTokenTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def _token(self, segundos):
+        return jwt.encode({'token_type': 'access', 'exp': int(time.time()) + segundos, 'id': 1, 'rol': 'usuario'},
+                          'clave', algorithm='HS256')
+
+    def test_renueva_antes_de_caducar(self):
+        """A un token que le quedan segundos se le cambia por uno nuevo en la propia petición."""
+        nuevo = self._token(3600)
+        iniciar_sesion(self.client, access_token=self._token(30), refresh_token='refresh-1', rol='usuario')
+
+        with patch.object(ApiClient, 'post', return_value={'access': nuevo}) as mock_post:
+            self.client.get(reverse('login'))
+            self.client.get(reverse('login'))
+
+        mock_post.assert_called_once()
+        self.assertEqual(mock_post.call_args.args[1], {'refresh': 'refresh-1'})
+        self.assertEqual(self.client.session['access_token'], nuevo)
+
+    def test_sesion_caducada_sin_renovacion_se_cierra(self):
+        """Si el refresh tampoco sirve y el token ya caducó, se borran las credenciales."""
+        iniciar_sesion(self.client, access_token=self._token(-10), refresh_token='caducado', rol='usuario')
+        with patch.object(ApiClient, 'post', return_value=None):
+            self.client.get(reverse('login'))
+        self.assertNotIn('access_token', self.client.session)
+        self.assertNotIn('rol', self.client.session)
+
+    def test_peticiones_simultaneas_renuevan_una_vez(self):
+        """Diez peticiones de la misma sesión comparten una sola llamada a /token/refresh/."""
+        def lenta(url, data):
+            time.sleep(0.2)
+            return {'access': 'nuevo'}
+
+        with patch.object(ApiClient, 'post', side_effect=lenta) as mock_post:
+            with ThreadPoolExecutor(max_workers=10) as hilos:
+                resultados = dict(enumerate(hilos.map(lambda _: renovacion.renovar('refresh-1'), range(10))))
+            # Otro worker que llega después encuentra el token ya renovado en la caché
+            self.assertEqual(renovacion.renovar('refresh-1'), 'nuevo')
+
+        self.assertEqual(set(resultados.values()), {'nuevo'})
+        self.assertEqual(mock_post.call_count, 1)
+
+    def test_renovacion_async_comparte_el_token_por_la_cache(self):
+        """Las corrutinas simultáneas renuevan una vez y el token queda en la caché para los demás workers."""
+        async def lenta(url, data):
+            await asyncio.sleep(0.1)
+            return {'access': 'nuevo'}
+
+        async def renovar_a_la_vez():
+            return await asyncio.gather(*(renovacion.arenovar('refresh-1') for _ in range(10)))
+
+        with patch.object(AsyncApiClient, 'post', side_effect=lenta) as mock_post:
+            resultados = asyncio.run(renovar_a_la_vez())
+
+        self.assertEqual(set(resultados), {'nuevo'})
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(cache.get(renovacion._clave('refresh-1')), 'nuevo')
+
+    def test_401_se_repite_una_vez_con_token_renovado(self):
+        sesion = {'access_token': 'viejo', 'refresh_token': 'refresh-1'}
+        respuestas = [type('R', (), {'status_code': 401})(), type('R', (), {'status_code': 200})()]
+
+        contexto = tokens.fijar_renovador(renovacion.Renovador(sesion))
+        try:
+            with patch.object(AsyncApiClient, '_enviar', side_effect=respuestas) as mock_enviar, \
+                 patch.object(renovacion, 'arenovar', return_value='nuevo'):
+                response = asyncio.run(AsyncApiClient._request('GET', 'http://service-lugares/x/', 'viejo'))
+        finally:
+            tokens.quitar_renovador(contexto)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_enviar.call_args.args[2], 'nuevo')
+        self.assertEqual(sesion['access_token'], 'nuevo')
+
+
+@patch.object(AsyncApiClient, 'get_eventos', return_value=[])
+@patch.object(AsyncApiClient, 'get_lugares', return_value=[{'id': 1, 'nombre': 'Mirador', 'categoria': 'mirador'}])
+class CachePaginaTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonimos_comparten_la_pagina(self, mock_lugares, mock_eventos):
+        """La segunda visita anónima no llama a los servicios ni renderiza."""
+        antes = cache_pagina.estadisticas()['aciertos']
+        primera = contenido(self.client.get(reverse('index_lugares')))
+        segunda = contenido(self.client.get(reverse('index_lugares')))
+
+        self.assertEqual(primera, segunda)
+        self.assertIn('Mirador', segunda)
+        self.assertEqual(mock_lugares.call_count, 1)
+        self.assertEqual(cache_pagina.estadisticas()['aciertos'], antes + 1)
+
+    def test_con_sesion_no_se_cachea(self, mock_lugares, mock_eventos):
+        """Con algo en la sesión la página es propia del usuario y se genera siempre."""
+        contenido(self.client.get(reverse('index_lugares')))
+        iniciar_sesion(self.client, access_token='token-prueba', rol='admin')
+        response = self.client.get(reverse('index_lugares'))
+
+        self.assertIn('Zona de Gestión', contenido(response))
+        self.assertEqual(mock_lugares.call_count, 2)
+
+    def test_la_query_string_forma_parte_de_la_clave(self, mock_lugares, mock_eventos):
+        contenido(self.client.get(reverse('index_lugares')))
+        contenido(self.client.get(reverse('index_lugares') + '?pagina=2'))
+        self.assertEqual(mock_lugares.call_count, 2)
+
+    @patch.object(AsyncApiClient, 'put', return_value={'status': 'Lugar aprobado'})
+    def test_aprobar_invalida_portada(self, mock_put, mock_lugares, mock_eventos):
+        """gestionar_recurso sube la versión del grupo 'lugares' y la portada se regenera."""
+        contenido(self.client.get(reverse('index_lugares')))
+        self.client.post(reverse('gestionar_recurso', args=['lugar', 1, 'aprobar']))
+        self.client.session.flush()
+        contenido(self.client.get(reverse('index_lugares')))
+        self.assertEqual(mock_lugares.call_count, 2)
+
+    def test_invalidar_solo_afecta_a_su_grupo(self, mock_lugares, mock_eventos):
+        with patch.object(AsyncApiClient, 'get_ranking', return_value=[]) as mock_ranking:
+            contenido(self.client.get(reverse('index_lugares')))
+            self.client.get(reverse('ver_ranking'))
+            cache_pagina.invalidar('lugares')
+            contenido(self.client.get(reverse('index_lugares')))
+            self.client.get(reverse('ver_ranking'))
+
+        self.assertEqual(mock_lugares.call_count, 2)
+        self.assertEqual(mock_ranking.call_count, 1)
+
+    def test_pagina_con_un_servicio_caido_no_se_guarda(self, mock_lugares, mock_eventos):
+        """Si una parte salió vacía por un fallo, la siguiente visita vuelve a generarla."""
+        caido = resiliencia.ServicioNoDisponible('caído')
+        with patch.object(AsyncApiClient, 'get_eventos', new=lambda: AsyncApiClient.get('http://service-eventos/x/')), \
+             patch.object(AsyncApiClient, 'get_o_error', side_effect=caido):
+            contenido(self.client.get(reverse('index_lugares')))
+        contenido(self.client.get(reverse('index_lugares')))
+        contenido(self.client.get(reverse('index_lugares')))
+        self.assertEqual(mock_lugares.call_count, 2)
+
+    @patch.object(AsyncApiClient, 'get_comentarios', return_value=[])
+    def test_detalle_sin_valoracion_no_se_guarda(self, mock_comentarios, mock_lugares, mock_eventos):
+        """service-interacciones caído: el detalle sale sin valoración pero no se cachea así."""
+        mock_lugares.return_value = {'id': 7, 'nombre': 'Mirador', 'categoria': 'mirador'}
+        url = reverse('detalle_lugar', kwargs={'pk': 7})
+        with patch.object(AsyncApiClient, 'get_o_error', side_effect=resiliencia.ServicioNoDisponible('caído')):
+            self.assertIsNone(self.client.get(url).context['puntuacion'])
+        antes = cache_pagina.estadisticas()['aciertos']
+        with patch.object(AsyncApiClient, 'get_resumen_votos', return_value={'media': 4.5, 'total': 2}):
+            self.assertEqual(self.client.get(url).context['puntuacion'], {'media': 4.5, 'total': 2})
+            self.assertContains(self.client.get(url), '4.5')
+        self.assertEqual(cache_pagina.estadisticas()['aciertos'], antes + 1)
+
+
+class HtmlProgresivoTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_la_pagina_sale_antes_que_los_datos(self):
+        """El mapa y los huecos llegan al momento; cada lista llega cuando responde su servicio."""
+        async def lento(segundos, datos):
+            await asyncio.sleep(segundos)
+            return datos
+
+        lugares = [{'id': 1, 'nombre': 'Mirador', 'categoria': 'mirador'}]
+        with patch.object(AsyncApiClient, 'get_lugares', new=lambda: lento(0.3, lugares)), \
+             patch.object(AsyncApiClient, 'get_eventos', new=lambda: lento(0.1, [])):
+            response = self.client.get(reverse('index_lugares'))
+
+            async def leer():
+                inicio = time.monotonic()
+                llegadas = []
+                async for parte in response.streaming_content:
+                    llegadas.append((time.monotonic() - inicio, parte.decode()))
+                return llegadas
+            llegadas = asyncio.run(leer())
+
+        segundos, shell = llegadas[0]
+        self.assertLess(segundos, 0.1)
+        self.assertIn('id="map"', shell)
+        self.assertIn('id="hueco-lugares"', shell)
+        self.assertNotIn('</body>', shell)
+        # Eventos responde antes, así que su parte llega primero
+        self.assertIn('parte-eventos', llegadas[1][1])
+        self.assertIn('Mirador', llegadas[2][1])
+        self.assertTrue(llegadas[-1][1].strip().endswith('</html>'))
+
+
+    @patch.object(AsyncApiClient, 'get_eventos', return_value=[])
+    @patch.object(AsyncApiClient, 'get_lugares', return_value=[])
+    def test_el_mapa_se_inicia_con_todo_declarado(self, *mocks):
+        """La inicialización del mapa corre al llegar el script: lo que usa tiene que estar definido antes."""
+        html = contenido(self.client.get(reverse('index_lugares')))
+        inicio = html.index('(function () {')
+        for declaracion in ('var capas = {}', 'var URL_LUGAR', 'var URL_EVENTO', 'var URL_TESELA', 'function escapar'):
+            self.assertLess(html.index(declaracion), inicio, declaracion)
+
+
+class MisFavoritosTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    @patch.object(AsyncApiClient, 'get_huella_interacciones', return_value='2.9.0.0')
+    @patch.object(AsyncApiClient, 'get_mis_votos', return_value={'lugares': {}, 'eventos': {}})
+    @patch.object(AsyncApiClient, 'get_mis_favoritos', return_value={'lugares': [9, 3], 'eventos': [4]})
+    @patch.object(AsyncApiClient, 'get')
+    def test_resuelve_favoritos_con_un_multi_get_por_servicio(self, mock_get, *mocks):
+        """Los lugares y eventos guardados se piden con ?ids=, una llamada por catálogo."""
+        async def respuesta(url, token=None, params=None):
+            if 'lugares' in url:
+                return [{'id': 9, 'nombre': 'Plaza', 'categoria': 'plaza'}, {'id': 3, 'nombre': 'Mirador', 'categoria': 'mirador'}]
+            return [{'id': 4, 'nombre': 'Concierto', 'fecha_inicio': '2025-05-01'}]
+        mock_get.side_effect = respuesta
+        iniciar_sesion(self.client, access_token='token-prueba', user_id=1)
+
+        response = self.client.get(reverse('mis_favoritos'))
+
+        self.assertEqual(mock_get.call_count, 2)
+        params = sorted(c.kwargs['params']['ids'] for c in mock_get.call_args_list)
+        self.assertEqual(params, ['4', '9,3'])
+        self.assertEqual([l['nombre'] for l in response.context['lugares']], ['Plaza', 'Mirador'])
+        self.assertContains(response, 'Concierto')
+
+    @override_settings(API_MULTI_GET_MAX=2)
+    @patch.object(AsyncApiClient, 'get', return_value=[])
+    def test_parte_en_lotes(self, mock_get):
+        asyncio.run(AsyncApiClient.get_por_ids('eventos', [5, 4, 3, 2, 1]))
+        lotes = [c.kwargs['params']['ids'] for c in mock_get.call_args_list]
+        self.assertEqual(lotes, ['5,4', '3,2', '1'])
+
+    def test_sin_sesion_pide_login(self):
+        self.assertRedirects(self.client.get(reverse('mis_favoritos')), reverse('login'), fetch_redirect_response=False)
@@ -0,0 +1,70 @@
+"""
+Verificación local de los JWT emitidos por service-usuarios.
+
+service-usuarios firma los tokens con HS256 y la clave compartida por todos los
+servicios (JWT_SIGNING_KEY) e incluye en ellos id, username y rol. Comprobando
+la firma aquí el frontend puede fiarse de esos claims sin preguntar a /me/.
+
+También guarda, durante cada petición, quién puede renovar el access token de
+la sesión (ver renovacion.py), para que AsyncApiClient reintente una vez los 401.
+"""
+import contextvars
+import logging
+import time
+
+import jwt
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+ALGORITMO = 'HS256'
+CLAIMS_OBLIGATORIOS = ('exp', 'id', 'rol')
+
+# Renovador de la sesión de la petición en curso; None fuera de una petición
+_renovador = contextvars.ContextVar('renovador_token', default=None)
+
+def verificar(token):
+    """
+    Devuelve los claims de un access token válido, o None si la firma no
+    cuadra, ha caducado o no es un access token.
+    """
+    try:
+        claims = jwt.decode(
+            token,
+            settings.JWT_SIGNING_KEY,
+            algorithms=[ALGORITMO],
+            options={'require': list(CLAIMS_OBLIGATORIOS)},
+        )
+    except jwt.InvalidTokenError as e:
+        logger.warning("Token rechazado: %s", e)
+        return None
+    if claims.get('token_type') != 'access':
+        return None
+    return claims
+
+def datos_sesion(claims):
+    """Campos de la sesión que se rellenan a partir de los claims."""
+    return {'user_id': claims['id'], 'rol': claims['rol'], 'username': claims.get('username')}
+
+def segundos_restantes(token):
+    """Segundos hasta que caduca el token (negativo si ya caducó, 0 si no se puede leer)."""
+    try:
+        # Solo se usa para decidir cuándo renovar: la firma la comprueba el servicio
+        exp = jwt.decode(token, options={'verify_signature': False}).get('exp')
+    except jwt.InvalidTokenError:
+        return 0
+    return exp - time.time() if exp else 0
+
+# --- RENOVACIÓN TRAS UN 401 ---
+
+def fijar_renovador(renovador):
+    """Asocia el renovador a la petición en curso; devuelve el token para quitarlo."""
+    return _renovador.set(renovador)
+
+def quitar_renovador(token):
+    _renovador.reset(token)
+
+async def arenovar_tras_401(rechazado):
+    """Nuevo access token para repetir una llamada rechazada, o None si no hay forma."""
+    renovador = _renovador.get()
+    return await renovador.arenovar(rechazado) if renovador else None
@@ -5,6 +5,8 @@ urlpatterns = [
     # ... (Rutas Index y Login se mantienen igual) ...
     path("", views.index_lugares, name="index_lugares"),
     path("eventos/", views.index_eventos, name="index_eventos"),
+    path("mapa/geojson/", views.mapa_geojson, name="mapa_geojson"),
+    path("mapa/teselas/<str:capa>/<int:z>/<int:x>/<int:y>/", views.mapa_tesela, name="mapa_tesela"),
     path("login/", views.login_view, name="login"),
     path("logout/", views.logout_view, name="logout"),
     path("register/", views.register, name="register"),
@@ -22,6 +24,8 @@ urlpatterns = [
     path("lugar/<int:pk>/", views.detalle_lugar, name="detalle_lugar"), # Antes era solo <int:pk>/
     path("evento/<int:pk>/", views.detalle_evento, name="detalle_evento"),
 
+    path("favoritos/", views.mis_favoritos, name="mis_favoritos"),
+
     # INTERACCIONES (Ahora aceptan 'tipo')
     path("favorito/<str:tipo>/<int:pk>/", views.accion_favorito, name="accion_favorito"),
     path("votar/<str:tipo>/<int:pk>/<int:valor>/", views.accion_votar, name="accion_votar"),
@@ -30,6 +34,10 @@ urlpatterns = [
     path("ranking/", views.ver_ranking, name="ver_ranking"),
     path("perfil/<int:pk>/", views.ver_perfil, name="ver_perfil"),
     
-    # DASHBOARD - EXPORTAR CSV
-    path('dashboard/exportar/', views.exportar_lugares_csv, name='exportar_lugares'),
+    # DASHBOARD - EXPORTAR (CSV / JSONL en streaming)
+    path('dashboard/exportar/', views.exportar_datos, {'recurso': 'lugares', 'formato': 'csv'}, name='exportar_lugares'),
+    path('dashboard/exportar/<str:recurso>.<str:formato>', views.exportar_datos, name='exportar_datos'),
+
+    # MÉTRICAS INTERNAS (Pool de conexiones)
+    path("estado/", views.estado_servicios, name="estado_servicios"),
 ]
\ No newline at end of file
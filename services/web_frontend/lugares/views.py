@@ -1,202 +1,255 @@
 from django.conf import settings
 from django.shortcuts import render, redirect
-from django.http import Http404, HttpResponse
-import requests
-from .api_client import ApiClient
-import csv
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from . import cache_catalogo, cache_pagina, exportacion, html_progresivo, mapa, panel_admin, renovacion, resiliencia, snapshot_interacciones, tokens
+from .api_client_async import AsyncApiClient
 
 PUNTOS_CREAR_LUGAR = 50
 PUNTOS_CREAR_EVENTO = 30
 PUNTOS_COMENTAR = 5
 
-# --- VISTAS PÚBLICAS ---
+# Tipo de recurso en la URL -> catálogo cacheado que lo contiene
+CATALOGOS = {'lugar': 'lugares', 'evento': 'eventos'}
 
-def index_lugares(request):
-    return render(request, 'lugares/index_lugares.html', {
-        'lugares': ApiClient.get_lugares(),
-        'eventos': ApiClient.get_eventos()
+# --- VISTAS PÚBLICAS ---
+# Las vistas que solo esperan a los microservicios son async: bajo ASGI un mismo
+# proceso atiende muchas páginas a la vez mientras esperan sus respuestas.
+
+async def _token_async(request):
+    """Carga la sesión sin bloquear el event loop y devuelve el access_token."""
+    return await request.session.aget('access_token')
+
+@cache_pagina.cache_anonima('lugares', 'eventos')
+async def index_lugares(request):
+    await _token_async(request)
+    # La página sale al momento con el mapa; las listas llegan al terminar cada servicio
+    return html_progresivo.respuesta(request, 'lugares/index_lugares.html', {
+        'lugares': (AsyncApiClient.get_lugares, 'lugares/_lista_lugares.html'),
+        'eventos': (AsyncApiClient.get_eventos, 'lugares/_lista_eventos.html'),
     })
 
-def index_eventos(request):
+async def mapa_geojson(request):
+    """Puntos visibles de una capa del mapa (?capa=lugares|eventos&bbox=o,s,e,n&zoom=)."""
+    capa = request.GET.get('capa')
+    bbox = mapa.parsear_bbox(request.GET.get('bbox'))
+    if capa not in mapa.PROPIEDADES or bbox is None:
+        return JsonResponse({'error': 'Parámetros capa y bbox obligatorios'}, status=400)
+    try:
+        zoom = min(max(int(request.GET.get('zoom', 13)), 0), 20)
+    except ValueError:
+        return JsonResponse({'error': 'zoom debe ser un entero'}, status=400)
+
+    if capa == 'lugares':
+        # service-lugares filtra con su índice espacial: solo viaja lo visible
+        try:
+            pagina = await AsyncApiClient.get_lugares_en_zona(mapa.normalizar_bbox(bbox))
+            recursos, truncado = pagina['results'], pagina['next'] is not None
+        except resiliencia.ServicioNoDisponible:
+            recursos, truncado = await AsyncApiClient.get_lugares(), False  # última copia del catálogo
+    else:
+        # Eventos no tiene índice espacial: se filtra el catálogo cacheado
+        recursos, truncado = await AsyncApiClient.get_eventos(), False
+    response = JsonResponse(mapa.geojson(capa, recursos, bbox, zoom, truncado), json_dumps_params={'separators': (',', ':')})
+    patch_cache_control(response, public=True, max_age=settings.CATALOGO_CACHE_TTL)
+    return response
+
+async def mapa_tesela(request, capa, z, x, y):
+    """Tesela z/x/y de una capa del mapa, con los grupos que calcula su servicio."""
+    if capa not in mapa.PROPIEDADES or not mapa.tesela_valida(z, x, y):
+        return JsonResponse({'error': 'Capa o tesela no válida'}, status=400)
+    try:
+        datos = await AsyncApiClient.get_tesela(capa, z, x, y)
+    except resiliencia.ServicioNoDisponible:
+        # Sin el servicio, puntos sueltos de la última copia del catálogo
+        recursos = await (AsyncApiClient.get_lugares() if capa == 'lugares' else AsyncApiClient.get_eventos())
+        datos = mapa.geojson(capa, recursos, mapa.bbox_tesela(z, x, y), z)
+    response = JsonResponse(datos, json_dumps_params={'separators': (',', ':')})
+    patch_cache_control(response, public=True, max_age=settings.CATALOGO_CACHE_TTL)
+    return response
+
+@cache_pagina.cache_anonima('eventos')
+async def index_eventos(request):
+    await _token_async(request)
     return render(request, 'lugares/index_eventos.html', {
-        'eventos': ApiClient.get_eventos()
+        'eventos': await AsyncApiClient.get_eventos()
     })
 
-def detalle_lugar(request, pk):
-    lugar = ApiClient.get_lugares(pk)
-    if not lugar:
-        raise Http404("Lugar no encontrado")
+async def _leer_detalle(request, pk, tipo, token):
+    """Lanza a la vez todas las lecturas que necesita una página de detalle."""
+    get_recurso = AsyncApiClient.get_lugares if tipo == 'lugar' else AsyncApiClient.get_eventos
+    llamadas = {
+        'recurso': get_recurso(pk),
+        'puntuacion': AsyncApiClient.get_resumen_votos(pk, tipo=tipo),
+        'comentarios': AsyncApiClient.get_comentarios(pk, tipo=tipo),
+    }
+    if token:
+        # Favoritos y votos salen del snapshot del usuario, no de sus listas completas
+        user_id = await request.session.aget('user_id')
+        llamadas['interacciones'] = snapshot_interacciones.aobtener(token, user_id)
+    return await AsyncApiClient.en_paralelo(llamadas)
+
+@cache_pagina.cache_anonima('lugar:{pk}')
+async def detalle_lugar(request, pk):
+    token = await _token_async(request)
 
     # 1. GESTIÓN DE COMENTARIOS (POST)
     if request.method == 'POST':
+        if not await AsyncApiClient.get_lugares(pk):
+            raise Http404("Lugar no encontrado")
         texto = request.POST.get('comentario')
-        token = request.session.get('access_token')
         if not token: return redirect('login')
         
         if texto:
-            ApiClient.post(f"{settings.API_INTERACCIONES_URL}/comentarios/lugar/{pk}/", {'texto': texto}, token)
+            await AsyncApiClient.post(f"{settings.API_INTERACCIONES_URL}/comentarios/lugar/{pk}/", {'texto': texto}, token)
+            await cache_pagina.ainvalidar(f'lugar:{pk}')
         return redirect('detalle_lugar', pk=pk)
 
-    # 2. DATOS DE INTERACCIÓN (Lectura)
+    # 2. LECTURAS EN PARALELO (lugar, puntuación, comentarios y, si hay sesión, favoritos y votos)
+    datos = await _leer_detalle(request, pk, 'lugar', token)
+    lugar = datos['recurso']
+    if not lugar:
+        raise Http404("Lugar no encontrado")
+
+    # 3. DATOS DE INTERACCIÓN
     es_favorito = False
     mi_voto = 0
-    token = request.session.get('access_token')
-
     if token:
-        # A. Verificar Favorito
-        favs = ApiClient.get_mis_favoritos(token)
-        if int(pk) in favs.get('lugares', []):
-            es_favorito = True
-        
-        # B. Verificar Mi Voto (Para pintar mis estrellas)
-        mis_votos = ApiClient.get_mis_votos(token)
-        mi_voto = mis_votos['lugares'].get(int(pk), 0)
-
-    # 3. PUNTUACIÓN GLOBAL (Media de todos)
-    puntuacion = ApiClient.get_resumen_votos(pk, tipo='lugar')
+        es_favorito = snapshot_interacciones.es_favorito(datos['interacciones'], 'lugares', pk)
+        mi_voto = snapshot_interacciones.mi_voto(datos['interacciones'], 'lugares', pk)
 
     return render(request, 'lugares/detalle_lugar.html', {
         'lugar': lugar,
-        'comentarios': ApiClient.get_comentarios(pk, tipo='lugar'),
+        'comentarios': datos['comentarios'],
         'es_favorito': es_favorito,
         'mi_voto': mi_voto,      # Lo que yo voté (ej: 4)
-        'puntuacion': puntuacion # La media global (ej: {'media': 4.5, 'total': 12})
+        # La media global (ej: {'media': 4.5, 'total': 12}); None si service-interacciones
+        # no responde o tiene el circuito abierto: la página se pinta sin valoración
+        'puntuacion': datos['puntuacion'] or None
     })
     
-def detalle_evento(request, pk):
-    evento = ApiClient.get_eventos(pk)
-    if not evento:
-        raise Http404("Evento no encontrado")
+@cache_pagina.cache_anonima('evento:{pk}')
+async def detalle_evento(request, pk):
+    token = await _token_async(request)
 
     # 1. GESTIÓN DE COMENTARIOS (POST)
     if request.method == 'POST':
+        if not await AsyncApiClient.get_eventos(pk):
+            raise Http404("Evento no encontrado")
         texto = request.POST.get('comentario')
-        token = request.session.get('access_token')
         if not token: return redirect('login')
         
         if texto:
-            ApiClient.post(f"{settings.API_INTERACCIONES_URL}/comentarios/evento/{pk}/", {'texto': texto}, token)
+            await AsyncApiClient.post(f"{settings.API_INTERACCIONES_URL}/comentarios/evento/{pk}/", {'texto': texto}, token)
+            await cache_pagina.ainvalidar(f'evento:{pk}')
         return redirect('detalle_evento', pk=pk)
 
-    # 2. DATOS DE INTERACCIÓN
+    # 2. LECTURAS EN PARALELO
+    datos = await _leer_detalle(request, pk, 'evento', token)
+    evento = datos['recurso']
+    if not evento:
+        raise Http404("Evento no encontrado")
+
+    # 3. DATOS DE INTERACCIÓN
     es_favorito = False
     mi_voto = 0
-    token = request.session.get('access_token')
-
     if token:
-        # A. Verificar Favorito
-        favs = ApiClient.get_mis_favoritos(token)
-        if int(pk) in favs.get('eventos', []):
-            es_favorito = True
-            
-        # B. Verificar Mi Voto
-        mis_votos = ApiClient.get_mis_votos(token)
-        mi_voto = mis_votos['eventos'].get(int(pk), 0)
-
-    # 3. PUNTUACIÓN GLOBAL
-    puntuacion = ApiClient.get_resumen_votos(pk, tipo='evento')
+        es_favorito = snapshot_interacciones.es_favorito(datos['interacciones'], 'eventos', pk)
+        mi_voto = snapshot_interacciones.mi_voto(datos['interacciones'], 'eventos', pk)
 
     return render(request, 'lugares/detalle_evento.html', {
         'evento': evento,
-        'comentarios': ApiClient.get_comentarios(pk, tipo='evento'),
+        'comentarios': datos['comentarios'],
         'es_favorito': es_favorito,
         'mi_voto': mi_voto,
-        'puntuacion': puntuacion
+        'puntuacion': datos['puntuacion'] or None
     })
     
+async def mis_favoritos(request):
+    """Lugares y eventos guardados por el usuario: un multi-get por servicio."""
+    token = await _token_async(request)
+    if not token:
+        return redirect('login')
+    user_id = await request.session.aget('user_id')
+
+    # Los ids salen del snapshot de interacciones (ya cacheado para los detalles)
+    favoritos = (await snapshot_interacciones.aobtener(token, user_id))['favoritos']
+    # En el orden del snapshot: los guardados más recientemente primero
+    datos = await AsyncApiClient.en_paralelo({
+        catalogo: AsyncApiClient.get_por_ids(catalogo, list(favoritos[catalogo]))
+        for catalogo in ('lugares', 'eventos')
+    })
+    return render(request, 'lugares/mis_favoritos.html', datos)
+
 # --- GESTIÓN DE USUARIOS (LOGIN/REGISTER) ---
 
-def login_view(request):
+async def login_view(request):
     # Si ya está logueado, fuera
-    if request.session.get('access_token'):
+    if await _token_async(request):
         return redirect('index_lugares')
 
     if request.method == "POST":
         username = request.POST.get("username")
         password = request.POST.get("password")
         
-        print(f"DEBUG LOGIN: Intentando entrar con usuario: {username}")
-
-        # 1. URL del Login
-        url_login = f"{settings.API_USUARIOS_URL}/login/"
-        print(f"DEBUG LOGIN: URL endpoint -> {url_login}")
-        
-        # 2. Llamada a la API
-        auth_data = ApiClient.post(url_login, {
+        auth_data = await AsyncApiClient.post(f"{settings.API_USUARIOS_URL}/login/", {
             "username": username,
             "password": password
         })
-        
-        print(f"DEBUG LOGIN: Respuesta del Backend -> {auth_data}")
 
         if auth_data and "access" in auth_data:
-            print("DEBUG LOGIN: ¡Token recibido! Guardando sesión...")
             token = auth_data["access"]
-            request.session['access_token'] = token
-            request.session['username'] = username
-            
-            # 3. Obtener Datos de Usuario (ID y Rol)
-            me = ApiClient.get_me(token)
-            print(f"DEBUG LOGIN: Datos de perfil (me) -> {me}")
-            
-            if me:
-                request.session['user_id'] = me.get('id')
-                request.session['rol'] = me.get('rol')
-            
+            # El token ya trae id y rol firmados por service-usuarios; solo si no
+            # se puede verificar (clave distinta) se pregunta a /me/
+            claims = tokens.verificar(token)
+            if claims:
+                perfil = tokens.datos_sesion(claims)
+            else:
+                me = await AsyncApiClient.get_me(token) or {}
+                perfil = {'user_id': me.get('id'), 'rol': me.get('rol')}
+
+            await request.session.aupdate({
+                'access_token': token,
+                # Con el refresh token la sesión se renueva sola (RenovarTokenMiddleware)
+                'refresh_token': auth_data.get('refresh'),
+                'username': perfil.get('username') or username,
+                'user_id': perfil['user_id'],
+                'rol': perfil['rol'],
+            })
             return redirect('index_lugares')
         else:
-            print("DEBUG LOGIN: Fallo. Credenciales incorrectas o error de conexión.")
             return render(request, "lugares/login.html", {"error": "Credenciales inválidas o error de servidor"})
     
     return render(request, "lugares/login.html")
 
 
-def logout_view(request):
-    request.session.flush()
+async def logout_view(request):
+    await request.session.aflush()
     return redirect('index_lugares')
 
-def register(request):
+async def register(request):
+    # Carga la sesión sin bloquear: la plantilla base la lee
+    await _token_async(request)
     if request.method == 'GET':
         return render(request, 'registration/register.html')
 
     data = {k: request.POST.get(k) for k in ['username', 'email', 'password', 'password2']}
     
-    try:
-        res = requests.post(f"{settings.API_USUARIOS_URL}/register/", json=data, timeout=5)
-        if res.status_code == 201:
-            return redirect('login')
-        return render(request, 'registration/register.html', {'error': f"Error: {res.text}"})
-    except requests.RequestException:
-        return render(request, 'registration/register.html', {'error': "Error de conexión"})
+    ok, error = await AsyncApiClient.registrar(data)
+    if ok:
+        return redirect('login')
+    return render(request, 'registration/register.html', {'error': error})
 
 # --- CREACIÓN DE RECURSOS ---
 
-def seleccionar_creacion(request):
-    if not request.session.get('access_token'): return redirect('login')
+async def seleccionar_creacion(request):
+    if not await _token_async(request): return redirect('login')
     return render(request, 'lugares/seleccionar_creacion.html')
 
-def _crear_recurso(request, tipo, url_api, template):
-    """Helper genérico para crear lugares o eventos."""
-    if request.method == 'GET':
-        if not request.session.get('access_token'): return redirect('login')
-        return render(request, template)
-
-    token = request.session.get('access_token')
-    data = request.POST.dict() # Convierte QueryDict a dict plano
-    # Eliminamos el token csrf del dict si existe
-    data.pop('csrfmiddlewaretoken', None)
-
-    res = ApiClient.post(url_api, data, token)
-    if res and res.status_code == 201:
-        return redirect('index_lugares')
-    
-    error_msg = res.text if res else "Error de conexión"
-    return render(request, template, {'error': f"Error: {error_msg}"})
-
-def crear_lugar(request):
+async def crear_lugar(request):
+    token = await _token_async(request)
     if request.method == 'POST':
-        token = request.session.get('access_token')
-        user_id = request.session.get('user_id') # Recuperamos el ID
+        user_id = await request.session.aget('user_id') # Recuperamos el ID
 
         data = {
             'nombre': request.POST.get('nombre'),
@@ -207,21 +260,23 @@ def crear_lugar(request):
             'usuario_id': user_id  # Enviamos el ID real
         }
 
-        response = ApiClient.post(f"{settings.API_LUGARES_URL}/lugares/", data, token)
+        response = await AsyncApiClient.post(f"{settings.API_LUGARES_URL}/lugares/", data, token)
 
         if response and response.get('id'):
             # ¡PREMIO! Sumamos puntos
-            ApiClient.sumar_puntos(user_id, PUNTOS_CREAR_LUGAR, token)
+            await AsyncApiClient.sumar_puntos(user_id, PUNTOS_CREAR_LUGAR, token)
+            await cache_catalogo.ainvalidar('lugares')
+            await cache_pagina.ainvalidar('lugares', 'ranking')
             return redirect('index_lugares')
         else:
             return render(request, 'lugares/crear_lugar.html', {'error': 'Error al crear lugar'})
 
     return render(request, 'lugares/crear_lugar.html')
 
-def crear_evento(request):
+async def crear_evento(request):
+    token = await _token_async(request)
     if request.method == 'POST':
-        token = request.session.get('access_token')
-        user_id = request.session.get('user_id')
+        user_id = await request.session.aget('user_id')
 
         data = {
             'nombre': request.POST.get('nombre'),
@@ -233,11 +288,13 @@ def crear_evento(request):
             'usuario_id': user_id
         }
 
-        response = ApiClient.post(f"{settings.API_EVENTOS_URL}/eventos/", data, token)
+        response = await AsyncApiClient.post(f"{settings.API_EVENTOS_URL}/eventos/", data, token)
 
         if response and response.get('id'):
             # ¡PREMIO! Sumamos puntos
-            ApiClient.sumar_puntos(user_id, PUNTOS_CREAR_EVENTO, token)
+            await AsyncApiClient.sumar_puntos(user_id, PUNTOS_CREAR_EVENTO, token)
+            await cache_catalogo.ainvalidar('eventos')
+            await cache_pagina.ainvalidar('eventos', 'ranking')
             return redirect('index_lugares')
         else:
             return render(request, 'lugares/crear_evento.html', {'error': 'Error al crear evento'})
@@ -246,48 +303,52 @@ def crear_evento(request):
 
 # --- DASHBOARD Y ADMINISTRACIÓN ---
 
-def dashboard(request):
-    rol = request.session.get('rol')
-    token = request.session.get('access_token')
-    
-    print(f"--- DEBUG DASHBOARD ---")
-    print(f"Rol: {rol}")
-    
+async def dashboard(request):
+    token = await _token_async(request)
+    rol = await request.session.aget('rol')
     if not token or rol not in ['admin', 'organizador']:
         return redirect('index_lugares')
 
-    # Llamada a la API
-    print("Pidiendo lugares...")
-    lugares = ApiClient.get(f"{settings.API_LUGARES_URL}/lugares/", token=token)
-    
-    # --- LA LINTERNA (IMPRIMIR DATOS) ---
-    print(f"TIPO de datos Lugares: {type(lugares)}")
-    print(f"CONTENIDO de Lugares (Primeros 100 chars): {str(lugares)[:100]}")
-    
-    if isinstance(lugares, list) and len(lugares) > 0:
-        print(f"Primer lugar: {lugares[0]}")
-    elif isinstance(lugares, dict):
-        print(f"⚠️ CUIDADO: Lugares es un DICCIONARIO, claves: {lugares.keys()}")
-    # ------------------------------------
-
-    eventos = ApiClient.get(f"{settings.API_EVENTOS_URL}/eventos/", token=token)
-    
-    usuarios = []
-    if rol == 'admin':
-        usuarios = ApiClient.get(f"{settings.API_USUARIOS_URL}/users/", token=token)
-
+    # 1. Pestaña activa, con sus filtros, orden y página
+    pestanas = panel_admin.pestanas_para(rol)
+    tab = request.GET.get('tab')
+    if tab not in pestanas:
+        tab = 'lugares'
+    filtros, orden, paginacion = panel_admin.leer_consulta(tab, request.GET)
+
+    # 2. Una sola página de la pestaña activa + los totales (en paralelo)
+    url_tab = panel_admin.PESTANAS[tab]['url']()
+    llamadas = {
+        'pagina': AsyncApiClient.get_pagina(url_tab, token, panel_admin.parametros_api(filtros, orden, paginacion)),
+        # La paginación por cursor (lugares) no trae 'count': el total filtrado va aparte
+        'total_filtrado': AsyncApiClient.get_total(f"{url_tab}total/", token, filtros),
+    }
+    for nombre in pestanas:
+        # Sin filtros, el total de la pestaña activa es el total filtrado
+        if nombre != tab or filtros:
+            llamadas[nombre] = AsyncApiClient.get_total(f"{panel_admin.PESTANAS[nombre]['url']()}total/", token)
+    datos = await AsyncApiClient.en_paralelo(llamadas)
+    pagina = datos['pagina']
+    totales = {nombre: datos.get(nombre, datos['total_filtrado']) for nombre in pestanas}
+
+    selects, ordenes = panel_admin.controles(tab, filtros, orden)
     return render(request, 'lugares/dashboard.html', {
-        'lugares': lugares,
-        'eventos': eventos,
-        'usuarios': usuarios,
-        'total_lugares': len(lugares) if isinstance(lugares, list) else 0,
-        'total_eventos': len(eventos) if isinstance(eventos, list) else 0,
-        'total_usuarios': len(usuarios) if isinstance(usuarios, list) else 0
+        'tab': tab,
+        tab: pagina['results'],
+        'total_filtrado': datos['total_filtrado'],
+        'pagina_anterior': panel_admin.enlace_pagina(request.GET, pagina['previous']),
+        'pagina_siguiente': panel_admin.enlace_pagina(request.GET, pagina['next']),
+        'selects': selects,
+        'ordenes': ordenes,
+        'total_lugares': totales['lugares'],
+        'total_eventos': totales['eventos'],
+        'total_usuarios': totales.get('usuarios', 0),
+        'exportables': list(exportacion.EXPORTACIONES),
     })
 
-def borrar_recurso(request, tipo, pk):
+async def borrar_recurso(request, tipo, pk):
     if request.method != 'POST': return redirect('dashboard')
-    token = request.session.get('access_token')
+    token = await _token_async(request)
     
     urls = {
         'lugar': f"{settings.API_LUGARES_URL}/lugares/{pk}/",
@@ -296,99 +357,115 @@ def borrar_recurso(request, tipo, pk):
     }
     
     if tipo in urls:
-        ApiClient.delete(urls[tipo], token)
+        await AsyncApiClient.delete(urls[tipo], token)
+        if tipo in CATALOGOS:
+            await cache_catalogo.ainvalidar(CATALOGOS[tipo], pk)
+            await cache_pagina.ainvalidar(CATALOGOS[tipo], f'{tipo}:{pk}')
+        else:
+            await cache_pagina.ainvalidar('ranking')
     
     return redirect('dashboard')
 
-def cambiar_rol(request, pk):
+async def cambiar_rol(request, pk):
     if request.method == 'POST':
-        token = request.session.get('access_token')
-        url = f"{settings.API_USUARIOS_URL}/users/{pk}/"
-        # PATCH manual porque ApiClient no tiene patch
-        requests.patch(url, json={'rol': request.POST.get('rol')}, headers={'Authorization': f'Bearer {token}'})
+        token = await _token_async(request)
+        await AsyncApiClient.cambiar_rol(pk, request.POST.get('rol'), token)
+        await cache_pagina.ainvalidar('ranking')
     return redirect('dashboard')
 
-def gestionar_recurso(request, tipo, pk, accion):
+async def gestionar_recurso(request, tipo, pk, accion):
     if request.method != 'POST': return redirect('dashboard')
-    token = request.session.get('access_token')
+    token = await _token_async(request)
     
     base = settings.API_LUGARES_URL if tipo == 'lugar' else settings.API_EVENTOS_URL
     endpoint = 'lugares' if tipo == 'lugar' else 'eventos'
     
     url = f"{base}/{endpoint}/{pk}/{accion}/"
-    ApiClient.put(url, token=token)
+    await AsyncApiClient.put(url, token=token)
+    await cache_catalogo.ainvalidar(endpoint, pk)
+    await cache_pagina.ainvalidar(endpoint, f'{tipo}:{pk}')
     
     return redirect('dashboard')
 
-def accion_favorito(request, tipo, pk):
+async def accion_favorito(request, tipo, pk):
     """Maneja el clic en el corazón para Lugares O Eventos"""
     if request.method == 'POST':
-        token = request.session.get('access_token')
+        token = await _token_async(request)
         if not token: return redirect('login')
         
         # tipo vendrá como 'lugar' o 'evento' desde la URL
-        ApiClient.toggle_favorito(pk, tipo, token)
+        respuesta = await AsyncApiClient.toggle_favorito(pk, tipo, token)
+        await snapshot_interacciones.aregistrar_favorito(
+            await request.session.aget('user_id'), CATALOGOS.get(tipo, 'eventos'), pk, respuesta
+        )
         
     # Redirección dinámica según el tipo
     if tipo == 'evento':
         return redirect('detalle_evento', pk=pk)
     return redirect('detalle_lugar', pk=pk)
 
-def accion_votar(request, tipo, pk, valor):
+async def accion_votar(request, tipo, pk, valor):
     """Maneja el clic en las Estrellas (1-5)"""
     if request.method == 'POST':
-        token = request.session.get('access_token')
+        token = await _token_async(request)
         if not token: return redirect('login')
         
-        ApiClient.enviar_voto(pk, tipo, int(valor), token)
+        respuesta = await AsyncApiClient.enviar_voto(pk, tipo, int(valor), token)
+        await snapshot_interacciones.aregistrar_voto(
+            await request.session.aget('user_id'), CATALOGOS.get(tipo, 'eventos'), pk, respuesta
+        )
+        # La media de votos se ve también en la página anónima
+        await cache_pagina.ainvalidar(f'{tipo}:{pk}')
         
     if tipo == 'evento':
         return redirect('detalle_evento', pk=pk)
     return redirect('detalle_lugar', pk=pk)
 
-def ver_ranking(request):
-    ranking = ApiClient.get_ranking()
+@cache_pagina.cache_anonima('ranking')
+async def ver_ranking(request):
+    await _token_async(request)
+    ranking = await AsyncApiClient.get_ranking()
     return render(request, 'lugares/ranking.html', {'ranking': ranking})
 
-def ver_perfil(request, pk):
+async def ver_perfil(request, pk):
     print(f"DEBUG PERFIL: Buscando perfil ID: {pk}")
     
-    perfil = ApiClient.get_perfil_publico(pk)
+    perfil = await AsyncApiClient.get_perfil_publico(pk)
     print(f"DEBUG PERFIL: Respuesta recibida: {perfil}")
 
     if not perfil:
         print("DEBUG PERFIL: Fallo. Redirigiendo a home...")
         return redirect('index_lugares')
 
-def exportar_lugares_csv(request):
-    """Genera un CSV con todos los lugares para descargar."""
+async def estado_servicios(request):
+    """Métricas internas del cliente de microservicios (solo admin)."""
+    if await request.session.aget('rol') != 'admin':
+        return redirect('index_lugares')
+    return JsonResponse({
+        'pool': AsyncApiClient.estadisticas_conexiones(),
+        'circuitos': AsyncApiClient.estado_circuitos(),
+        'vuelo_unico': AsyncApiClient.estadisticas_vuelo_unico(),
+        'renovacion_jwt': renovacion.estadisticas(),
+        'cache_pagina': cache_pagina.estadisticas(),
+    })
+
+async def exportar_datos(request, recurso, formato):
+    """Descarga en streaming (CSV o JSONL) de lugares, eventos o interacciones."""
     # 1. Comprobar permisos
-    rol = request.session.get('rol')
+    token = await _token_async(request)
+    rol = await request.session.aget('rol')
     if rol not in ['admin', 'organizador']:
         return redirect('index_lugares')
-
-    # 2. Obtener datos del microservicio
-    lugares = ApiClient.get_lugares()
-
-    # 3. Crear respuesta HTTP tipo CSV
-    response = HttpResponse(
-        content_type='text/csv',
-        headers={'Content-Disposition': 'attachment; filename="lugares_culturemap.csv"'},
+    if recurso not in exportacion.EXPORTACIONES or formato not in exportacion.FORMATOS:
+        raise Http404("Exportación no disponible")
+
+    # 2. Las filas se van escribiendo según llegan las páginas del microservicio
+    return StreamingHttpResponse(
+        exportacion.filas(recurso, formato, token),
+        content_type=exportacion.FORMATOS[formato],
+        headers={
+            'Content-Disposition': f'attachment; filename="{recurso}_culturemap.{formato}"',
+            # Que los proxies no acumulen la descarga antes de reenviarla
+            'X-Accel-Buffering': 'no',
+        },
     )
-
-    # 4. Escribir el CSV
-    writer = csv.writer(response)
-    writer.writerow(['ID', 'Nombre', 'Categoría', 'Latitud', 'Longitud', 'Descripción'])
-    
-    if lugares:
-        for lugar in lugares:
-            writer.writerow([
-                lugar.get('id'),
-                lugar.get('nombre'),
-                lugar.get('categoria'),
-                lugar.get('lat'),
-                lugar.get('lng'),
-                lugar.get('descripcion')
-            ])
-
-    return response
\ No newline at end of file
@@ -0,0 +1,105 @@
+"""
+Single-flight para lecturas GET a los microservicios.
+
+Si varias peticiones del mismo proceso piden a la vez exactamente el mismo GET
+(misma URL, parámetros y token), solo la primera llega al microservicio y las
+demás esperan y reciben su mismo resultado ya parseado. No añade caché: en
+cuanto la llamada termina, la siguiente vuelve a salir al servicio.
+
+El resultado se comparte tal cual entre todas las peticiones: quien lo reciba
+no debe modificarlo.
+
+Funciona con hilos (código síncrono) y, en la variante async, dentro de cada
+event loop.
+
+En la variante async la llamada compartida no lleva el plazo de la página que
+la lanzó (PlazoPaginaMiddleware): si lo llevara, las demás quedarían cortadas
+por el tiempo que le quedaba a esa. Va sin plazo de página, solo con el timeout
+de cada servicio, y cada petición deja de esperarla cuando se le acaba el suyo.
+"""
+import asyncio
+import contextvars
+import threading
+import weakref
+
+from . import resiliencia
+
+_lock = threading.Lock()
+_en_curso = {}
+_en_curso_async = weakref.WeakKeyDictionary()  # loop -> {clave: tarea}
+_contadores = {'llamadas': 0, 'compartidas': 0}
+
+def clave(url, token=None, params=None):
+    return (url, token, tuple(sorted(params.items())) if params else None)
+
+def _contar(compartida):
+    with _lock:
+        _contadores['compartidas' if compartida else 'llamadas'] += 1
+
+
+class _Vuelo:
+    def __init__(self):
+        self.listo = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+def compartir(clave, cargar):
+    """Devuelve cargar() o, si ya hay una llamada idéntica en curso, espera la suya."""
+    with _lock:
+        vuelo = _en_curso.get(clave)
+        lider = vuelo is None
+        if lider:
+            vuelo = _en_curso[clave] = _Vuelo()
+    _contar(not lider)
+
+    if not lider:
+        vuelo.listo.wait()
+        if vuelo.error is not None:
+            raise vuelo.error
+        return vuelo.resultado
+
+    try:
+        vuelo.resultado = cargar()
+        return vuelo.resultado
+    except BaseException as e:
+        vuelo.error = e
+        raise
+    finally:
+        with _lock:
+            del _en_curso[clave]
+        vuelo.listo.set()
+
+async def acompartir(clave, cargar, plazo=True):
+    """
+    Variante async: cargar() devuelve una corrutina. Con plazo=True quien espera
+    se rinde con ServicioNoDisponible al agotar el plazo de su página, aunque la
+    llamada compartida siga para el resto.
+    """
+    loop = asyncio.get_running_loop()
+    en_curso = _en_curso_async.setdefault(loop, {})
+    tarea = en_curso.get(clave)
+    _contar(tarea is not None)
+
+    if tarea is None:
+        # La llamada va en su propia tarea: si se cancela la petición que la
+        # lanzó, las demás que la esperan no se quedan sin resultado. Y en una
+        # copia de su contexto sin el plazo de la página.
+        contexto = contextvars.copy_context()
+        contexto.run(resiliencia.quitar_plazo)
+        tarea = loop.create_task(cargar(), context=contexto)
+        en_curso[clave] = tarea
+        tarea.add_done_callback(lambda _: en_curso.pop(clave, None))
+
+    restante = resiliencia.tiempo_restante() if plazo else None
+    if restante is None:
+        return await asyncio.shield(tarea)
+    try:
+        return await asyncio.wait_for(asyncio.shield(tarea), max(restante, 0))
+    except TimeoutError:
+        raise resiliencia.ServicioNoDisponible('Plazo de la página agotado esperando una llamada compartida')
+
+def estadisticas():
+    """Llamadas que salieron al servicio y las que se resolvieron compartiendo otra."""
+    with _lock:
+        return dict(_contadores)